@@ -0,0 +1,185 @@
+from __future__ import annotations
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+from memory import Bit, BitVector
+from netlist import record
+import gates as g
+
+# Adder architectures behind one interface. add(a, b, cin) takes two
+# equal-width MSB-first bit vectors and returns (sum, carry_out); the ALU,
+# the MDU and the FPU all add through it, with the architecture selected
+# here:
+#
+#   ripple        a chain of full adders (the default; n stages)
+#   cla           carry-lookahead: BLOCK-bit blocks whose carries are each
+#                 one AND-OR of the generates/propagates, rippling between
+#                 blocks
+#   kogge-stone   parallel prefix, log2(n) levels, a node per bit per level
+#   brent-kung    parallel prefix, up-sweep then down-sweep: about
+#                 2*log2(n) levels but only ~2n nodes
+#
+# The prefix adders compute generate/propagate pairs per bit and combine
+# them with (g, p) o (g', p') = (g | p & g', p & p'); the carry-in is folded
+# into bit 0's generate. Group propagates that nothing reads are not built.
+#
+# select(kind) switches the architecture for the whole process (use(kind) is
+# the same as a with-block). report(kind, width) records the adder as a
+# netlist (netlist.py) and gives its gate count and logic depth.
+
+ADDERS = ("ripple", "cla", "kogge-stone", "brent-kung")
+DEFAULT_ADDER = "ripple"
+BLOCK = 4
+
+Bits = Tuple[Bit, ...]
+
+def ripple_add(a: Bits, b: Bits, cin: Bit = Bit.ZERO) -> Tuple[BitVector, Bit]:
+    a, b = tuple(a), tuple(b)
+    n = len(a)
+    out: List[Bit] = [Bit.ZERO] * n
+    carry = cin
+    for i in range(n - 1, -1, -1):  # LSB -> MSB: gates.full_adder, inlined
+        axb = g.xor_gate(a[i], b[i])
+        out[i] = g.xor_gate(axb, carry)
+        carry = g.or_gate(g.and_gate(a[i], b[i]), g.and_gate(axb, carry))
+    return BitVector.of(out), carry
+
+def _gp(a: Bits, b: Bits, cin: Bit) -> Tuple[List[Bit], List[Bit], List[Bit]]:
+    # Per-bit generate, propagate (a ^ b, kept for the sums) and the
+    # generate of bit 0 with the carry-in folded in. Index 0 is the LSB.
+    a, b = tuple(a), tuple(b)
+    n = len(a)
+    gen = [g.and_gate(a[n - 1 - i], b[n - 1 - i]) for i in range(n)]
+    prop = [g.xor_gate(a[n - 1 - i], b[n - 1 - i]) for i in range(n)]
+    if n:
+        gen0 = g.or_gate(gen[0], g.and_gate(prop[0], cin))
+        gen = [gen0] + gen[1:]
+    return gen, prop, list(prop)
+
+def _sums(prop: List[Bit], carries: List[Bit], cin: Bit) -> BitVector:
+    # carries[i] is the carry out of bit i; bit i sums with the one into it.
+    n = len(prop)
+    into = [cin] + carries[:n - 1]
+    return BitVector.of([g.xor_gate(prop[i], into[i]) for i in range(n - 1, -1, -1)])
+
+def _tree(gate: Callable, bits: List[Bit]) -> Bit:
+    # Balanced tree of two-input gates.
+    while len(bits) > 1:
+        nxt = [gate(bits[i], bits[i + 1]) for i in range(0, len(bits) - 1, 2)]
+        if len(bits) % 2:
+            nxt.append(bits[-1])
+        bits = nxt
+    return bits[0]
+
+def cla_add(a: Bits, b: Bits, cin: Bit = Bit.ZERO) -> Tuple[BitVector, Bit]:
+    a, b = tuple(a), tuple(b)
+    n = len(a)
+    gen = [g.and_gate(a[n - 1 - i], b[n - 1 - i]) for i in range(n)]
+    prop = [g.xor_gate(a[n - 1 - i], b[n - 1 - i]) for i in range(n)]
+    carries: List[Bit] = []
+    c0 = cin
+    for lo in range(0, n, BLOCK):
+        hi = min(lo + BLOCK, n)
+        for i in range(lo, hi):
+            # c[i+1] = g[i] | p[i]g[i-1] | ... | p[i]..p[lo] c0
+            terms = [gen[i]]
+            for j in range(i - 1, lo - 2, -1):
+                head = gen[j] if j >= lo else c0
+                terms.append(_tree(g.and_gate, prop[j + 1:i + 1] + [head]))
+            carries.append(_tree(g.or_gate, terms))
+        c0 = carries[-1]
+    return _sums(prop, carries, cin), carries[-1] if n else cin
+
+def _combine(gen: List[Bit], prop: List[Bit], i: int, j: int, keep_p: bool) -> None:
+    # Node i absorbs node j (the span just below it).
+    gen[i] = g.or_gate(gen[i], g.and_gate(prop[i], gen[j]))
+    if keep_p:
+        prop[i] = g.and_gate(prop[i], prop[j])
+
+def kogge_stone_add(a: Bits, b: Bits, cin: Bit = Bit.ZERO) -> Tuple[BitVector, Bit]:
+    gen, prop, sum_p = _gp(a, b, cin)
+    n = len(gen)
+    d = 1
+    while d < n:
+        for i in range(n - 1, d - 1, -1):   # downwards, so node i - d is still last level's
+            # node i now spans [i-2d+1, i]; its propagate matters only if
+            # that does not reach bit 0 and there is a next level
+            _combine(gen, prop, i, i - d, i >= 2 * d and 2 * d < n)
+        d *= 2
+    return _sums(sum_p, gen, cin), gen[-1] if n else cin
+
+def brent_kung_add(a: Bits, b: Bits, cin: Bit = Bit.ZERO) -> Tuple[BitVector, Bit]:
+    gen, prop, sum_p = _gp(a, b, cin)
+    n = len(gen)
+    d = 1
+    while 2 * d <= n:                       # up-sweep: node 2kd-1 spans 2d bits
+        for i in range(2 * d - 1, n, 2 * d):
+            _combine(gen, prop, i, i - d, i >= 2 * d)
+        d *= 2
+    while d > 1:                            # down-sweep: fill in the rest
+        d //= 2
+        for i in range(3 * d - 1, n, 2 * d):
+            _combine(gen, prop, i, i - d, False)
+    return _sums(sum_p, gen, cin), gen[-1] if n else cin
+
+_ADD_FNS: Dict[str, Callable] = {
+    "ripple": ripple_add,
+    "cla": cla_add,
+    "kogge-stone": kogge_stone_add,
+    "brent-kung": brent_kung_add,
+}
+
+_adder = DEFAULT_ADDER
+_add = ripple_add
+
+def add(a: Bits, b: Bits, cin: Bit = Bit.ZERO) -> Tuple[BitVector, Bit]:
+    # (sum, carry_out) of two equal-width bit vectors on the selected adder.
+    assert len(a) == len(b)
+    return _add(a, b, cin)
+
+def selected() -> str:
+    return _adder
+
+def select(kind: str) -> str:
+    # Switch the adder every unit uses; returns the previous one.
+    global _adder, _add
+    if kind not in _ADD_FNS:
+        raise ValueError(f"unknown adder {kind} (choose from {', '.join(ADDERS)})")
+    prev = _adder
+    _adder, _add = kind, _ADD_FNS[kind]
+    return prev
+
+class use:
+    # with adders.use("kogge-stone"): ... -- the previous adder is restored.
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._prev = None
+
+    def __enter__(self) -> use:
+        self._prev = select(self.kind)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        select(self._prev)
+
+# metrics
+
+def report(kind: Optional[str] = None, width: int = 32) -> Dict:
+    # Gate count (by type) and logic depth of a width-bit adder with carry-in
+    # 0 (constant gates folded), from its recorded netlist.
+    kind = kind or _adder
+    if kind not in _ADD_FNS:
+        raise ValueError(f"unknown adder {kind} (choose from {', '.join(ADDERS)})")
+    r = record(_ADD_FNS[kind], (width, width)).report()
+    return {"adder": kind, "width": width, "gates": r["gates"], "by_op": r["by_op"], "depth": r["depth"]}
+
+def compare(width: int = 32) -> List[Dict]:
+    return [report(kind, width) for kind in ADDERS]
+
+def report_json(width: int = 32) -> str:
+    return json.dumps(compare(width), indent=2)
+
+def report_text(width: int = 32) -> str:
+    lines = [f"{width}-bit adders:", f"  {'adder':<12} {'gates':>6} {'depth':>6}"]
+    for r in compare(width):
+        lines.append(f"  {r['adder']:<12} {r['gates']:>6} {r['depth']:>6}")
+    return "\n".join(lines) + "\n"
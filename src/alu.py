@@ -1,43 +1,36 @@
 from __future__ import annotations
-from typing import Tuple, Dict, List
-from memory import Bit, Bitx32, bits_zero, xor_bits, and_bits, or_bits, not_bits
+from typing import Tuple, Dict
+from memory import (Bit, BitVector, Bitx32, bits_zero, bits_one_hot_lsb, zero_extend,
+                    xor_bits, and_bits, or_bits, not_bits, or_reduce)
 from shifter import shift32
 import gates as g
+import adders
+
+try:
+    import numpy as np
+except ImportError:   # optional: exec_batch() falls back to a loop over lanes
+    np = None
 
 Bits = Tuple[Bit, ...]
 
-def _assert_32(v: Bits) -> Bits:
-    if len(v) != 32:
-        # zero-extend or trim to 32 (MSB-first)
-        if len(v) < 32:
-            pad = tuple(Bit(False) for _ in range(32 - len(v)))
-            return pad + tuple(v)
-        return tuple(v[-32:])
-    return tuple(v)
+def _assert_32(v: Bits) -> BitVector:
+    # zero-extend or trim to 32 (MSB-first)
+    return zero_extend(v, 32)
 
 
-def _ripple_add(a: Bits, b: Bits, cin: Bit = Bit(False)) -> Tuple[Bits, Bit]:
+def _ripple_add(a: Bits, b: Bits, cin: Bit = Bit.ZERO) -> Tuple[BitVector, Bit]:
     # Add two equal-width bit vectors (MSB-first). Returns (sum, carry_out).
-    assert len(a) == len(b)
-    n = len(a)
-    out: List[Bit] = [Bit(False)] * n
-    carry = cin
-    for i in range(n - 1, -1, -1):  # LSB -> MSB
-        s, carry = g.full_adder(a[i], b[i], carry)
-        out[i] = s
-    return tuple(out), carry
-
-def _twos_negate(b: Bits) -> Bits:
+    # The adder is the one selected in adders.py (ripple-carry by default).
+    return adders.add(a, b, cin)
+
+def _twos_negate(b: Bits) -> BitVector:
     inv = not_bits(b)
-    one = tuple(Bit(False) for _ in range(len(b) - 1)) + (Bit(True),)
+    one = bits_one_hot_lsb(len(b))
     s, _ = _ripple_add(inv, one)
     return s
 
 def _is_zero(v: Bits) -> bool:
-    acc = Bit(False)
-    for bit in v:
-        acc = g.or_gate(acc, bit)
-    return not bool(acc)
+    return not bool(or_reduce(v))
 
 def _barrel_shift_left(v: Bits, shamt5: Bits) -> Bits:
     # SLL using 5-stage barrel shifter; shamt5 are the least-significant 5 bits of a 32b word
@@ -51,7 +44,7 @@ def _barrel_shift_left(v: Bits, shamt5: Bits) -> Bits:
             for _ in range(amt):
                 for j in range(31):
                     out[j] = out[j + 1]
-                out[31] = Bit(False)
+                out[31] = Bit.ZERO
     return tuple(out)
 
 def _barrel_shift_right_logical(v: Bits, shamt5: Bits) -> Bits:
@@ -63,7 +56,7 @@ def _barrel_shift_right_logical(v: Bits, shamt5: Bits) -> Bits:
             for _ in range(amt):
                 for j in range(31, 0, -1):
                     out[j] = out[j - 1]
-                out[0] = Bit(False)
+                out[0] = Bit.ZERO
     return tuple(out)
 
 def _barrel_shift_right_arith(v: Bits, shamt5: Bits) -> Bits:
@@ -103,36 +96,139 @@ class ALU32:
             C = carry  # in two's-comp, C=1 implies no borrow
         elif op == "AND":
             res = and_bits(a, b)
-            C = Bit(False); V = Bit(False)
+            C = Bit.ZERO; V = Bit.ZERO
         elif op == "OR":
             res = or_bits(a, b)
-            C = Bit(False); V = Bit(False)
+            C = Bit.ZERO; V = Bit.ZERO
         elif op == "XOR":
             res = xor_bits(a, b)
-            C = Bit(False); V = Bit(False)
+            C = Bit.ZERO; V = Bit.ZERO
         elif op == "SLL":
             res = shift32(a, b, "SLL")
-            flags = {"N": bool(res[0]), "Z": all(not x for x in res), "C": False, "V": False}
+            flags = {"N": bool(res[0]), "Z": res.value == 0, "C": False, "V": False}
             return {"result": res, "flags": flags}
         elif op == "SRL":
             res = shift32(a, b, "SRL")
-            flags = {"N": bool(res[0]), "Z": all(not x for x in res), "C": False, "V": False}
+            flags = {"N": bool(res[0]), "Z": res.value == 0, "C": False, "V": False}
             return {"result": res, "flags": flags}
         elif op == "SRA":
             res = shift32(a, b, "SRA")
-            flags = {"N": bool(res[0]), "Z": all(not x for x in res), "C": False, "V": False}
+            flags = {"N": bool(res[0]), "Z": res.value == 0, "C": False, "V": False}
             return {"result": res, "flags": flags}
         else:
             # NOP/unknown: return zeros
             res = bits_zero(32)
-            C = Bit(False); V = Bit(False)
+            C = Bit.ZERO; V = Bit.ZERO
 
         N = res[0]
         Z = Bit(_is_zero(res))
         flags = {"N": bool(N), "Z": bool(Z), "C": bool(C), "V": bool(V)}
         return {"result": res, "flags": flags}
 
+    # Batched evaluation: one op over many operand pairs. rs1/rs2 are
+    # sequences of uint32 values (NumPy arrays, lists, array('I'); a scalar
+    # broadcasts). Returns {"result": ..., "flags": {"N", "Z", "C", "V"}} like
+    # exec, one entry per lane: with NumPy a uint32 array and bool arrays,
+    # otherwise lists of ints and bools (two scalars give one scalar result
+    # and scalar flags either way). Bit-exact with exec, including its
+    # corners: SUB's C is "no borrow" except for b == 0, where the two's-
+    # complement negation of b drops the carry, shifts use the low 5 bits of
+    # rs2, and an unknown op gives 0 with Z set.
+
+    def exec_batch(self, rs1, rs2, op: str) -> Dict[str, object]:
+        op = op.upper()
+        if np is not None:
+            return _exec_batch_numpy(rs1, rs2, op)
+        return _exec_batch_loop(rs1, rs2, op)
+
+
+def _u32_lanes(x):
+    # Operands wrap mod 2**32 as in the loop (negative and >= 2**32 ints
+    # included); Python ints past int64 arrive as an object array.
+    x = np.asarray(x)
+    if x.dtype.kind not in "iu":
+        x = np.asarray(np.asarray(x, dtype=object) & 0xFFFFFFFF, dtype=np.int64)
+    return x.astype(np.uint32)
+
+def _exec_batch_numpy(rs1, rs2, op: str) -> Dict[str, object]:
+    a, b = np.broadcast_arrays(_u32_lanes(rs1), _u32_lanes(rs2))
+    C = np.zeros(a.shape, dtype=bool)
+    V = np.zeros(a.shape, dtype=bool)
+    if op == "ADD":
+        wide = a.astype(np.uint64) + b
+        res = wide.astype(np.uint32)
+        C = (wide >> 32).astype(bool)
+        V = ((~(a ^ b) & (a ^ res)) >> 31).astype(bool)   # same-sign operands, sign flipped
+    elif op == "SUB":
+        res = a - b                                         # wraps mod 2**32
+        C = (a >= b) & (b != 0)
+        V = (((a ^ b) & (a ^ res)) >> 31).astype(bool)
+    elif op == "AND":
+        res = a & b
+    elif op == "OR":
+        res = a | b
+    elif op == "XOR":
+        res = a ^ b
+    elif op == "SLL":
+        res = a << (b & 31)
+    elif op == "SRL":
+        res = a >> (b & 31)
+    elif op == "SRA":
+        res = (a.view(np.int32) >> (b & 31).astype(np.int32)).view(np.uint32)
+    else:
+        res = np.zeros(a.shape, dtype=np.uint32)
+    flags = {"N": (res >> 31).astype(bool), "Z": res == 0, "C": C, "V": V}
+    return {"result": res, "flags": flags}
+
+def _exec_batch_loop(rs1, rs2, op: str) -> Dict[str, object]:
+    # Same lane formulas on plain ints.
+    if isinstance(rs1, int) and isinstance(rs2, int):
+        # one lane, unwrapped like NumPy's 0-d result
+        out = _exec_batch_loop([rs1], [rs2], op)
+        return {"result": out["result"][0], "flags": {k: v[0] for k, v in out["flags"].items()}}
+    if isinstance(rs1, int):
+        rs1 = [rs1] * len(rs2)
+    if isinstance(rs2, int):
+        rs2 = [rs2] * len(rs1)
+    if len(rs1) != len(rs2):
+        raise ValueError("operand arrays differ in length")
+    res, C, V = [], [], []
+    for a, b in zip(rs1, rs2):
+        a &= 0xFFFFFFFF
+        b &= 0xFFFFFFFF
+        c = v = False
+        if op == "ADD":
+            r = (a + b) & 0xFFFFFFFF
+            c = a + b > 0xFFFFFFFF
+            v = bool(~(a ^ b) & (a ^ r) & 0x80000000)
+        elif op == "SUB":
+            r = (a - b) & 0xFFFFFFFF
+            c = a >= b and b != 0
+            v = bool((a ^ b) & (a ^ r) & 0x80000000)
+        elif op == "AND":
+            r = a & b
+        elif op == "OR":
+            r = a | b
+        elif op == "XOR":
+            r = a ^ b
+        elif op == "SLL":
+            r = (a << (b & 31)) & 0xFFFFFFFF
+        elif op == "SRL":
+            r = a >> (b & 31)
+        elif op == "SRA":
+            r = ((a - ((a & 0x80000000) << 1)) >> (b & 31)) & 0xFFFFFFFF
+        else:
+            r = 0
+        res.append(r)
+        C.append(c)
+        V.append(v)
+    flags = {"N": [r >> 31 == 1 for r in res], "Z": [r == 0 for r in res], "C": C, "V": V}
+    return {"result": res, "flags": flags}
+
 
 def alu32(rs1: Bits, rs2: Bits, op: str) -> Dict[str, object]:
     # Wrapper used for test
-    return ALU32().exec(rs1, rs2, op)
\ No newline at end of file
+    return ALU32().exec(rs1, rs2, op)
+
+def alu32_batch(rs1, rs2, op: str) -> Dict[str, object]:
+    return ALU32().exec_batch(rs1, rs2, op)
\ No newline at end of file
@@ -0,0 +1,79 @@
+from __future__ import annotations
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional
+from elf import is_elf
+from ram import MemoryFault, digest
+from runner import run_hex, run_elf
+
+# Batch runner: many program images fanned out over worker processes.
+# Each image runs in a fresh simulator and produces one JSON-able record:
+#   {"path", "halt", "pc", "steps", "regs", "mem"}   (mem = ram.digest)
+# or {"path", "error"} if the image could not be loaded/run.
+# Images are handed to workers in chunks so thousands of small runs do not
+# pay one IPC round trip each.
+
+IMAGE_SUFFIXES = (".hex", ".elf")
+DEFAULT_CHUNK = 8
+RUN_MODES = ("interp", "block", "gate")
+
+def run_one(path: str, max_steps: int = 1000, mode: str = "interp") -> Dict:
+    try:
+        run = run_elf if is_elf(path) else run_hex
+        out = run(path, max_steps=max_steps, mode=mode)
+    except (OSError, ValueError, MemoryFault) as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}"}
+    return {
+        "path": path,
+        "halt": out["halt"],
+        "pc": out["pc"],
+        "steps": out["steps"],
+        "regs": out["regs"],
+        "mem": digest(out["mem"]),
+    }
+
+def _run_chunk(paths: List[str], max_steps: int, mode: str) -> List[Dict]:
+    return [run_one(p, max_steps, mode) for p in paths]
+
+def collect_images(target: str) -> List[str]:
+    # A directory (every *.hex / *.elf in it, sorted) or a manifest file with
+    # one image path per line; '#' starts a comment and relative paths are
+    # taken relative to the manifest.
+    if os.path.isdir(target):
+        names = sorted(n for n in os.listdir(target) if n.endswith(IMAGE_SUFFIXES))
+        return [os.path.join(target, n) for n in names]
+    base = os.path.dirname(target)
+    out = []
+    with open(target, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                out.append(line if os.path.isabs(line) else os.path.join(base, line))
+    return out
+
+def run_batch(paths: Iterable[str], max_steps: int = 1000, mode: str = "interp",
+              jobs: Optional[int] = None, chunk: int = DEFAULT_CHUNK,
+              ordered: bool = True) -> Iterator[Dict]:
+    # Yield one record per image as results come back. ordered=False yields
+    # chunks in completion order instead of input order. jobs=1 runs inline.
+    if mode not in RUN_MODES:
+        raise ValueError(f"unknown run mode {mode}")
+    paths = list(paths)
+    if jobs == 1 or len(paths) <= 1:
+        for p in paths:
+            yield run_one(p, max_steps, mode)
+        return
+    chunks = [paths[i:i + chunk] for i in range(0, len(paths), chunk)]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(_run_chunk, c, max_steps, mode) for c in chunks]
+        for fut in (futures if ordered else as_completed(futures)):
+            yield from fut.result()
+
+def write_jsonl(records: Iterable[Dict], out) -> int:
+    n = 0
+    for rec in records:
+        out.write(json.dumps(rec) + "\n")
+        out.flush()
+        n += 1
+    return n
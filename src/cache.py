@@ -0,0 +1,256 @@
+from __future__ import annotations
+import json
+import random
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from tracebuf import TraceBuffer
+
+try:
+    import numpy as np
+except ImportError:   # optional: replay() falls back to the plain loop
+    np = None
+
+# Set-associative cache model (tags and timing-free hit/miss accounting only;
+# data stays in the memory backend). Write-back, write-allocate.
+#
+# The tag store is flat arrays indexed by set * ways + way: tags (line
+# number, -1 = invalid), dirty bits, and per policy an LRU stamp per way or
+# one tree-PLRU word per set. A lookup is one array.index() over the set.
+#
+# Caches run inline with the runner (run_hex(..., caches=L1(...))) or replay
+# an address trace after the fact. Re-touching the line a set touched last
+# never changes LRU/PLRU state, so both paths count such repeats as hits
+# without simulating them; replay() with NumPy goes further and groups the
+# trace by set first, which gives the same counts for LRU and PLRU (random
+# replacement draws in a different order, so its counts can differ).
+
+POLICIES = ("lru", "plru", "random")
+
+def _log2(n: int, what: str) -> int:
+    if n <= 0 or n & (n - 1):
+        raise ValueError(f"{what} must be a power of two")
+    return n.bit_length() - 1
+
+class Cache:
+    def __init__(self, size: int = 32 * 1024, ways: int = 4, line: int = 64,
+                 policy: str = "lru", name: str = "cache", seed: int = 0):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown replacement policy {policy}")
+        self.line_shift = _log2(line, "line size")
+        self.way_bits = _log2(ways, "ways")
+        if policy == "plru" and ways > 64:
+            raise ValueError("plru supports at most 64 ways")
+        if size % (ways * line):
+            raise ValueError("size must be a multiple of ways * line size")
+        self.set_bits = _log2(size // (ways * line), "number of sets")
+        self.size, self.ways, self.line, self.policy, self.name = size, ways, line, policy, name
+        self.lru = policy == "lru"
+        self.plru = policy == "plru"
+        self.sets = 1 << self.set_bits
+        self.set_mask = self.sets - 1
+        n = self.sets * ways
+        self.tags = array("q", [-1]) * n
+        self.dirty = array("B", bytes(n))
+        self.stamp = array("Q", bytes(8 * n))       # lru: last-use clock per way
+        self.tree = array("Q", bytes(8 * self.sets))  # plru: ways-1 bits per set
+        self.clock = 0
+        self.rng = random.Random(seed)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writebacks = 0
+
+    def describe(self) -> str:
+        size = f"{self.size // 1024}KiB" if self.size % 1024 == 0 else f"{self.size}B"
+        return f"{self.name} {size} {self.ways}-way {self.line}B {self.policy}"
+
+    # lookup
+
+    def access(self, addr: int, write: bool = False) -> bool:
+        return self.access_line(addr >> self.line_shift, write)
+
+    def access_line(self, line: int, write: bool = False) -> bool:
+        base = (line & self.set_mask) << self.way_bits
+        try:
+            i = self.tags.index(line, base, base + self.ways)
+        except ValueError:
+            self._fill(line, base, write)
+            return False
+        self.hits += 1
+        if write:
+            self.dirty[i] = 1
+        if self.lru:
+            self.clock += 1
+            self.stamp[i] = self.clock
+        elif self.plru:
+            self._plru_touch(base, i - base)
+        return True
+
+    def _fill(self, line: int, base: int, write: bool) -> None:
+        self.misses += 1
+        i = self._victim(base)
+        if self.tags[i] >= 0:
+            self.evictions += 1
+            if self.dirty[i]:
+                self.writebacks += 1
+        self.tags[i] = line
+        self.dirty[i] = 1 if write else 0
+        if self.lru:
+            self.clock += 1
+            self.stamp[i] = self.clock
+        elif self.plru:
+            self._plru_touch(base, i - base)
+
+    def _victim(self, base: int) -> int:
+        try:
+            return self.tags.index(-1, base, base + self.ways)   # free way first
+        except ValueError:
+            pass
+        if self.lru:
+            stamp = self.stamp
+            return min(range(base, base + self.ways), key=stamp.__getitem__)
+        if self.plru:
+            bits = self.tree[base >> self.way_bits]
+            node = 1
+            for _ in range(self.way_bits):
+                node = 2 * node + ((bits >> node) & 1)
+            return base + node - self.ways
+        return base + self.rng.randrange(self.ways)
+
+    def _plru_touch(self, base: int, way: int) -> None:
+        # Tree nodes 1..ways-1 (heap order); each bit points at the half to
+        # evict next, so point every node on the path away from this way.
+        s = base >> self.way_bits
+        bits = self.tree[s]
+        node = 1
+        for level in range(self.way_bits - 1, -1, -1):
+            b = (way >> level) & 1
+            if b:
+                bits &= ~(1 << node)
+            else:
+                bits |= 1 << node
+            node = 2 * node + b
+        self.tree[s] = bits
+
+    # bulk replay
+
+    def replay(self, addrs: Sequence[int], writes: Optional[Sequence[int]] = None) -> None:
+        # Run an address trace (and optional per-access write flags) through
+        # the cache. Uses NumPy when it is installed.
+        if np is not None and len(addrs):
+            self._replay_numpy(addrs, writes)
+            return
+        shift = self.line_shift
+        access = self.access_line
+        last = -1
+        repeats = 0
+        for k, a in enumerate(addrs):
+            w = bool(writes[k]) if writes is not None else False
+            line = a >> shift
+            if line == last and not w:
+                repeats += 1
+                continue
+            access(line, w)
+            last = line
+        self.hits += repeats
+
+    def _replay_numpy(self, addrs, writes) -> None:
+        lines = np.asarray(addrs, dtype=np.int64) >> self.line_shift
+        order = np.argsort(lines & self.set_mask, kind="stable")
+        lines = lines[order]
+        heads = np.flatnonzero(np.concatenate(([True], lines[1:] != lines[:-1])))
+        if writes is None:
+            wr = np.zeros(len(heads), dtype=bool)
+        else:
+            wr = np.logical_or.reduceat(np.asarray(writes, dtype=bool)[order], heads)
+        self.hits += len(lines) - len(heads)
+        access = self.access_line
+        for line, w in zip(lines[heads].tolist(), wr.tolist()):
+            access(line, w)
+
+    # results
+
+    @property
+    def accesses(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.accesses if self.accesses else 0.0
+
+    def report(self) -> Dict:
+        return {
+            "cache": self.describe(),
+            "accesses": self.accesses,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "writebacks": self.writebacks,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+    def report_text(self) -> str:
+        r = self.report()
+        return (f"{r['cache']}: {r['accesses']} accesses, {r['hits']} hits, "
+                f"{r['misses']} misses ({100 * r['hit_rate']:.2f}% hit), "
+                f"{r['evictions']} evictions, {r['writebacks']} writebacks\n")
+
+class L1:
+    # Split instruction/data caches for an inline run; either may be None.
+    def __init__(self, icache: Optional[Cache] = None, dcache: Optional[Cache] = None):
+        self.icache = icache
+        self.dcache = dcache
+
+    def caches(self) -> List[Cache]:
+        return [c for c in (self.icache, self.dcache) if c is not None]
+
+    def report(self) -> List[Dict]:
+        return [c.report() for c in self.caches()]
+
+    def report_json(self) -> str:
+        return json.dumps(self.report(), indent=2)
+
+    def report_text(self) -> str:
+        return "".join(c.report_text() for c in self.caches())
+
+def parse_cache_spec(spec: str, name: str = "cache") -> Cache:
+    # "SIZE:WAYS:LINE[:POLICY]", SIZE may end in k/K, e.g. "32k:4:64:plru"
+    parts = spec.split(":")
+    if not 3 <= len(parts) <= 4:
+        raise ValueError(f"cache spec {spec!r}: expected SIZE:WAYS:LINE[:POLICY]")
+    size = parts[0].lower()
+    size = int(size[:-1]) * 1024 if size.endswith("k") else int(size)
+    policy = parts[3] if len(parts) == 4 else "lru"
+    return Cache(size, int(parts[1]), int(parts[2]), policy, name)
+
+# traces
+
+_LOAD_OPS = (0x03, 0x07)
+_STORE_OPS = (0x23, 0x27)
+
+def trace_streams(tb: TraceBuffer) -> Tuple[array, array, array]:
+    # Split a recorded trace into (fetch pcs, data addresses, data write flags).
+    fetch = array("I")
+    data = array("I")
+    write = array("B")
+    for r in tb.records():
+        fetch.append(r.pc)
+        op = r.inst & 0x7F
+        if op in _LOAD_OPS:
+            data.append(r.addr)
+            write.append(0)
+        elif op in _STORE_OPS:
+            data.append(r.addr)
+            write.append(1)
+    return fetch, data, write
+
+def sweep(addrs: Sequence[int], configs: Iterable[Tuple], writes: Optional[Sequence[int]] = None) -> List[Dict]:
+    # Replay one trace through each (size, ways, line[, policy]) configuration.
+    if np is not None:
+        addrs = np.asarray(addrs, dtype=np.int64)   # convert once for every config
+    out = []
+    for cfg in configs:
+        c = Cache(*cfg)
+        c.replay(addrs, writes)
+        out.append(c.report())
+    return out
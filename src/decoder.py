@@ -0,0 +1,568 @@
+from __future__ import annotations
+import struct
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+# Decode stage for the host-side runner (RV32IM plus a small RV32F subset:
+# flw/fsw, fadd.s/fsub.s/fmul.s and fmv.x.w/fmv.w.x).
+# Each program word is decoded once into a Decoded record: a bound handler plus
+# pre-extracted register indices and a pre-processed immediate. The execute
+# loop in runner.py then only unpacks the record and calls the handler.
+#
+# Decoding is table driven: OPS maps (opcode, funct3, funct7) to a handler,
+# with None as a wildcard for formats that do not use funct3/funct7. A lookup
+# tries the most specific key first, so cost does not grow with the table.
+#
+# Handler signature: fn(regs, mem, pc, rd, rs1, rs2, imm) -> next_pc
+# where mem is a memory backend from ram.py (read_u8/u16/u32, write_u8/u16/u32).
+#
+# Writes to x0 are steered into a scratch slot (X0_SINK) instead of index 0, so
+# handlers never need an "rd != 0" test and x0 always reads as zero.
+# Float registers f0..f31 live in the same list at FREG + n (raw IEEE-754
+# single bits); decode offsets FP operand fields, so handlers just index regs.
+
+M32 = 0xFFFFFFFF
+SIGN32 = 0x80000000
+X0_SINK = 32          # slot 32 swallows writes to x0
+FREG = 33             # f0..f31 are regs[33..64]
+NREGS = FREG + 32
+
+class Decoded(NamedTuple):
+    fn: Optional[Callable]  # None -> runner stops (illegal, ecall, ebreak)
+    rd: int
+    rs1: int
+    rs2: int
+    imm: int
+    name: str
+    inst: int
+
+def _sign_extend(val: int, bits: int) -> int:
+    m = 1 << (bits - 1)
+    val = val & ((1 << bits) - 1)
+    return (val ^ m) - m
+
+# Immediate formats
+
+def imm_i(inst: int) -> int:
+    return _sign_extend(inst >> 20, 12)
+
+def imm_s(inst: int) -> int:
+    return _sign_extend(((inst >> 7) & 0x1F) | (((inst >> 25) & 0x7F) << 5), 12)
+
+def imm_b(inst: int) -> int:
+    return _sign_extend(
+        ((inst >> 7) & 0x1) << 11 |
+        ((inst >> 8) & 0xF) << 1  |
+        ((inst >> 25) & 0x3F) << 5 |
+        ((inst >> 31) & 0x1) << 12, 13)
+
+def imm_u(inst: int) -> int:
+    return inst & 0xFFFFF000
+
+def imm_j(inst: int) -> int:
+    return _sign_extend(
+        ((inst >> 21) & 0x3FF) << 1 |
+        ((inst >> 20) & 0x1) << 11  |
+        ((inst >> 12) & 0xFF) << 12 |
+        ((inst >> 31) & 0x1) << 20, 21)
+
+def shamt(inst: int) -> int:
+    return (inst >> 20) & 0x1F
+
+def reg_name(i: int) -> str:
+    # Name of a regs[] index as decoded (x0 sink prints as x0).
+    if i >= FREG:
+        return f"f{i - FREG}"
+    return "x0" if i == X0_SINK else f"x{i}"
+
+# Handlers: register-register / register-immediate
+# Immediates for the logic/compare ops are pre-masked (and pre-biased for SLTI)
+# at decode time, see _PREP below.
+
+def _add(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = (regs[rs1] + regs[rs2]) & M32
+    return pc + 4
+
+def _sub(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = (regs[rs1] - regs[rs2]) & M32
+    return pc + 4
+
+def _sll(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = (regs[rs1] << (regs[rs2] & 31)) & M32
+    return pc + 4
+
+def _slt(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = 1 if (regs[rs1] ^ SIGN32) < (regs[rs2] ^ SIGN32) else 0
+    return pc + 4
+
+def _sltu(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = 1 if regs[rs1] < regs[rs2] else 0
+    return pc + 4
+
+def _xor(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = regs[rs1] ^ regs[rs2]
+    return pc + 4
+
+def _srl(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = regs[rs1] >> (regs[rs2] & 31)
+    return pc + 4
+
+def _sra(regs, mem, pc, rd, rs1, rs2, imm):
+    v = regs[rs1]
+    regs[rd] = (((v ^ SIGN32) - SIGN32) >> (regs[rs2] & 31)) & M32
+    return pc + 4
+
+def _or(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = regs[rs1] | regs[rs2]
+    return pc + 4
+
+def _and(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = regs[rs1] & regs[rs2]
+    return pc + 4
+
+def _addi(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = (regs[rs1] + imm) & M32
+    return pc + 4
+
+def _slti(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = 1 if (regs[rs1] ^ SIGN32) < imm else 0
+    return pc + 4
+
+def _sltiu(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = 1 if regs[rs1] < imm else 0
+    return pc + 4
+
+def _xori(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = regs[rs1] ^ imm
+    return pc + 4
+
+def _ori(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = regs[rs1] | imm
+    return pc + 4
+
+def _andi(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = regs[rs1] & imm
+    return pc + 4
+
+def _slli(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = (regs[rs1] << imm) & M32
+    return pc + 4
+
+def _srli(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = regs[rs1] >> imm
+    return pc + 4
+
+def _srai(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = (((regs[rs1] ^ SIGN32) - SIGN32) >> imm) & M32
+    return pc + 4
+
+def _lui(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = imm
+    return pc + 4
+
+def _auipc(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = (pc + imm) & M32
+    return pc + 4
+
+def _fence(regs, mem, pc, rd, rs1, rs2, imm):
+    # Single in-order hart, and each code word is decoded once on first fetch
+    # (CodeCache): FENCE and FENCE.I have nothing to order or flush, and code
+    # rewritten after it ran is not picked up.
+    return pc + 4
+
+# Handlers: loads / stores
+
+def _lb(regs, mem, pc, rd, rs1, rs2, imm):
+    v = mem.read_u8((regs[rs1] + imm) & M32)
+    regs[rd] = ((v ^ 0x80) - 0x80) & M32
+    return pc + 4
+
+def _lh(regs, mem, pc, rd, rs1, rs2, imm):
+    v = mem.read_u16((regs[rs1] + imm) & M32)
+    regs[rd] = ((v ^ 0x8000) - 0x8000) & M32
+    return pc + 4
+
+def _lw(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = mem.read_u32((regs[rs1] + imm) & M32)
+    return pc + 4
+
+def _lbu(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = mem.read_u8((regs[rs1] + imm) & M32)
+    return pc + 4
+
+def _lhu(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = mem.read_u16((regs[rs1] + imm) & M32)
+    return pc + 4
+
+def _sb(regs, mem, pc, rd, rs1, rs2, imm):
+    mem.write_u8((regs[rs1] + imm) & M32, regs[rs2])
+    return pc + 4
+
+def _sh(regs, mem, pc, rd, rs1, rs2, imm):
+    mem.write_u16((regs[rs1] + imm) & M32, regs[rs2])
+    return pc + 4
+
+def _sw(regs, mem, pc, rd, rs1, rs2, imm):
+    mem.write_u32((regs[rs1] + imm) & M32, regs[rs2])
+    return pc + 4
+
+# Handlers: RV32M
+
+def _s32(v: int) -> int:
+    return (v ^ SIGN32) - SIGN32
+
+def _mul(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = (regs[rs1] * regs[rs2]) & M32
+    return pc + 4
+
+def _mulh(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = ((_s32(regs[rs1]) * _s32(regs[rs2])) >> 32) & M32
+    return pc + 4
+
+def _mulhsu(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = ((_s32(regs[rs1]) * regs[rs2]) >> 32) & M32
+    return pc + 4
+
+def _mulhu(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = (regs[rs1] * regs[rs2]) >> 32
+    return pc + 4
+
+def _div(regs, mem, pc, rd, rs1, rs2, imm):
+    # x/0 = -1 and INT_MIN/-1 = INT_MIN, as the spec requires
+    a, b = _s32(regs[rs1]), _s32(regs[rs2])
+    if b == 0:
+        regs[rd] = M32
+    else:
+        q = abs(a) // abs(b)
+        regs[rd] = (-q if (a < 0) != (b < 0) else q) & M32
+    return pc + 4
+
+def _divu(regs, mem, pc, rd, rs1, rs2, imm):
+    b = regs[rs2]
+    regs[rd] = regs[rs1] // b if b else M32
+    return pc + 4
+
+def _rem(regs, mem, pc, rd, rs1, rs2, imm):
+    # x%0 = x and INT_MIN%-1 = 0; the sign follows the dividend
+    a, b = _s32(regs[rs1]), _s32(regs[rs2])
+    if b == 0:
+        regs[rd] = regs[rs1]
+    else:
+        r = abs(a) % abs(b)
+        regs[rd] = (-r if a < 0 else r) & M32
+    return pc + 4
+
+def _remu(regs, mem, pc, rd, rs1, rs2, imm):
+    b = regs[rs2]
+    regs[rd] = regs[rs1] % b if b else regs[rs1]
+    return pc + 4
+
+# Handlers: RV32F subset
+# Host doubles are exact for one float32 +, - or *, so rounding the double
+# result to single (struct "<f", round-to-nearest-even) gives the correctly
+# rounded answer. The rm field is ignored (always RNE) and fflags are not
+# tracked on this path. NaN results are the canonical 0x7FC00000.
+
+CANONICAL_NAN = 0x7FC00000
+_F32 = struct.Struct("<f")
+_U32 = struct.Struct("<I")
+
+def f32_from_bits(v: int) -> float:
+    return _F32.unpack(_U32.pack(v))[0]
+
+def f32_to_bits(x: float) -> int:
+    if x != x:
+        return CANONICAL_NAN
+    try:
+        return _U32.unpack(_F32.pack(x))[0]
+    except OverflowError:   # rounds past FLT_MAX
+        return 0xFF800000 if x < 0 else 0x7F800000
+
+def _fadd_s(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = f32_to_bits(f32_from_bits(regs[rs1]) + f32_from_bits(regs[rs2]))
+    return pc + 4
+
+def _fsub_s(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = f32_to_bits(f32_from_bits(regs[rs1]) - f32_from_bits(regs[rs2]))
+    return pc + 4
+
+def _fmul_s(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = f32_to_bits(f32_from_bits(regs[rs1]) * f32_from_bits(regs[rs2]))
+    return pc + 4
+
+def _fmv(regs, mem, pc, rd, rs1, rs2, imm):
+    # fmv.x.w / fmv.w.x: raw bit move between the register files
+    regs[rd] = regs[rs1]
+    return pc + 4
+
+# Handlers: control transfer
+
+def _beq(regs, mem, pc, rd, rs1, rs2, imm):
+    if regs[rs1] == regs[rs2]:
+        return (pc + imm) & M32
+    return pc + 4
+
+def _bne(regs, mem, pc, rd, rs1, rs2, imm):
+    if regs[rs1] != regs[rs2]:
+        return (pc + imm) & M32
+    return pc + 4
+
+def _blt(regs, mem, pc, rd, rs1, rs2, imm):
+    if (regs[rs1] ^ SIGN32) < (regs[rs2] ^ SIGN32):
+        return (pc + imm) & M32
+    return pc + 4
+
+def _bge(regs, mem, pc, rd, rs1, rs2, imm):
+    if (regs[rs1] ^ SIGN32) >= (regs[rs2] ^ SIGN32):
+        return (pc + imm) & M32
+    return pc + 4
+
+def _bltu(regs, mem, pc, rd, rs1, rs2, imm):
+    if regs[rs1] < regs[rs2]:
+        return (pc + imm) & M32
+    return pc + 4
+
+def _bgeu(regs, mem, pc, rd, rs1, rs2, imm):
+    if regs[rs1] >= regs[rs2]:
+        return (pc + imm) & M32
+    return pc + 4
+
+def _jal(regs, mem, pc, rd, rs1, rs2, imm):
+    regs[rd] = (pc + 4) & M32
+    return (pc + imm) & M32
+
+def _jalr(regs, mem, pc, rd, rs1, rs2, imm):
+    target = (regs[rs1] + imm) & 0xFFFFFFFE
+    regs[rd] = (pc + 4) & M32
+    return target
+
+# Dispatch table: (opcode, funct3, funct7) -> (name, handler, format)
+# Formats: R, I, IS (shift-immediate), S, B, U, J, F (fence, no operands)
+# funct3 of OP-FP is the rounding mode, so those entries wildcard it.
+
+OPS: Dict[Tuple[int, Optional[int], Optional[int]], Tuple[str, Callable, str]] = {
+    (0x37, None, None): ("lui",   _lui,   "U"),
+    (0x17, None, None): ("auipc", _auipc, "U"),
+    (0x6F, None, None): ("jal",   _jal,   "J"),
+    (0x67, 0x0, None):  ("jalr",  _jalr,  "I"),
+
+    (0x63, 0x0, None): ("beq",  _beq,  "B"),
+    (0x63, 0x1, None): ("bne",  _bne,  "B"),
+    (0x63, 0x4, None): ("blt",  _blt,  "B"),
+    (0x63, 0x5, None): ("bge",  _bge,  "B"),
+    (0x63, 0x6, None): ("bltu", _bltu, "B"),
+    (0x63, 0x7, None): ("bgeu", _bgeu, "B"),
+
+    (0x03, 0x0, None): ("lb",  _lb,  "I"),
+    (0x03, 0x1, None): ("lh",  _lh,  "I"),
+    (0x03, 0x2, None): ("lw",  _lw,  "I"),
+    (0x03, 0x4, None): ("lbu", _lbu, "I"),
+    (0x03, 0x5, None): ("lhu", _lhu, "I"),
+
+    (0x23, 0x0, None): ("sb", _sb, "S"),
+    (0x23, 0x1, None): ("sh", _sh, "S"),
+    (0x23, 0x2, None): ("sw", _sw, "S"),
+
+    (0x13, 0x0, None): ("addi",  _addi,  "I"),
+    (0x13, 0x2, None): ("slti",  _slti,  "I"),
+    (0x13, 0x3, None): ("sltiu", _sltiu, "I"),
+    (0x13, 0x4, None): ("xori",  _xori,  "I"),
+    (0x13, 0x6, None): ("ori",   _ori,   "I"),
+    (0x13, 0x7, None): ("andi",  _andi,  "I"),
+    (0x13, 0x1, 0x00): ("slli",  _slli,  "IS"),
+    (0x13, 0x5, 0x00): ("srli",  _srli,  "IS"),
+    (0x13, 0x5, 0x20): ("srai",  _srai,  "IS"),
+
+    (0x33, 0x0, 0x00): ("add",  _add,  "R"),
+    (0x33, 0x0, 0x20): ("sub",  _sub,  "R"),
+    (0x33, 0x1, 0x00): ("sll",  _sll,  "R"),
+    (0x33, 0x2, 0x00): ("slt",  _slt,  "R"),
+    (0x33, 0x3, 0x00): ("sltu", _sltu, "R"),
+    (0x33, 0x4, 0x00): ("xor",  _xor,  "R"),
+    (0x33, 0x5, 0x00): ("srl",  _srl,  "R"),
+    (0x33, 0x5, 0x20): ("sra",  _sra,  "R"),
+    (0x33, 0x6, 0x00): ("or",   _or,   "R"),
+    (0x33, 0x7, 0x00): ("and",  _and,  "R"),
+
+    (0x0F, 0x0, None): ("fence",   _fence, "F"),
+    (0x0F, 0x1, None): ("fence.i", _fence, "F"),
+
+    (0x33, 0x0, 0x01): ("mul",    _mul,    "R"),
+    (0x33, 0x1, 0x01): ("mulh",   _mulh,   "R"),
+    (0x33, 0x2, 0x01): ("mulhsu", _mulhsu, "R"),
+    (0x33, 0x3, 0x01): ("mulhu",  _mulhu,  "R"),
+    (0x33, 0x4, 0x01): ("div",    _div,    "R"),
+    (0x33, 0x5, 0x01): ("divu",   _divu,   "R"),
+    (0x33, 0x6, 0x01): ("rem",    _rem,    "R"),
+    (0x33, 0x7, 0x01): ("remu",   _remu,   "R"),
+
+    (0x07, 0x2, None): ("flw", _lw, "I"),
+    (0x27, 0x2, None): ("fsw", _sw, "S"),
+    (0x53, None, 0x00): ("fadd.s",  _fadd_s, "R"),
+    (0x53, None, 0x04): ("fsub.s",  _fsub_s, "R"),
+    (0x53, None, 0x08): ("fmul.s",  _fmul_s, "R"),
+    (0x53, 0x0, 0x70):  ("fmv.x.w", _fmv,    "R"),
+    (0x53, 0x0, 0x78):  ("fmv.w.x", _fmv,    "R"),
+}
+
+# Which of (rd, rs1, rs2) name float registers
+FP_OPERANDS: Dict[str, Tuple[bool, bool, bool]] = {
+    "flw":     (True,  False, False),
+    "fsw":     (False, False, True),
+    "fadd.s":  (True,  True,  True),
+    "fsub.s":  (True,  True,  True),
+    "fmul.s":  (True,  True,  True),
+    "fmv.x.w": (False, True,  False),
+    "fmv.w.x": (True,  False, False),
+}
+UNARY = {"fmv.x.w", "fmv.w.x"}   # R-format but rs2 is a fixed 0
+
+# Decode-time immediate preparation, keyed by mnemonic; default is by format.
+_IMM_BY_FORMAT: Dict[str, Callable[[int], int]] = {
+    "I": imm_i, "IS": shamt, "S": imm_s, "B": imm_b, "U": imm_u, "J": imm_j,
+    "R": lambda inst: 0, "F": lambda inst: 0,
+}
+
+_PREP: Dict[str, Callable[[int], int]] = {
+    "slti":  lambda imm: (imm & M32) ^ SIGN32,
+    "sltiu": lambda imm: imm & M32,
+    "xori":  lambda imm: imm & M32,
+    "ori":   lambda imm: imm & M32,
+    "andi":  lambda imm: imm & M32,
+}
+
+# Formats that write rd
+_WRITES_RD = {"R", "I", "IS", "U", "J"}
+
+def lookup(opcode: int, funct3: int, funct7: int):
+    return (OPS.get((opcode, funct3, funct7))
+            or OPS.get((opcode, funct3, None))
+            or OPS.get((opcode, None, funct7))
+            or OPS.get((opcode, None, None)))
+
+def decode(inst: int) -> Decoded:
+    inst &= M32
+    opcode = inst & 0x7F
+    rd     = (inst >> 7) & 0x1F
+    funct3 = (inst >> 12) & 0x7
+    rs1    = (inst >> 15) & 0x1F
+    rs2    = (inst >> 20) & 0x1F
+    funct7 = (inst >> 25) & 0x7F
+
+    if opcode == 0x73 and funct3 == 0 and rd == 0 and rs1 == 0 and funct7 == 0 and rs2 in (0, 1):
+        return Decoded(None, 0, 0, 0, 0, "ecall" if rs2 == 0 else "ebreak", inst)
+
+    spec = lookup(opcode, funct3, funct7)
+    if spec is None:
+        return Decoded(None, 0, 0, 0, 0, "illegal", inst)
+    name, fn, fmt = spec
+    if name in UNARY and rs2 != 0:
+        return Decoded(None, 0, 0, 0, 0, "illegal", inst)
+
+    imm = _IMM_BY_FORMAT[fmt](inst)
+    prep = _PREP.get(name)
+    if prep is not None:
+        imm = prep(imm)
+    if fmt in _WRITES_RD:
+        rd = rd if rd else X0_SINK
+    else:
+        rd = 0
+    if fmt in ("U", "J", "F"):
+        rs1 = 0
+    if fmt not in ("R", "S", "B") or name in UNARY:
+        rs2 = 0
+    fp = FP_OPERANDS.get(name)
+    if fp is not None:
+        if fp[0]:
+            rd = FREG + (inst >> 7 & 0x1F)   # f0 is a real register
+        if fp[1]:
+            rs1 += FREG
+        if fp[2]:
+            rs2 += FREG
+    return Decoded(fn, rd, rs1, rs2, imm, name, inst)
+
+def is_self_jump(d: Decoded) -> bool:
+    # jal x0, 0 -- the idiom the sample program uses to halt
+    return d.fn is _jal and d.rd == X0_SINK and d.imm == 0
+
+def predecode(words) -> list:
+    return [decode(w) for w in words]
+
+class CodeCache(dict):
+    # pc -> Decoded for the code the runner fetches. Words are read from memory
+    # and decoded the first time their pc is fetched; a pc outside the
+    # executable ranges, or not word aligned, maps to None.
+    # Being a dict, a hit is a plain code[pc] lookup in the execute loop.
+    # blocks holds the block runner's translations of this code
+    # (translate.BlockCache), so they outlive one run; clear() drops both.
+
+    def __init__(self, mem, ranges):
+        super().__init__()
+        self.mem = mem
+        self.ranges = [(lo, hi) for lo, hi in ranges]
+        self.blocks = None
+
+    def clear(self) -> None:
+        super().clear()
+        self.blocks = None
+
+    def __missing__(self, pc: int) -> Optional[Decoded]:
+        d = None
+        if not pc & 3:
+            for lo, hi in self.ranges:
+                if lo <= pc and pc + 4 <= hi:
+                    d = decode(self.mem.read_u32(pc))
+                    break
+        self[pc] = d
+        return d
+
+_FORMAT: Dict[str, str] = {name: fmt for name, _fn, fmt in OPS.values()}
+
+def op_format(name: str) -> Optional[str]:
+    return _FORMAT.get(name)
+
+# What the traced loop records per handler: TK_REG (value = rd),
+# TK_LOAD / TK_STORE (addr = effective address; a store's value is rs2) and
+# TK_JUMP (addr = next pc, value = link register).
+TK_REG, TK_LOAD, TK_STORE, TK_JUMP = 0, 1, 2, 3
+TRACE_KIND: Dict[Callable, int] = {}
+for _name, _fn, _fmt in OPS.values():
+    if _fmt in ("B", "J") or _name == "jalr":
+        TRACE_KIND[_fn] = TK_JUMP
+    elif _fmt == "S":
+        TRACE_KIND[_fn] = TK_STORE
+    elif _fmt == "I" and _name in ("lb", "lh", "lw", "lbu", "lhu", "flw"):
+        TRACE_KIND[_fn] = TK_LOAD
+    else:
+        TRACE_KIND[_fn] = TK_REG
+
+def format_trace(d: Decoded, value: int, addr: int) -> str:
+    # Human-readable line for one trace record (see tracebuf.TraceBuffer):
+    # value is rd after the instruction (a store's data), addr the load/store
+    # address or the next pc of a branch/jump.
+    # Immediates are re-derived from the raw word so they print as written.
+    rd = 0 if d.rd == X0_SINK else d.rd
+    v = value if rd else 0
+    n, inst = d.name, d.inst
+    r, a, b = reg_name(rd), reg_name(d.rs1), reg_name(d.rs2)
+    fmt = op_format(n)
+    if fmt == "R":
+        if n in UNARY:
+            return f"  {n} {r}, {a} -> {r}=0x{v:08X}"
+        return f"  {n} {r}, {a}, {b} -> {r}=0x{v:08X}"
+    if fmt == "IS":
+        return f"  {n} {r}, {a}, {d.imm} -> {r}=0x{v:08X}"
+    if fmt == "U":
+        return f"  {n} {r}, 0x{imm_u(inst) >> 12:05X} -> {r}=0x{v:08X}"
+    if fmt == "S":
+        return f"  {n} {b}, {d.imm}({a}) -> mem[0x{addr:08X}]=0x{value:08X}"
+    if fmt == "B":
+        return f"  {n} {a}, {b}, {d.imm} -> pc=0x{addr:08X}"
+    if fmt == "J":
+        return f"  {n} {r}, {d.imm} -> pc=0x{addr:08X}"
+    if n == "jalr":
+        return f"  {n} {r}, {imm_i(inst)}({a}) -> {r}=0x{v:08X} pc=0x{addr:08X}"
+    if fmt == "I" and inst & 0x7F in (0x03, 0x07):
+        return f"  {n} {r}, {imm_i(inst)}({a}) -> {r}=0x{v:08X} [0x{addr:08X}]"
+    if fmt == "I":
+        return f"  {n} {r}, {a}, {imm_i(inst)} -> {r}=0x{v:08X}"
+    return f"  {n}"
@@ -0,0 +1,168 @@
+from __future__ import annotations
+import bisect
+import mmap
+import struct
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from ram import PagedMemory, PAGE_MASK
+
+# ELF32 little-endian RISC-V loader.
+# The file is mmap'd copy-on-write and PT_LOAD segments are placed in simulator
+# memory straight from that mapping: whole pages become views of the file in a
+# PagedMemory (no copy until the guest writes them), anything else is one slice
+# copy per segment. No per-word Python objects are created.
+
+EM_RISCV = 243
+PT_LOAD = 1
+PF_X = 1
+SHT_SYMTAB = 2
+
+_EHDR = struct.Struct("<16sHHIIIIIHHHHHH")
+_PHDR = struct.Struct("<8I")
+_SHDR = struct.Struct("<10I")
+_SYM = struct.Struct("<IIIBBH")
+
+class Segment(NamedTuple):
+    vaddr: int
+    offset: int
+    filesz: int
+    memsz: int
+    flags: int
+
+class Symbol(NamedTuple):
+    name: str
+    value: int
+    size: int
+    kind: int    # STT_* (low nibble of st_info): 1=object, 2=func
+
+class ElfImage:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        self.view = memoryview(self._mm)
+        self._parse_header()
+        self.segments = self._parse_segments()
+        self.symbols = self._parse_symbols()
+        funcs = sorted((s.value, s.name) for s in self.symbols.values() if s.value)
+        self._sym_addrs = [a for a, _ in funcs]
+        self._sym_names = [n for _, n in funcs]
+
+    def _parse_header(self):
+        if len(self.view) < _EHDR.size:
+            raise ValueError(f"{self.path}: too short for an ELF header")
+        (ident, _etype, machine, _ver, entry, phoff, shoff, _flags, _ehsize,
+         phentsize, phnum, shentsize, shnum, shstrndx) = _EHDR.unpack_from(self.view, 0)
+        if ident[:4] != b"\x7fELF":
+            raise ValueError(f"{self.path}: not an ELF file")
+        if ident[4] != 1 or ident[5] != 1:
+            raise ValueError(f"{self.path}: not ELF32 little-endian")
+        if machine != EM_RISCV:
+            raise ValueError(f"{self.path}: not a RISC-V executable (e_machine={machine})")
+        self.entry = entry
+        self._ph = (phoff, phentsize, phnum)
+        self._sh = (shoff, shentsize, shnum)
+
+    def _check_table(self, what: str, off: int, entsize: int, num: int, entry: struct.Struct) -> None:
+        # A header table (or one entry of it) has to lie inside the file.
+        if num and (entsize < entry.size or off + (num - 1) * entsize + entry.size > len(self.view)):
+            raise ValueError(f"{self.path}: {what} at 0x{off:X} runs past end of file")
+
+    def _parse_segments(self) -> List[Segment]:
+        phoff, phentsize, phnum = self._ph
+        self._check_table("program header table", phoff, phentsize, phnum, _PHDR)
+        out = []
+        for i in range(phnum):
+            p_type, off, vaddr, _paddr, filesz, memsz, flags, _align = \
+                _PHDR.unpack_from(self.view, phoff + i * phentsize)
+            if p_type == PT_LOAD and memsz:
+                if off + filesz > len(self.view):
+                    raise ValueError(f"{self.path}: segment at 0x{vaddr:08X} runs past end of file")
+                if memsz < filesz:
+                    raise ValueError(f"{self.path}: segment at 0x{vaddr:08X} has memsz < filesz")
+                if vaddr + memsz > 1 << 32:
+                    raise ValueError(f"{self.path}: segment at 0x{vaddr:08X} does not fit in memory")
+                out.append(Segment(vaddr, off, filesz, memsz, flags))
+        return out
+
+    def _section(self, i: int) -> Tuple[int, ...]:
+        shoff, shentsize, shnum = self._sh
+        if i >= shnum:
+            raise ValueError(f"{self.path}: no section {i}")
+        return _SHDR.unpack_from(self.view, shoff + i * shentsize)
+
+    def _parse_symbols(self) -> Dict[str, Symbol]:
+        shoff, _shentsize, shnum = self._sh
+        syms: Dict[str, Symbol] = {}
+        if not shoff:
+            return syms
+        self._check_table("section header table", shoff, _shentsize, shnum, _SHDR)
+        for i in range(shnum):
+            _name, sh_type, _fl, _addr, off, size, link, _info, _al, entsize = self._section(i)
+            if sh_type != SHT_SYMTAB:
+                continue
+            str_off, str_size = self._section(link)[4], self._section(link)[5]
+            strtab = bytes(self.view[str_off:str_off + str_size])
+            self._check_table("symbol table", off, entsize or _SYM.size, size // (entsize or _SYM.size), _SYM)
+            for k in range(size // (entsize or _SYM.size)):
+                st_name, value, ssize, info, _other, _shndx = \
+                    _SYM.unpack_from(self.view, off + k * (entsize or _SYM.size))
+                if not st_name:
+                    continue
+                end = strtab.index(b"\0", st_name)
+                name = strtab[st_name:end].decode("utf-8", "replace")
+                syms[name] = Symbol(name, value, ssize, info & 0xF)
+        return syms
+
+    # queries
+
+    def exec_ranges(self) -> List[Tuple[int, int]]:
+        return [(s.vaddr, s.vaddr + s.memsz) for s in self.segments if s.flags & PF_X]
+
+    def symbol_at(self, addr: int) -> Optional[str]:
+        # Nearest symbol at or below addr (for reports), or None.
+        i = bisect.bisect_right(self._sym_addrs, addr) - 1
+        return self._sym_names[i] if i >= 0 else None
+
+    # loading
+
+    def load_into(self, mem) -> None:
+        # Every segment is checked against mem before any is loaded, so a bad
+        # image is a ValueError rather than a MemoryFault halfway through.
+        for s in self.segments:
+            if ((s.vaddr - getattr(mem, "base", 0)) & 0xFFFFFFFF) + s.memsz > mem.size:
+                raise ValueError(f"{self.path}: segment at 0x{s.vaddr:08X} does not fit in memory")
+        for s in self.segments:
+            data = self.view[s.offset:s.offset + s.filesz]
+            if isinstance(mem, PagedMemory) and mem.backing is None:
+                _map_segment(mem, s, data)
+            else:
+                mem.load(s.vaddr, data)
+            if s.memsz > s.filesz:
+                mem.zero(s.vaddr + s.filesz, s.memsz - s.filesz)
+
+def _map_segment(mem: PagedMemory, s: Segment, data: memoryview) -> None:
+    # Whole pages whose file offset is page aligned are shared with the mapping;
+    # the ragged head/tail (if any) is copied.
+    v, n = s.vaddr, s.filesz
+    if (v - s.offset) & PAGE_MASK:
+        mem.load(v, data)
+        return
+    first = (v + PAGE_MASK) & ~PAGE_MASK           # first whole page
+    last = (v + n) & ~PAGE_MASK                    # end of the last whole page
+    if first >= last:
+        mem.load(v, data)
+        return
+    if first > v:
+        mem.load(v, data[:first - v])
+    mem.map(first, data[first - v:last - v])
+    if v + n > last:
+        mem.load(last, data[last - v:])
+
+def load_elf(path: str, mem) -> ElfImage:
+    img = ElfImage(path)
+    img.load_into(mem)
+    return img
+
+def is_elf(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(4) == b"\x7fELF"
@@ -1,15 +1,18 @@
 from __future__ import annotations
 from typing import Tuple, List, Dict
 
-from memory import Bit
+from memory import (Bit, BitVector, bits_zero, bits_one_hot_lsb, concat,
+                    not_bits, xor_bits, or_reduce)
+from tracebuf import TraceLog
 import gates as g
+import adders
 
 Bits = Tuple[Bit, ...]
 
 
 class FPU32:
-    ZERO = Bit(False)
-    ONE  = Bit(True)
+    ZERO = Bit.ZERO
+    ONE  = Bit.ONE
 
     EXP_BITS  = 8
     FRAC_BITS = 23
@@ -18,20 +21,21 @@ class FPU32:
     EXT_BITS  = MANT_BITS + GRS_BITS  # 27
 
     # 127 = 0b01111111 (MSB-first)
-    BIAS_BITS = (Bit(False), Bit(True), Bit(True), Bit(True), Bit(True), Bit(True), Bit(True), Bit(True))
+    BIAS_BITS = BitVector(8, 127)
 
-    EXP_ALL_ONES  = (Bit(True),)  * EXP_BITS
-    EXP_ALL_ZEROS = (Bit(False),) * EXP_BITS
+    EXP_ALL_ONES  = BitVector(EXP_BITS, -1)
+    EXP_ALL_ZEROS = BitVector(EXP_BITS, 0)
 
     def unpack_f32(self, bits32: Bits) -> Tuple[Bit, Bits, Bits, str]:
         """Return (sign, exp8, frac23, klass: 'zero'|'subnormal'|'normal'|'inf'|'nan')."""
         assert len(bits32) == 32
+        bits32 = BitVector.of(bits32)
         s = bits32[0]
         e = bits32[1:1 + self.EXP_BITS]
         f = bits32[1 + self.EXP_BITS:32]
 
         exp_all_zero = self._bits_all_zero(e)
-        exp_all_one  = self._bits_all_zero(tuple(g.not_gate(b) for b in e))
+        exp_all_one  = self._bits_all_zero(not_bits(e))
         frac_zero    = self._bits_all_zero(f)
 
         if exp_all_one:
@@ -44,7 +48,7 @@ class FPU32:
 
     def pack_f32(self, sign: Bit, exp8: Bits, frac23: Bits) -> Bits:
         assert len(exp8) == self.EXP_BITS and len(frac23) == self.FRAC_BITS
-        return (sign,) + exp8 + frac23
+        return concat((sign,), exp8, frac23)
 
     def add(self, a_bits: Bits, b_bits: Bits) -> Dict[str, object]:
         return self._addsub_core(a_bits, b_bits, subtract=False)
@@ -53,7 +57,7 @@ class FPU32:
         return self._addsub_core(a_bits, b_bits, subtract=True)
 
     def mul(self, a_bits: Bits, b_bits: Bits) -> Dict[str, object]:
-        trace: List[str] = []
+        trace = TraceLog()
 
         sA, eA, fA, kA = self.unpack_f32(a_bits)
         sB, eB, fB, kB = self.unpack_f32(b_bits)
@@ -149,7 +153,7 @@ class FPU32:
 
 
     def _addsub_core(self, a_bits: Bits, b_bits: Bits, subtract: bool) -> Dict[str, object]:
-        trace: List[str] = []
+        trace = TraceLog()
 
         sA, eA, fA, kA = self.unpack_f32(a_bits)
         sB, eB, fB, kB = self.unpack_f32(b_bits)
@@ -296,53 +300,29 @@ class FPU32:
         trace.append("PACK: done")
         return {"res_bits": res_bits, "flags": flags, "trace": trace}
 
-    def _zeros(self, n: int) -> Bits:
-        return tuple(self.ZERO for _ in range(n))
+    def _zeros(self, n: int) -> BitVector:
+        return bits_zero(n)
 
-    def _one_hot_lsb(self, n: int) -> Bits:
-        return tuple(self.ZERO for _ in range(n - 1)) + (self.ONE,)
+    def _one_hot_lsb(self, n: int) -> BitVector:
+        return bits_one_hot_lsb(n)
 
     def _bits_equal(self, a: Bits, b: Bits) -> bool:
-        neq = self.ZERO
-        for i in range(len(a)):
-            neq = g.or_gate(neq, g.xor_gate(a[i], b[i]))
-        return not bool(neq)
+        return not bool(or_reduce(xor_bits(a, b)))
 
     def _bits_all_zero(self, a: Bits) -> bool:
-        acc = self.ZERO
-        for b in a:
-            acc = g.or_gate(acc, b)
-        return not bool(acc)
+        return not bool(or_reduce(a))
 
     def _vec_or(self, a: Bits) -> Bit:
-        acc = self.ZERO
-        for b in a:
-            acc = g.or_gate(acc, b)
-        return acc
+        return or_reduce(a)
 
     def _unsigned_less_than(self, a: Bits, b: Bits) -> bool:
-        for i in range(len(a)):
-            ai, bi = bool(a[i]), bool(b[i])
-            if ai != bi:
-                return (not ai) and bi
-        return False
-
-    def _add_unsigned(self, a: Bits, b: Bits, cin: Bit = None) -> Tuple[Bits, Bit]:
-        assert len(a) == len(b)
-        cin = cin if cin is not None else self.ZERO
-        n = len(a); s: List[Bit] = [self.ZERO] * n
-        carry = cin
-        for i in range(n - 1, -1, -1):
-            axb = g.xor_gate(a[i], b[i])
-            sm  = g.xor_gate(axb, carry)
-            ab  = g.and_gate(a[i], b[i])
-            cax = g.and_gate(carry, axb)
-            cout = g.or_gate(ab, cax)
-            s[i] = sm; carry = cout
-        return tuple(s), carry
-
-    def _not_vec(self, a: Bits) -> Bits:
-        return tuple(g.not_gate(x) for x in a)
+        return BitVector.of(a).value < BitVector.of(b).value
+
+    def _add_unsigned(self, a: Bits, b: Bits, cin: Bit = None) -> Tuple[BitVector, Bit]:
+        return adders.add(a, b, cin if cin is not None else self.ZERO)
+
+    def _not_vec(self, a: Bits) -> BitVector:
+        return not_bits(a)
 
     def _inc_unsigned(self, a: Bits) -> Tuple[Bits, Bit]:
         return self._add_unsigned(a, self._one_hot_lsb(len(a)))
@@ -358,40 +338,30 @@ class FPU32:
         borrow = g.not_gate(carry)  # carry==1 ⇒ no borrow
         return s, borrow
 
-    def _shl_logical(self, a: Bits, steps: int = 1) -> Bits:
-        out = list(a)
-        for _ in range(steps):
-            for i in range(len(out) - 1):
-                out[i] = out[i + 1]
-            out[-1] = self.ZERO
-        return tuple(out)
-
-    def _shr_logical(self, a: Bits, steps: int = 1) -> Bits:
-        out = list(a)
-        for _ in range(steps):
-            for i in range(len(out) - 1, 0, -1):
-                out[i] = out[i - 1]
-            out[0] = self.ZERO
-        return tuple(out)
-
-    def _shr_with_sticky_grs(self, mant_grs: Bits) -> Tuple[Bits, Bit]:
+    def _shl_logical(self, a: Bits, steps: int = 1) -> BitVector:
+        a = BitVector.of(a)
+        return BitVector(a.width, a.value << steps)
+
+    def _shr_logical(self, a: Bits, steps: int = 1) -> BitVector:
+        a = BitVector.of(a)
+        return BitVector(a.width, a.value >> steps)
+
+    def _shr_with_sticky_grs(self, mant_grs: Bits) -> Tuple[BitVector, Bit]:
         """
         Shift right by 1 on [mantissa24 | G | R | S], accumulating sticky: new_S = old_R OR old_S.
         """
-        out = list(mant_grs)
-        dropped = out[-1]  # old S
-        for i in range(len(out) - 1, 0, -1):
-            out[i] = out[i - 1]
-        out[0] = self.ZERO
-        out[-1] = g.or_gate(out[-1], dropped)  # new S = old R OR old S
-        return tuple(out), out[-1]
+        v = BitVector.of(mant_grs)
+        dropped = v[-1]  # old S
+        out = self._shr_logical(v, 1)
+        sticky = g.or_gate(out[-1], dropped)  # new S = old R OR old S
+        return BitVector(out.width, (out.value & ~1) | (1 if sticky else 0)), sticky
 
     def _make_qnan(self) -> Bits:
         # 0x7FC00000: sign=0, exp=all 1s, frac MSB=1
         return self.pack_f32(self.ZERO, self.EXP_ALL_ONES, (self.ONE,) + self._zeros(self.FRAC_BITS - 1))
 
     def _is_exp_all_ones(self, exp8: Bits) -> bool:
-        return self._bits_all_zero(tuple(g.not_gate(x) for x in exp8))
+        return self._bits_all_zero(not_bits(exp8))
 
     def _is_exp_all_zeros(self, exp8: Bits) -> bool:
         return self._bits_all_zero(exp8)
@@ -428,37 +398,33 @@ class FPU32:
     def _eff_exp_for_align(self, exp8: Bits) -> Bits:
         return self._one_hot_lsb(8) if self._is_exp_all_zeros(exp8) else exp8
 
-    def _align_operands(self, a_e: Bits, a_m27: Bits, b_e: Bits, b_m27: Bits, trace: List[str]) -> Tuple[Bits, Bits, Bits, Bits]:
-        ea = list(self._eff_exp_for_align(a_e))
-        eb = list(self._eff_exp_for_align(b_e))
+    def _align_operands(self, a_e: Bits, a_m27: Bits, b_e: Bits, b_m27: Bits, trace: TraceLog) -> Tuple[Bits, Bits, Bits, Bits]:
+        ea = self._eff_exp_for_align(a_e)
+        eb = self._eff_exp_for_align(b_e)
         ma = a_m27
         mb = b_m27
 
         for _ in range(255):  # safe cap
-            if self._bits_equal(tuple(ea), tuple(eb)):
+            if self._bits_equal(ea, eb):
                 break
-            if self._unsigned_less_than(tuple(ea), tuple(eb)):
+            if self._unsigned_less_than(ea, eb):
                 ma, _ = self._shr_with_sticky_grs(ma)
-                ea, _ = self._inc_unsigned(tuple(ea))
+                ea, _ = self._inc_unsigned(ea)
                 trace.append("ALIGN: shift A >> 1, inc exp(A)")
             else:
                 mb, _ = self._shr_with_sticky_grs(mb)
-                eb, _ = self._inc_unsigned(tuple(eb))
+                eb, _ = self._inc_unsigned(eb)
                 trace.append("ALIGN: shift B >> 1, inc exp(B)")
 
-        return tuple(ea), ma, tuple(eb), mb
+        return ea, ma, eb, mb
 
     def _add_into(self, acc: List[Bit], addend: Bits, lsb_offset: int) -> None:
-        idx = len(acc) - 1 - lsb_offset
-        carry = self.ZERO
-        for j in range(len(addend) - 1, -1, -1):
-            axb = g.xor_gate(acc[idx], addend[j])
-            sm  = g.xor_gate(axb, carry)
-            ab  = g.and_gate(acc[idx], addend[j])
-            cax = g.and_gate(carry, axb)
-            cout = g.or_gate(ab, cax)
-            acc[idx] = sm; carry = cout
-            idx -= 1
+        # acc += addend << lsb_offset: the addend's window on the selected
+        # adder, then the carry walked up the rest of acc until it dies out
+        hi = len(acc) - lsb_offset
+        lo = hi - len(addend)
+        acc[lo:hi], carry = adders.add(acc[lo:hi], addend)
+        idx = lo - 1
         while bool(carry) and idx >= 0:
             axb = g.xor_gate(acc[idx], carry)
             sm  = axb
@@ -466,17 +432,17 @@ class FPU32:
             acc[idx] = sm
             idx -= 1
 
-    def _mul_mantissas_24x24(self, a24: Bits, b24: Bits, trace: List[str]) -> Bits:
-        prod = [self.ZERO for _ in range(48)]
+    def _mul_mantissas_24x24(self, a24: Bits, b24: Bits, trace: TraceLog) -> Bits:
+        prod = list(self._zeros(48))
         multiplier = b24
         multiplicand = a24  # aligned by offset in _add_into
         for i in range(24):      # iterate from LSB of multiplier
             bbit = multiplier[-1]
             if bool(bbit):
                 self._add_into(prod, multiplicand, i)
-                trace.append(f"MUL step{i}: add")
+                trace.add("MUL step{}: add", i)
             multiplier = self._shr_logical(multiplier, 1)
-        return tuple(prod)
+        return BitVector.of(prod)
 
     def _normalize_product(self, prod48: Bits) -> Tuple[Bits, Bit, Tuple[Bit, Bit, Bit]]:
         if bool(prod48[0]):  # [2,4)
@@ -3,25 +3,38 @@ from __future__ import annotations
 from typing import Tuple
 from memory import Bit
 
-# Single-bit logic gates (scalar). All return Bit.
+# Single-bit logic gates (scalar). All return Bit.ZERO or Bit.ONE.
+#
+# Gate inputs are normally Bits, which are those two singletons, so an input
+# is read with an identity test (x is ONE, or x is not ZERO); a plain
+# bool/int still works, falling back to bool(). Nothing is allocated.
+
+ZERO, ONE = Bit.ZERO, Bit.ONE
 
 def not_gate(a: Bit) -> Bit:
-    return Bit(not bool(a))
+    return ZERO if (a is ONE or a is not ZERO and bool(a)) else ONE
 
 def and_gate(a: Bit, b: Bit) -> Bit:
-    return Bit(bool(a) and bool(b))
+    return ONE if ((a is ONE or a is not ZERO and bool(a))
+                   and (b is ONE or b is not ZERO and bool(b))) else ZERO
 
 def or_gate(a: Bit, b: Bit) -> Bit:
-    return Bit(bool(a) or bool(b))
+    return ONE if ((a is ONE or a is not ZERO and bool(a))
+                   or (b is ONE or b is not ZERO and bool(b))) else ZERO
 
 def xor_gate(a: Bit, b: Bit) -> Bit:
-    return Bit(bool(a) ^ bool(b))
+    return ONE if ((a is ONE or a is not ZERO and bool(a))
+                   != (b is ONE or b is not ZERO and bool(b))) else ZERO
 
 def and3_gate(a: Bit, b: Bit, c: Bit) -> Bit:
-    return Bit(bool(a) and bool(b) and bool(c))
+    return ONE if ((a is ONE or a is not ZERO and bool(a))
+                   and (b is ONE or b is not ZERO and bool(b))
+                   and (c is ONE or c is not ZERO and bool(c))) else ZERO
 
 def or3_gate(a: Bit, b: Bit, c: Bit) -> Bit:
-    return Bit(bool(a) or bool(b) or bool(c))
+    return ONE if ((a is ONE or a is not ZERO and bool(a))
+                   or (b is ONE or b is not ZERO and bool(b))
+                   or (c is ONE or c is not ZERO and bool(c))) else ZERO
 
 def nand_gate(a: Bit, b: Bit) -> Bit:
     return not_gate(and_gate(a, b))
@@ -52,3 +65,56 @@ def full_adder(a: Bit, b: Bit, cin: Bit) -> Tuple[Bit, Bit]:
     c2  = and_gate(axb, cin)
     c   = or_gate(c1, c2)
     return s, c
+
+# Gate-evaluation counting
+#
+# While a GateCounter is active, the primitive gates above and memory.py's
+# bitwise vector helpers and reductions are swapped for counting wrappers (one
+# count per bit for the vector helpers, which is what the per-bit gates or the
+# gate chain they stand for would cost), in this module and in every module passed in that
+# imported them by name. Composite gates (nand, full_adder, ...) count as the
+# primitives they are built from. Nothing is counted outside the with-block.
+
+PRIMITIVES = ("not_gate", "and_gate", "or_gate", "xor_gate", "and3_gate", "or3_gate")
+VECTOR_OPS = ("not_bits", "and_bits", "or_bits", "xor_bits", "or_reduce", "and_reduce")
+
+class GateCounter:
+    def __init__(self, modules=()):
+        import sys
+        import memory
+        self.count = 0
+        self.modules = [sys.modules[__name__], memory, *modules]
+        originals = {}
+        for name in PRIMITIVES:
+            originals[globals()[name]] = self._scalar(globals()[name])
+        for name in VECTOR_OPS:
+            fn = getattr(memory, name)
+            originals[fn] = self._vector(fn)
+        self._wrappers = originals        # original -> counting wrapper
+        self._saved = []
+
+    def _scalar(self, fn):
+        def counted(*args):
+            self.count += 1
+            return fn(*args)
+        return counted
+
+    def _vector(self, fn):
+        def counted(a, *rest):
+            self.count += len(a)
+            return fn(a, *rest)
+        return counted
+
+    def __enter__(self) -> GateCounter:
+        for mod in self.modules:
+            for name, obj in list(vars(mod).items()):
+                w = self._wrappers.get(obj) if callable(obj) else None
+                if w is not None:
+                    self._saved.append((mod, name, obj))
+                    setattr(mod, name, w)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for mod, name, obj in reversed(self._saved):
+            setattr(mod, name, obj)
+        self._saved.clear()
@@ -0,0 +1,234 @@
+from __future__ import annotations
+import json
+from typing import Dict, Optional, Tuple
+import adders
+import alu
+import fpu
+import mdu
+import shifter
+from gates import GateCounter
+from memory import bits_from_u32, u32_from_bits
+from decoder import Decoded, M32, imm_i
+
+# Gate-level execution backend (run_hex(..., mode="gate")).
+# Every ALU, shift, MDU and FPU operation of the program is computed by the
+# bit-level units: ALU32.exec, shift32, mdu_mul/mdu_div and FPU32. That
+# includes effective addresses (rs1 + imm through the ALU adder), jump
+# targets, auipc and branch comparisons (ALU SUB flags). Only the pc + 4
+# incrementer, sign/zero extension and the memory port stay on the host.
+#
+# Two caches keep this usable on real programs:
+#   - unit results are memoised by (op, a, b), so a loop pays for the gate
+#     evaluation of each distinct operation once;
+#   - operands are converted to bit vectors once per distinct value.
+# Gate evaluations are counted with gates.GateCounter. Each instruction is
+# charged the gates its unit operations take ("modelled", memo hits
+# included); "evaluated" is what was actually simulated.
+#
+# The units add on the adder selected in adders.py when the backend is made
+# (or the one passed as adder=), so gate counts can be compared across
+# ripple-carry, carry-lookahead and the prefix adders.
+
+DEFAULT_MEMO = 1 << 16
+
+_alu = alu.ALU32()
+_fpu = fpu.FPU32()
+
+def _alu_flags(op: str):
+    def run(a, b):
+        out = _alu.exec(a, b, op)
+        f = out["flags"]
+        return u32_from_bits(out["result"]), (f["N"], f["Z"], f["C"], f["V"])
+    return run
+
+def _value(fn):
+    return lambda a, b: (u32_from_bits(fn(a, b)), None)
+
+# op -> fn(a_bits, b_bits) -> (value, flags or None)
+UNIT_OPS = {
+    "ADD": _alu_flags("ADD"),
+    "SUB": _alu_flags("SUB"),
+    "AND": _alu_flags("AND"),
+    "OR":  _alu_flags("OR"),
+    "XOR": _alu_flags("XOR"),
+    "SLL": _value(lambda a, b: shifter.shift32(a, b, "SLL")),
+    "SRL": _value(lambda a, b: shifter.shift32(a, b, "SRL")),
+    "SRA": _value(lambda a, b: shifter.shift32(a, b, "SRA")),
+    "FADD": _value(lambda a, b: _fpu.add(a, b)["res_bits"]),
+    "FSUB": _value(lambda a, b: _fpu.sub(a, b)["res_bits"]),
+    "FMUL": _value(lambda a, b: _fpu.mul(a, b)["res_bits"]),
+}
+for _op in ("MUL", "MULH", "MULHSU", "MULHU"):
+    UNIT_OPS[_op] = _value(lambda a, b, _op=_op: mdu.mdu_mul(_op, a, b)["rd_bits"])
+for _op in ("DIV", "DIVU"):
+    UNIT_OPS[_op] = _value(lambda a, b, _op=_op: mdu.mdu_div(_op, a, b)["q_bits"])
+for _op in ("REM", "REMU"):
+    UNIT_OPS[_op] = _value(lambda a, b, _op=_op: mdu.mdu_div(_op, a, b)["r_bits"])
+
+# register-register / register-immediate ops straight onto a unit op
+_RR = {"add": "ADD", "sub": "SUB", "and": "AND", "or": "OR", "xor": "XOR",
+       "sll": "SLL", "srl": "SRL", "sra": "SRA",
+       "mul": "MUL", "mulh": "MULH", "mulhsu": "MULHSU", "mulhu": "MULHU",
+       "div": "DIV", "divu": "DIVU", "rem": "REM", "remu": "REMU",
+       "fadd.s": "FADD", "fsub.s": "FSUB", "fmul.s": "FMUL"}
+_RI = {"addi": "ADD", "andi": "AND", "ori": "OR", "xori": "XOR"}
+_SHI = {"slli": "SLL", "srli": "SRL", "srai": "SRA"}
+_LOADS = {"lb": (1, True), "lh": (2, True), "lw": (4, False), "lbu": (1, False),
+          "lhu": (2, False), "flw": (4, False)}
+_STORES = {"sb": 1, "sh": 2, "sw": 4, "fsw": 4}
+
+class GateBackend:
+    def __init__(self, memo_size: int = DEFAULT_MEMO, adder: Optional[str] = None):
+        self.memo_size = memo_size
+        self.adder = adder or adders.selected()
+        self.memo: Dict[Tuple[str, int, int], Tuple[int, object, int]] = {}
+        self.bits: Dict[int, tuple] = {}   # operand value -> bit vector
+        self.counter = GateCounter([alu, fpu, mdu, shifter])
+        self.memo_hits = 0
+        self.memo_misses = 0
+        self.evaluated = 0                 # gates actually simulated
+        self.insn_count: Dict[str, int] = {}
+        self.insn_gates: Dict[str, int] = {}   # mnemonic -> modelled gates
+        self._gates = 0                    # gates charged to the current instruction
+
+    # unit access
+
+    def _vec(self, v: int):
+        b = self.bits.get(v)
+        if b is None:
+            if len(self.bits) >= self.memo_size:
+                self.bits.clear()
+            b = self.bits[v] = bits_from_u32(v)
+        return b
+
+    def unit(self, op: str, a: int, b: int):
+        # (value, flags) of one unit operation, memoised.
+        key = (op, a, b)
+        hit = self.memo.get(key)
+        if hit is None:
+            self.memo_misses += 1
+            before = self.counter.count
+            with adders.use(self.adder):
+                value, flags = UNIT_OPS[op](self._vec(a), self._vec(b))
+            gates = self.counter.count - before
+            self.evaluated += gates
+            if len(self.memo) >= self.memo_size:
+                self.memo.clear()
+            hit = self.memo[key] = (value, flags, gates)
+        else:
+            self.memo_hits += 1
+        self._gates += hit[2]
+        return hit[0], hit[1]
+
+    def add(self, a: int, b: int) -> int:
+        return self.unit("ADD", a, b & M32)[0]
+
+    def ltu(self, a: int, b: int) -> bool:
+        # a <u b iff a - b borrows (SUB carry clear). ALU32 negates b before
+        # the add, which drops the carry when b == 0, so b == 0 is decided
+        # by the zero flag of b | 0.
+        if self.unit("OR", b, 0)[1][1]:
+            return False
+        return not self.unit("SUB", a, b)[1][2]
+
+    def lt(self, a: int, b: int) -> bool:
+        _v, (n, _z, _c, v) = self.unit("SUB", a, b)
+        return n != v
+
+    # one instruction
+
+    def step(self, d: Decoded, regs, mem, pc: int) -> int:
+        # Execute d at pc on the units; returns next_pc like a handler.
+        self._gates = 0
+        fn, rd, rs1, rs2, imm, name, inst = d
+        nxt = pc + 4
+        op = _RR.get(name)
+        if op is not None:
+            regs[rd] = self.unit(op, regs[rs1], regs[rs2])[0]
+        elif name in _RI:
+            regs[rd] = self.unit(_RI[name], regs[rs1], imm_i(inst) & M32)[0]
+        elif name in _SHI:
+            regs[rd] = self.unit(_SHI[name], regs[rs1], imm)[0]
+        elif name in ("slt", "slti", "sltu", "sltiu"):
+            b = regs[rs2] if name in ("slt", "sltu") else imm_i(inst) & M32
+            less = self.lt(regs[rs1], b) if name in ("slt", "slti") else self.ltu(regs[rs1], b)
+            regs[rd] = 1 if less else 0
+        elif name in _LOADS:
+            size, signed = _LOADS[name]
+            addr = self.add(regs[rs1], imm)
+            v = mem.read_u8(addr) if size == 1 else mem.read_u16(addr) if size == 2 else mem.read_u32(addr)
+            if signed:
+                top = 1 << (8 * size - 1)
+                v = ((v ^ top) - top) & M32
+            regs[rd] = v
+        elif name in _STORES:
+            size = _STORES[name]
+            addr = self.add(regs[rs1], imm)
+            v = regs[rs2]
+            if size == 1:
+                mem.write_u8(addr, v & 0xFF)
+            elif size == 2:
+                mem.write_u16(addr, v & 0xFFFF)
+            else:
+                mem.write_u32(addr, v)
+        elif name == "lui":
+            regs[rd] = imm
+        elif name == "auipc":
+            regs[rd] = self.add(pc, imm)
+        elif name == "jal":
+            regs[rd] = nxt
+            nxt = self.add(pc, imm)
+        elif name == "jalr":
+            t = self.add(regs[rs1], imm) & ~1
+            regs[rd] = nxt
+            nxt = t
+        elif d.inst & 0x7F == 0x63:
+            if self._taken(name, regs[rs1], regs[rs2]):
+                nxt = self.add(pc, imm)
+        else:
+            # fence, fmv.x.w / fmv.w.x: no unit involved
+            nxt = fn(regs, mem, pc, rd, rs1, rs2, imm)
+        self.insn_count[name] = self.insn_count.get(name, 0) + 1
+        self.insn_gates[name] = self.insn_gates.get(name, 0) + self._gates
+        return nxt
+
+    def _taken(self, name: str, a: int, b: int) -> bool:
+        if name in ("beq", "bne"):
+            z = self.unit("SUB", a, b)[1][1]
+            return z if name == "beq" else not z
+        if name in ("blt", "bge"):
+            return self.lt(a, b) == (name == "blt")
+        return self.ltu(a, b) == (name == "bltu")
+
+    # results
+
+    @property
+    def modelled(self) -> int:
+        return sum(self.insn_gates.values())
+
+    def report(self) -> Dict:
+        lookups = self.memo_hits + self.memo_misses
+        ops = {name: {"count": n, "gates": self.insn_gates[name],
+                      "per_insn": round(self.insn_gates[name] / n, 1)}
+               for name, n in sorted(self.insn_count.items(), key=lambda kv: -self.insn_gates[kv[0]])}
+        return {
+            "instructions": sum(self.insn_count.values()),
+            "adder": self.adder,
+            "gates_modelled": self.modelled,
+            "gates_evaluated": self.evaluated,
+            "memo_hit_rate": round(self.memo_hits / lookups, 4) if lookups else 0.0,
+            "ops": ops,
+        }
+
+    def report_json(self) -> str:
+        return json.dumps(self.report(), indent=2)
+
+    def report_text(self) -> str:
+        r = self.report()
+        lines = [f"{r['instructions']} instructions on gate-level units ({r['adder']} adder): "
+                 f"{r['gates_modelled']} gate evaluations modelled, {r['gates_evaluated']} simulated "
+                 f"(memo hit rate {100 * r['memo_hit_rate']:.1f}%)",
+                 f"  {'gates':>12} {'count':>9} {'per insn':>9}  op"]
+        for name, o in r["ops"].items():
+            lines.append(f"  {o['gates']:>12} {o['count']:>9} {o['per_insn']:>9}  {name}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,266 @@
+from __future__ import annotations
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+from decoder import CodeCache, NREGS
+from ram import FlatMemory, PagedMemory
+from runner import (load_hex_program, load_elf_program, run_program, STACK_TOP,
+                    HALT_IDLE, HALT_EXIT, HALT_MAX_STEPS)
+
+# Multi-hart simulation: N harts, each with its own register file and pc,
+# over one shared memory and one decode cache.
+#
+# MultiHart.run() is a round-robin scheduler in this process: every live hart
+# runs up to `quantum` instructions in turn (run_program per slice, so any
+# run mode works). Harts start at the entry point with a0 = hart id (the
+# convention OpenSBI/pk boot code uses); ELF harts get a stack of HART_STACK
+# bytes each below STACK_TOP.
+#
+# Idle-loop halts (runner.IdleLoops) assume nobody else writes memory, which
+# another hart may do, so here they only end the hart's slice early: a
+# spinning hart yields. The machine stops with "idle loop" once a whole round
+# passes in which every live hart went idle again at the same pc with the
+# same registers and without storing anything (every hart's memory goes
+# through a _StoreCount) -- then nothing can change. A hart that re-parks at
+# the same state after storing, such as one taking its turn at a shared
+# flag, is still making progress.
+# A hart that stops for any other reason is done; an exit call stops all.
+#
+# MultiHart.run_parallel() runs one process per hart instead, free-running
+# (no quanta) on a FlatMemory in multiprocessing.shared_memory, so harts
+# really execute concurrently. An idle hart keeps re-entering its loop. Each
+# hart publishes (done, slices, progressing slices) in a small control block;
+# a slice progresses unless it ended parked as before with no store.
+# A stuck hart gives up when, over a window in which nobody progressed, every
+# other hart is done or finished at least two slices -- so a slice that began
+# after the window opened also stored nothing. There are no atomics (no A
+# extension), so the firmware's synchronisation must be plain loads and
+# stores.
+
+DEFAULT_QUANTUM = 1000
+HART_STACK = 64 * 1024
+A0 = 10
+
+_CTL = 3                # per-hart control words: done, slices, progressing slices
+HALT_ALL = "halted"     # every hart stopped on its own (see each hart's halt)
+
+class _StoreCount:
+    # Memory wrapper counting stores (and bulk writes), so the scheduler can
+    # tell a hart that only spun from one that wrote something meanwhile.
+    __slots__ = ("mem", "stores")
+
+    def __init__(self, mem):
+        self.mem = mem
+        self.stores = 0
+
+    def write_u8(self, addr: int, val: int):
+        self.stores += 1
+        self.mem.write_u8(addr, val)
+
+    def write_u16(self, addr: int, val: int):
+        self.stores += 1
+        self.mem.write_u16(addr, val)
+
+    def write_u32(self, addr: int, val: int):
+        self.stores += 1
+        self.mem.write_u32(addr, val)
+
+    def load(self, addr: int, data) -> None:
+        self.stores += 1
+        self.mem.load(addr, data)
+
+    def zero(self, addr: int, n: int) -> None:
+        self.stores += 1
+        self.mem.zero(addr, n)
+
+    def __getattr__(self, name):
+        return getattr(self.mem, name)
+
+class Hart:
+    def __init__(self, hartid: int, regs: List[int], pc: int):
+        self.hartid = hartid
+        self.regs = regs
+        self.pc = pc
+        self.steps = 0
+        self.halt: Optional[str] = None     # None while runnable
+        self.parked: Optional[Tuple] = None  # (pc, regs) after an idle slice
+
+    def result(self) -> Dict:
+        return {
+            "hart": self.hartid,
+            "regs": [r & 0xFFFFFFFF for r in self.regs[:32]],
+            "pc": self.pc,
+            "steps": self.steps,
+            "halt": self.halt,
+        }
+
+class MultiHart:
+    def __init__(self, code: CodeCache, mem, entry: int, harts: int = 2,
+                 quantum: int = DEFAULT_QUANTUM, regs: Optional[List[int]] = None,
+                 stack_top: Optional[int] = None):
+        if harts < 1 or quantum < 1:
+            raise ValueError("need at least one hart and a positive quantum")
+        self.code = code
+        self.mem = mem
+        self.quantum = quantum
+        self.harts: List[Hart] = []
+        for h in range(harts):
+            r = list(regs) if regs is not None else [0] * NREGS
+            r[A0] = h
+            if stack_top is not None:
+                r[2] = stack_top - h * HART_STACK
+            self.harts.append(Hart(h, r, entry))
+        self.halt: Optional[str] = None
+
+    @classmethod
+    def from_hex(cls, path: str, harts: int = 2, mem=None, quantum: int = DEFAULT_QUANTUM) -> MultiHart:
+        mem = PagedMemory() if mem is None else mem
+        code, regs, pc = load_hex_program(path, mem)
+        return cls(code, mem, pc, harts, quantum, regs)
+
+    @classmethod
+    def from_elf(cls, path: str, harts: int = 2, mem=None, quantum: int = DEFAULT_QUANTUM) -> MultiHart:
+        mem = PagedMemory() if mem is None else mem
+        code, regs, pc, _img = load_elf_program(path, mem)
+        return cls(code, mem, pc, harts, quantum, regs, STACK_TOP)
+
+    @property
+    def steps(self) -> int:
+        return sum(h.steps for h in self.harts)
+
+    # round-robin
+
+    def run(self, max_steps: int = 1000, mode: str = "interp", syscalls=None) -> str:
+        # Up to max_steps more instructions per hart. Returns the machine's
+        # halt reason: "exit", "idle loop", "max_steps" or HALT_ALL.
+        budget = {h.hartid: h.steps + max_steps for h in self.harts}
+        mem = _StoreCount(self.mem)
+        while True:
+            live = [h for h in self.harts if h.halt is None and h.steps < budget[h.hartid]]
+            if not live:
+                break
+            stuck = 0
+            for h in live:
+                n = min(self.quantum, budget[h.hartid] - h.steps)
+                stores = mem.stores
+                out = run_program(self.code, h.regs, mem, h.pc, n, mode=mode, syscalls=syscalls)
+                h.pc = out["pc"]
+                h.steps += out["steps"]
+                halt = out["halt"]
+                if halt == HALT_IDLE:
+                    state = (h.pc, tuple(h.regs))
+                    stuck += state == h.parked and mem.stores == stores
+                    h.parked = state
+                    continue
+                h.parked = None
+                if halt == HALT_EXIT:
+                    h.halt = halt
+                    self.halt = HALT_EXIT
+                    return self.halt
+                if halt != HALT_MAX_STEPS:
+                    h.halt = halt
+            if stuck == len(live):
+                self.halt = HALT_IDLE
+                return self.halt
+        runnable = any(h.halt is None for h in self.harts)
+        self.halt = HALT_MAX_STEPS if runnable else HALT_ALL
+        return self.halt
+
+    # process per hart
+
+    def run_parallel(self, max_steps: int = 1000, mode: str = "interp") -> str:
+        # One worker process per hart on a shared-memory copy of self.mem
+        # (which must be a FlatMemory); memory is copied back afterwards.
+        if not isinstance(self.mem, FlatMemory):
+            raise ValueError("parallel harts need a FlatMemory")
+        mem = self.mem
+        shm = shared_memory.SharedMemory(create=True, size=mem.size)
+        ctl = shared_memory.SharedMemory(create=True, size=8 * _CTL * len(self.harts))
+        try:
+            shm.buf[:mem.size] = mem.data
+            ctl.buf[:8 * _CTL * len(self.harts)] = bytes(8 * _CTL * len(self.harts))
+            for h in self.harts:
+                if h.halt is not None:
+                    ctl.buf[8 * _CTL * h.hartid] = 1     # already done
+            jobs = [(shm.name, ctl.name, mem.size, mem.base, self.code.ranges, h.hartid,
+                     h.regs, h.pc, max_steps, mode) for h in self.harts if h.halt is None]
+            with ProcessPoolExecutor(max_workers=len(jobs) or 1) as pool:
+                results = list(pool.map(_hart_process, jobs))
+            with shm.buf[:mem.size] as image:
+                mem.view[:] = image
+        finally:
+            shm.close()
+            shm.unlink()
+            ctl.close()
+            ctl.unlink()
+        self.code.clear()       # code may have been rewritten by a hart
+        by_id = {h.hartid: h for h in self.harts}
+        for hartid, regs, pc, steps, halt in results:
+            h = by_id[hartid]
+            h.regs[:] = regs
+            h.pc = pc
+            h.steps += steps
+            h.halt = None if halt in (HALT_MAX_STEPS, HALT_IDLE) else halt
+        halts = [r[4] for r in results]
+        if HALT_IDLE in halts and all(x != HALT_MAX_STEPS for x in halts):
+            self.halt = HALT_IDLE
+        elif any(h.halt is None for h in self.harts):
+            self.halt = HALT_MAX_STEPS
+        else:
+            self.halt = HALT_ALL
+        return self.halt
+
+    def result(self) -> Dict:
+        return {
+            "harts": [h.result() for h in self.harts],
+            "mem": self.mem,
+            "steps": self.steps,
+            "halt": self.halt,
+        }
+
+def _hart_process(job) -> Tuple[int, List[int], int, int, str]:
+    shm_name, ctl_name, size, base, ranges, hartid, regs, pc, max_steps, mode = job
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ctl_shm = shared_memory.SharedMemory(name=ctl_name)
+    flat = FlatMemory(size, base, buffer=shm.buf)
+    mem = _StoreCount(flat)
+    ctl = ctl_shm.buf.cast("q")
+    try:
+        code = CodeCache(flat, ranges)
+        me = _CTL * hartid
+        others = [_CTL * j for j in range(len(ctl) // _CTL) if j != hartid]
+        parked = window = None
+        steps = 0
+        while True:
+            stores = mem.stores
+            out = run_program(code, regs, mem, pc, max_steps - steps, mode=mode)
+            pc = out["pc"]
+            steps += out["steps"]
+            halt = out["halt"]
+            if steps >= max_steps:
+                halt = HALT_MAX_STEPS   # out of budget, as in run(), even if idle just then
+                break
+            if halt != HALT_IDLE:
+                break
+            state = (pc, tuple(regs))
+            stuck = state == parked and mem.stores == stores
+            parked = state
+            ctl[me + 1] += 1
+            if not stuck:
+                ctl[me + 2] += 1
+                window = None
+                continue
+            seen = [(ctl[j], ctl[j + 1], ctl[j + 2]) for j in others]
+            if window is None or any(p != p0 for (_d, _s, p), (_d0, _s0, p0) in zip(seen, window)):
+                window = seen
+            elif all(d or s - s0 >= 2 for (d, s, _p), (_d0, s0, _p0) in zip(seen, window)):
+                break
+            time.sleep(0)
+        ctl[me] = 1
+        return hartid, regs, pc, steps, halt
+    finally:
+        ctl.release()
+        flat.close()
+        shm.close()
+        ctl_shm.close()
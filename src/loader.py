@@ -1,27 +1,74 @@
 from __future__ import annotations
-from typing import List, Tuple
+import re
+import sys
+from array import array
+from typing import Iterator, List, Optional, Tuple
 from memory import Bit
 
-def hex_line_to_bits32(line: str) -> Tuple[Bit, ...]:
+# Hex program images: one 32-bit word per line, optional 0x prefix, short
+# words are zero-extended and long ones keep their low 8 digits. Lines that
+# are blank or not hex are skipped.
+#
+# The int API (hex_line_to_u32 / iter_hex_words / load_hex_words) is what the
+# runner uses; the Bit-tuple API (hex_line_to_bits32 / load_hex_file) is a
+# view on top of it for the gate-level code.
+
+WORD_TYPECODE = "I" if array("I").itemsize == 4 else "L"
+CHUNK_BYTES = 1 << 20   # text read per block by the streaming reader
+
+_HEX = "0123456789abcdef"
+# A block made only of well-formed "XXXXXXXX" lines (the common case) can be
+# converted in one bytes.fromhex call; anything else goes line by line.
+_CLEAN = re.compile(r"(?:[ \t]*(?:0[xX])?[0-9A-Fa-f]{8}[ \t\r]*\n|[ \t\r]*\n)*"
+                    r"(?:[ \t]*(?:0[xX])?[0-9A-Fa-f]{8}[ \t\r]*)?")
+_WORD = re.compile(r"[0-9A-Fa-f]{8}")
+
+def hex_line_to_u32(line: str) -> Optional[int]:
     s = line.strip().lower()
-    if not s: return ()
-    s = s.replace("0x","")
-    if len(s) < 8: s = ("0"*(8-len(s))) + s
-    s = s[-8:]
-    val = 0
-    for ch in s:
-        if "0"<=ch<="9": d = ord(ch)-ord("0")
-        elif "a"<=ch<="f": d = 10 + (ord(ch)-ord("a"))
-        else: return ()
-        val = (val<<4) | d
+    if not s:
+        return None
+    s = s.replace("0x", "")[-8:]
+    if s.strip(_HEX):
+        return None
+    return int(s, 16) if s else 0
+
+def _words_of(text: str) -> array:
+    out = array(WORD_TYPECODE)
+    if _CLEAN.fullmatch(text):
+        out.frombytes(bytes.fromhex("".join(_WORD.findall(text))))
+        if sys.byteorder == "little":
+            out.byteswap()   # hex text is most-significant digit first
+        return out
+    for line in text.splitlines():
+        v = hex_line_to_u32(line)
+        if v is not None:
+            out.append(v)
+    return out
+
+def iter_hex_words(path: str, chunk_bytes: int = CHUNK_BYTES) -> Iterator[array]:
+    # Stream a (possibly huge) image as arrays of words, about chunk_bytes of
+    # text at a time, without holding the whole file.
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            lines = f.readlines(chunk_bytes)
+            if not lines:
+                return
+            yield _words_of("".join(lines))
+
+def load_hex_words(path: str) -> array:
+    out = array(WORD_TYPECODE)
+    for block in iter_hex_words(path):
+        out.extend(block)
+    return out
+
+# Bit-tuple view
+
+def _bits32(val: int) -> Tuple[Bit, ...]:
     return tuple(Bit(bool((val>>i)&1)) for i in range(31,-1,-1))
 
+def hex_line_to_bits32(line: str) -> Tuple[Bit, ...]:
+    v = hex_line_to_u32(line)
+    return () if v is None else _bits32(v)
+
 def load_hex_file(path: str) -> List[Tuple[Bit,...]]:
-    out: List[Tuple[Bit,...]] = []
-    with open(path,"r",encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line: continue
-            b = hex_line_to_bits32(line)
-            if b: out.append(b)
-    return out
\ No newline at end of file
+    return [_bits32(v) for v in load_hex_words(path)]
@@ -0,0 +1,142 @@
+from __future__ import annotations
+import json
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from memory import Bit, bits_from_u32 as to_bits, u32_from_bits as from_bits
+from alu import ALU32
+from shifter import shift32
+from mdu import mdu_mul, mdu_div
+from fpu import FPU32
+from decoder import Decoded, imm_i
+
+# Lockstep differential checking: the int fast path against the bit-accurate
+# units. The lockstep loop (runner._run_lockstep) runs every instruction on
+# the fast path as usual; for a sampled one it also recomputes rd from the
+# same operand values through ALU32 / shift32 / mdu_mul / mdu_div / FPU32
+# and records a Divergence if the two disagree.
+#
+# Sampling: only ops in `ops` (default: every op with a gate-level
+# counterpart) are candidates, and one candidate in `every` is checked, so
+# every=1 checks them all and every=1000 costs a counter per candidate.
+
+Bits = Tuple[Bit, ...]
+M32 = 0xFFFFFFFF
+
+_alu = ALU32()
+_fpu = FPU32()
+
+def _alu_op(op: str) -> Callable[[Bits, Bits], int]:
+    return lambda a, b: from_bits(_alu.exec(a, b, op)["result"])
+
+def _shift_op(op: str) -> Callable[[Bits, Bits], int]:
+    return lambda a, b: from_bits(shift32(a, b, op))
+
+def _mul_op(op: str) -> Callable[[Bits, Bits], int]:
+    return lambda a, b: from_bits(mdu_mul(op, a, b)["rd_bits"])
+
+def _div_op(op: str, key: str) -> Callable[[Bits, Bits], int]:
+    return lambda a, b: from_bits(mdu_div(op, a, b)[key])
+
+def _fpu_op(method: str) -> Callable[[Bits, Bits], int]:
+    fn = getattr(_fpu, method)
+    return lambda a, b: from_bits(fn(a, b)["res_bits"])
+
+# mnemonic -> (unit, reference(a_bits, b_bits) -> int). For I-format ops b
+# is the immediate (shift amount for the shifts). ALU32 has no compare op,
+# so slt/sltu have no reference.
+REFERENCE: Dict[str, Tuple[str, Callable[[Bits, Bits], int]]] = {}
+for _names, _op in ((("add", "addi"), "ADD"), (("sub",), "SUB"), (("and", "andi"), "AND"),
+                    (("or", "ori"), "OR"), (("xor", "xori"), "XOR")):
+    for _n in _names:
+        REFERENCE[_n] = ("alu", _alu_op(_op))
+for _names, _op in ((("sll", "slli"), "SLL"), (("srl", "srli"), "SRL"), (("sra", "srai"), "SRA")):
+    for _n in _names:
+        REFERENCE[_n] = ("shift", _shift_op(_op))
+for _n in ("mul", "mulh", "mulhsu", "mulhu"):
+    REFERENCE[_n] = ("mdu", _mul_op(_n.upper()))
+for _n in ("div", "divu"):
+    REFERENCE[_n] = ("mdu", _div_op(_n.upper(), "q_bits"))
+for _n in ("rem", "remu"):
+    REFERENCE[_n] = ("mdu", _div_op(_n.upper(), "r_bits"))
+for _n, _m in (("fadd.s", "add"), ("fsub.s", "sub"), ("fmul.s", "mul")):
+    REFERENCE[_n] = ("fpu", _fpu_op(_m))
+
+_IMM_OPS = frozenset(("addi", "andi", "ori", "xori"))
+_SHAMT_OPS = frozenset(("slli", "srli", "srai"))
+
+class Divergence(NamedTuple):
+    seq: int      # instruction number within the lockstep runs
+    pc: int
+    inst: int
+    name: str
+    a: int        # operand values as the fast path saw them
+    b: int
+    fast: int
+    reference: int
+
+    def describe(self) -> str:
+        return (f"#{self.seq} pc=0x{self.pc:08X} {self.name} a=0x{self.a:08X} b=0x{self.b:08X}: "
+                f"fast=0x{self.fast:08X} reference=0x{self.reference:08X}")
+
+class Lockstep:
+    def __init__(self, every: int = 1, ops: Optional[Iterable[str]] = None,
+                 stop_on_divergence: bool = False, max_divergences: int = 1000):
+        if every < 1:
+            raise ValueError("every must be at least 1")
+        ops = set(REFERENCE) if ops is None else set(ops)
+        unknown = ops - set(REFERENCE)
+        if unknown:
+            raise ValueError(f"no gate-level reference for {', '.join(sorted(unknown))}")
+        self.every = every
+        self.ops = frozenset(ops)
+        self.stop_on_divergence = stop_on_divergence
+        self.max_divergences = max_divergences   # recorded; all are counted
+        self.countdown = 1          # candidates until the next check
+        self.seq = 0                # instructions run under lockstep
+        self.candidates = 0
+        self.checked: Dict[str, int] = {}      # unit -> checks
+        self.divergence_count = 0
+        self.divergences: List[Divergence] = []
+
+    def operands(self, d: Decoded, regs) -> Tuple[int, int]:
+        # Immediates are re-read from the word: decode pre-biases some of them.
+        if d.name in _IMM_OPS:
+            return regs[d.rs1], imm_i(d.inst) & M32
+        if d.name in _SHAMT_OPS:
+            return regs[d.rs1], d.imm
+        return regs[d.rs1], regs[d.rs2]
+
+    def check(self, d: Decoded, pc: int, a: int, b: int, fast: int) -> bool:
+        # Recompute through the reference unit; False (and a recorded
+        # Divergence) if it disagrees with the fast path's result.
+        unit, ref = REFERENCE[d.name]
+        self.checked[unit] = self.checked.get(unit, 0) + 1
+        want = ref(to_bits(a), to_bits(b))
+        if want == fast:
+            return True
+        self.divergence_count += 1
+        if len(self.divergences) < self.max_divergences:
+            self.divergences.append(Divergence(self.seq, pc, d.inst, d.name, a, b, fast, want))
+        return False
+
+    # results
+
+    def report(self) -> Dict:
+        return {
+            "instructions": self.seq,
+            "candidates": self.candidates,
+            "checked": dict(sorted(self.checked.items())),
+            "divergences": self.divergence_count,
+            "first": [dv.describe() for dv in self.divergences[:20]],
+        }
+
+    def report_json(self) -> str:
+        return json.dumps(self.report(), indent=2)
+
+    def report_text(self) -> str:
+        r = self.report()
+        checked = sum(r["checked"].values())
+        units = ", ".join(f"{u} {n}" for u, n in r["checked"].items())
+        lines = [f"lockstep: {checked} of {r['candidates']} candidate instructions checked"
+                 + (f" ({units})" if units else "") + f", {r['divergences']} divergences"]
+        lines += ["  " + s for s in r["first"]]
+        return "\n".join(lines) + "\n"
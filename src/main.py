@@ -1,12 +1,24 @@
 import argparse
+import sys
 from memory import Bit
 from twos import encode_twos_complement
 from alu import ALU32, alu32
 from fpu import fadd_f32, fsub_f32, fmul_f32
 from mdu import mdu_mul, mdu_div
-from loader import load_hex_file
-from runner import run_hex
+from loader import load_hex_words
+from runner import run_hex, run_elf, HALT_MAX_STEPS
+from harts import MultiHart
+from batch import RUN_MODES, run_batch, collect_images, write_jsonl
+from profiler import Profile
+from timing import PipelineTiming
+from predictor import PREDICTORS, make_predictor
+from cache import L1, parse_cache_spec
+from lockstep import Lockstep
+from syscalls import Syscalls
+from ram import FlatMemory, PagedMemory
+from mmio import Bus, Uart, Timer
 from registers import FCSR
+import adders
 
 def _bits32_from_int(v: int):
     u = v & 0xFFFFFFFF
@@ -31,7 +43,21 @@ def main():
     pm = sub.add_parser("mul"); pm.add_argument("a", type=auto_int); pm.add_argument("b", type=auto_int); pm.add_argument("--trace", action="store_true") 
     pd = sub.add_parser("div"); pd.add_argument("a", type=auto_int); pd.add_argument("b", type=auto_int); pd.add_argument("--unsigned", action="store_true"); pd.add_argument("--trace", action="store_true");
     pl = sub.add_parser("loadhex"); pl.add_argument("path")
-    pr = sub.add_parser("runhex"); pr.add_argument("path"); pr.add_argument("--trace", action="store_true"); pr.add_argument("--steps", type=int, default=200)
+    for name in ("runhex", "runelf"):
+        pr = sub.add_parser(name); pr.add_argument("path"); pr.add_argument("--trace", action="store_true"); pr.add_argument("--steps", type=int, default=200); pr.add_argument("--mode", choices=("interp", "block", "gate"), default="interp")
+        pr.add_argument("--mem", choices=("paged", "flat"), default="paged"); pr.add_argument("--mmap", metavar="FILE", help="back paged memory with this file")
+        pr.add_argument("--profile", choices=("text", "json"), help="print a hot-spot report"); pr.add_argument("--collapsed", metavar="FILE", help="write collapsed stacks for flamegraph tools")
+        pr.add_argument("--timing", choices=("text", "json"), help="model a 5-stage pipeline and print cycles/CPI")
+        pr.add_argument("--predictor", choices=PREDICTORS, help="branch predictor for --timing (implies it)"); pr.add_argument("--btb", type=int, default=0, metavar="N", help="BTB entries (implies --timing)"); pr.add_argument("--ras", type=int, default=0, metavar="N", help="return stack depth (implies --timing)")
+        pr.add_argument("--icache", metavar="SPEC", help="model an L1 I-cache, SIZE:WAYS:LINE[:lru|plru|random]"); pr.add_argument("--dcache", metavar="SPEC", help="model an L1 D-cache (same format)")
+        pr.add_argument("--lockstep", type=int, metavar="N", help="re-check 1 in N ALU/shift/MDU/FPU results on the bit-accurate units"); pr.add_argument("--lockstep-ops", metavar="OPS", help="comma-separated mnemonics to check (default: all with a reference)")
+        pr.add_argument("--harts", type=int, default=1, metavar="N", help="run N harts over shared memory (a0 = hart id)"); pr.add_argument("--quantum", type=int, default=1000, metavar="N", help="instructions per hart per round-robin turn"); pr.add_argument("--parallel", action="store_true", help="one process per hart (needs --mem flat)")
+        pr.add_argument("--uart", type=auto_int, metavar="ADDR", help="attach a UART (output to stdout) at ADDR"); pr.add_argument("--timer", type=auto_int, metavar="ADDR", help="attach a 64-bit mtime/mtimecmp timer at ADDR")
+        pr.add_argument("--syscalls", action="store_true", help="service ECALL (exit/read/write/brk/clock_gettime) with the console on stdin/stdout")
+        pr.add_argument("--adder", choices=adders.ADDERS, help="adder architecture of the gate-level units (default ripple)")
+    pad = sub.add_parser("adders"); pad.add_argument("--width", type=int, default=32); pad.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    pb = sub.add_parser("runbatch"); pb.add_argument("target", help="directory of .hex/.elf images or a manifest file"); pb.add_argument("--steps", type=int, default=200); pb.add_argument("--mode", choices=RUN_MODES, default="interp")
+    pb.add_argument("--jobs", type=int, default=None, help="worker processes (default: one per CPU)"); pb.add_argument("--unordered", action="store_true", help="emit results as they finish")
 
     args = p.parse_args()
 
@@ -104,19 +130,109 @@ def main():
         if args.trace:
             for t in out["trace"]: print(t)
     elif args.cmd=="loadhex":
-        prog = load_hex_file(args.path)
+        prog = load_hex_words(args.path)
         print(f"Loaded {len(prog)} words from {args.path}")
-    elif args.cmd == "runhex":
-        out = run_hex(args.path, max_steps=args.steps, trace=args.trace)
+    elif args.cmd in ("runhex", "runelf"):
+        if args.adder:
+            adders.select(args.adder)
+        if args.mmap and args.mem != "paged":
+            p.error("--mmap needs --mem paged")
+        if args.mem == "flat":
+            mem = FlatMemory()
+        else:
+            mem = PagedMemory(backing=args.mmap)
+        uart = None
+        if args.uart is not None or args.timer is not None:
+            mem = Bus(mem)
+            if args.uart is not None:
+                sys.stdout.flush()
+                uart = mem.attach(args.uart, Uart(sink=sys.stdout.buffer))
+            if args.timer is not None:
+                mem.attach(args.timer, Timer())
+        run = run_hex if args.cmd == "runhex" else run_elf
+        prof = Profile() if args.profile or args.collapsed else None
+        tm = None
+        if args.timing or args.predictor or args.btb or args.ras:
+            tm = PipelineTiming(predictor=make_predictor(args.predictor or "static", args.btb, args.ras))
+        l1 = None
+        if args.icache or args.dcache:
+            l1 = L1(parse_cache_spec(args.icache, "L1I") if args.icache else None,
+                    parse_cache_spec(args.dcache, "L1D") if args.dcache else None)
+        ls = None
+        if args.lockstep or args.lockstep_ops:
+            ls = Lockstep(args.lockstep or 1, args.lockstep_ops.split(",") if args.lockstep_ops else None)
+        sc = None
+        if args.syscalls:
+            sys.stdout.flush()
+            sc = Syscalls(stdin=sys.stdin.buffer, stdout=sys.stdout.buffer, stderr=sys.stderr.buffer)
+        if args.harts > 1 or args.parallel:
+            if args.parallel and args.mem != "flat":
+                p.error("--parallel needs --mem flat")
+            load = MultiHart.from_hex if args.cmd == "runhex" else MultiHart.from_elf
+            mh = load(args.path, args.harts, mem, args.quantum)
+            halt = mh.run_parallel(args.steps, args.mode) if args.parallel else mh.run(args.steps, args.mode, sc)
+            print(f"{len(mh.harts)} harts, {mh.steps} steps in total, halt={halt}")
+            for h in mh.harts:
+                print(f"hart {h.hartid}: {h.steps} steps, PC=0x{h.pc:08X}, halt={h.halt or HALT_MAX_STEPS}")
+            if uart is not None:
+                uart.flush()
+            if sc is not None:
+                print(sc.report_text(), end="")
+            if args.mmap:
+                mem.close()
+            return
+        out = run(args.path, max_steps=args.steps, trace=args.trace, mode=args.mode, mem=mem, profile=prof, timing=tm, caches=l1, lockstep=ls, syscalls=sc)
+        if uart is not None:
+            uart.flush()
         regs = out["regs"]; mem = out["mem"]
+        if args.trace:
+            for line in out["trace"].format():
+                print(line)
+            print(f"  (stop: {out['halt']})")
         print(f"Completed in {out['steps']} steps, PC=0x{out['pc']:08X}")
+        if "elf" in out:
+            sym = out["elf"].symbol_at(out["pc"])
+            print(f"entry=0x{out['elf'].entry:08X} halt={out['halt']}" + (f" in {sym}" if sym else ""))
         # show a few interesting regs the sample touches
         for i in (1,2,3,4,5,6):
             print(f"x{i} = 0x{regs[i]:08X}")
         # sample stores at 0x0001_0000
         addr = 0x00010000
-        if addr in mem:
-            print(f"mem[0x{addr:08X}] = 0x{mem[addr]:08X}")
+        word = mem.read_u32(addr)
+        if word:
+            print(f"mem[0x{addr:08X}] = 0x{word:08X}")
+        if prof is not None:
+            if args.profile == "json":
+                print(prof.report_json())
+            elif args.profile:
+                print(prof.report_text(), end="")
+            if args.collapsed:
+                with open(args.collapsed, "w") as f:
+                    f.write(prof.collapsed())
+        if tm is not None:
+            if args.timing == "json":
+                print(tm.report_json())
+            else:
+                print(tm.report_text(), end="")
+        if l1 is not None:
+            print(l1.report_text(), end="")
+        if ls is not None:
+            print(ls.report_text(), end="")
+        if "gates" in out:
+            print(out["gates"].report_text(), end="")
+        if sc is not None:
+            print(sc.report_text(), end="")
+        if args.mmap:
+            mem.close()
+    elif args.cmd == "adders":
+        if args.json:
+            print(adders.report_json(args.width))
+        else:
+            print(adders.report_text(args.width), end="")
+    elif args.cmd == "runbatch":
+        recs = run_batch(collect_images(args.target), max_steps=args.steps, mode=args.mode,
+                         jobs=args.jobs, ordered=not args.unordered)
+        write_jsonl(recs, sys.stdout)
 
 if __name__ == "__main__":
     main()
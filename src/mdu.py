@@ -1,49 +1,32 @@
 from __future__ import annotations
-from typing import Tuple, Dict, List, Literal
-from memory import Bit
+from typing import Tuple, Dict, Literal
+from memory import (Bit, BitVector, bits_zero, bits_one_hot_lsb, zero_extend, sign_extend,
+                    concat, slice_bits, not_bits, or_reduce, and_reduce)
+from tracebuf import TraceLog
 import gates as g
+import adders
 
 Bits = Tuple[Bit, ...]
 MulOp = Literal["MUL", "MULH", "MULHU", "MULHSU"]
 DivOp = Literal["DIV", "DIVU", "REM", "REMU"]
 
-def _zeros(n: int) -> Bits:
-    return tuple(Bit(False) for _ in range(n))
+def _zeros(n: int) -> BitVector:
+    return bits_zero(n)
 
-def _one_hot_lsb(n: int) -> Bits:
-    return tuple(Bit(False) for _ in range(n - 1)) + (Bit(True),)
+def _one_hot_lsb(n: int) -> BitVector:
+    return bits_one_hot_lsb(n)
 
-def _assert_w(v: Bits, w: int) -> Bits:
-    if len(v) == w:
-        return v
-    if len(v) < w:
-        return (_zeros(w - len(v)) + v)
-    return v[-w:]
+def _assert_w(v: Bits, w: int) -> BitVector:
+    return zero_extend(v, w)
 
 def _is_zero(v: Bits) -> bool:
-    acc = Bit(False)
-    for b in v:
-        acc = g.or_gate(acc, b)
-    return not bool(acc)
-
-def _not_vec(a: Bits) -> Bits:
-    return tuple(g.not_gate(x) for x in a)
-
-def _add_unsigned(a: Bits, b: Bits, cin: Bit = None) -> Tuple[Bits, Bit]:
-    assert len(a) == len(b)
-    if cin is None:
-        cin = Bit(False)
-    n = len(a)
-    out = [Bit(False)] * n
-    carry = cin
-    for i in range(n - 1, -1, -1):
-        axb = g.xor_gate(a[i], b[i])
-        s = g.xor_gate(axb, carry)
-        c1 = g.and_gate(a[i], b[i])
-        c2 = g.and_gate(axb, carry)
-        carry = g.or_gate(c1, c2)
-        out[i] = s
-    return tuple(out), carry
+    return not bool(or_reduce(v))
+
+def _not_vec(a: Bits) -> BitVector:
+    return not_bits(a)
+
+def _add_unsigned(a: Bits, b: Bits, cin: Bit = None) -> Tuple[BitVector, Bit]:
+    return adders.add(a, b, Bit.ZERO if cin is None else cin)
 
 def _inc_unsigned(a: Bits) -> Tuple[Bits, Bit]:
     return _add_unsigned(a, _one_hot_lsb(len(a)))
@@ -55,99 +38,73 @@ def _sub_unsigned(a: Bits, b: Bits) -> Tuple[Bits, Bit]:
     borrow = g.not_gate(carry)  # carry==1 -> no borrow
     return s, borrow
 
-def _shl_logical(a: Bits, steps: int = 1) -> Bits:
-    out = list(a)
-    for _ in range(steps):
-        for i in range(len(out) - 1):
-            out[i] = out[i + 1]
-        out[-1] = Bit(False)
-    return tuple(out)
-
-def _shr_logical(a: Bits, steps: int = 1) -> Bits:
-    out = list(a)
-    for _ in range(steps):
-        for i in range(len(out) - 1, 0, -1):
-            out[i] = out[i - 1]
-        out[0] = Bit(False)
-    return tuple(out)
+def _shl_logical(a: Bits, steps: int = 1) -> BitVector:
+    a = BitVector.of(a)
+    if isinstance(a, BitVector):
+        return BitVector(a.width, a.value << steps)
+    n = len(a)
+    steps = min(steps, n)
+    return concat(slice_bits(a, steps, n), _zeros(steps))
+
+def _shr_logical(a: Bits, steps: int = 1) -> BitVector:
+    a = BitVector.of(a)
+    if isinstance(a, BitVector):
+        return BitVector(a.width, a.value >> steps)
+    n = len(a)
+    steps = min(steps, n)
+    return concat(_zeros(steps), slice_bits(a, 0, n - steps))
 
 def _unsigned_less_than(a: Bits, b: Bits) -> bool:
-    for i in range(len(a)):
-        ai, bi = bool(a[i]), bool(b[i])
-        if ai != bi:
-            return (not ai) and bi
-    return False
-
-def _twos_negate(a: Bits) -> Bits:
-    inv = tuple(g.not_gate(x) for x in a)
-    one = tuple(Bit(False) for _ in range(len(a) - 1)) + (Bit(True),)
-    # add inv + 1
-    out = [Bit(False)] * len(a)
-    carry = Bit(False)
-    # add 'inv' and 'one'
-    for i in range(len(a) - 1, -1, -1):
-        s, carry = g.full_adder(inv[i], one[i], carry)
-        out[i] = s
-    return tuple(out)
+    return BitVector.of(a).value < BitVector.of(b).value
+
+def _twos_negate(a: Bits) -> BitVector:
+    # inv + 1
+    out, _ = _add_unsigned(not_bits(a), bits_one_hot_lsb(len(a)))
+    return out
 
 def _abs_signed32(a: Bits) -> Tuple[Bits, Bit]:
     neg = a[0]
     if bool(neg):
-        return _twos_negate(a), Bit(True)
-    return a, Bit(False)
+        return _twos_negate(a), Bit.ONE
+    return a, Bit.ZERO
 
-def _sign_extend(v: Bits, to_w: int) -> Bits:
-    s = v[0] if v else Bit(False)
-    if len(v) >= to_w:
-        return v[-to_w:]
-    return tuple(s for _ in range(to_w - len(v))) + v
+def _sign_extend(v: Bits, to_w: int) -> BitVector:
+    return sign_extend(v, to_w)
 
-def _pack64(hi: Bits, lo: Bits) -> Bits:
-    return hi + lo
+def _pack64(hi: Bits, lo: Bits) -> BitVector:
+    return concat(hi, lo)
 
-def _mul_u32x32_to_u64(rs1: Bits, rs2: Bits, trace: List[str]) -> Bits:
-    A = [Bit(False) for _ in range(64)]  # accumulator/product (MSB-first)
-    multiplicand = rs1[-32:] if len(rs1) >= 32 else (tuple(Bit(False) for _ in range(32 - len(rs1))) + rs1)
-    multiplier   = rs2[-32:] if len(rs2) >= 32 else (tuple(Bit(False) for _ in range(32 - len(rs2))) + rs2)
+def _mul_u32x32_to_u64(rs1: Bits, rs2: Bits, trace: TraceLog) -> BitVector:
+    A = _zeros(64)  # accumulator/product (MSB-first)
+    multiplicand = _assert_w(rs1, 32)
+    multiplier   = _assert_w(rs2, 32)
 
     for i in range(32):
         lsb = multiplier[-1]
         if bool(lsb):
-            aligned = list(tuple(Bit(False) for _ in range(32)) + multiplicand)
-            # shift aligned left by i (within 64 bits)
-            for _ in range(i):
-                for j in range(63):
-                    aligned[j] = aligned[j + 1]
-                aligned[63] = Bit(False)
-            # A = A + aligned
-            carry = Bit(False)
-            for k in range(63, -1, -1):
-                s, carry = g.full_adder(A[k], aligned[k], carry)
-                A[k] = s
-            trace.append(f"MUL step{i}: add")
+            # multiplicand zero-extended to 64 and shifted left by i
+            aligned = _shl_logical(_assert_w(multiplicand, 64), i)
+            A, _ = _add_unsigned(A, aligned)
+            trace.add("MUL step{}: add", i)
         # shift multiplier >> 1
-        mm = list(multiplier)
-        for j in range(31, 0, -1):
-            mm[j] = mm[j - 1]
-        mm[0] = Bit(False)
-        multiplier = tuple(mm)
+        multiplier = _shr_logical(multiplier)
 
-    return tuple(A)
+    return A
 
 def _mul_overflow_signed32(low32: Bits, full64: Bits) -> Bit:
     # Overflow if 64-bit product doesn't fit signed 32:
     # i.e., top 32 bits must be all sign-bit copies of low32[0]
     sign32 = low32[0]
     hi32 = full64[0:32]
-    diff = Bit(False)
+    diff = Bit.ZERO
     for b in hi32:
         diff = g.or_gate(diff, g.xor_gate(b, sign32))
     return diff  # True if any bit differs -> overflow
 
 def mdu_mul(op: MulOp, rs1: Bits, rs2: Bits) -> Dict[str, object]:
-    trace: List[str] = []
-    rs1 = rs1[-32:] if len(rs1) >= 32 else (tuple(Bit(False) for _ in range(32 - len(rs1))) + rs1)
-    rs2 = rs2[-32:] if len(rs2) >= 32 else (tuple(Bit(False) for _ in range(32 - len(rs2))) + rs2)
+    trace = TraceLog()
+    rs1 = _assert_w(rs1, 32)
+    rs2 = _assert_w(rs2, 32)
 
     if op == "MUL":
         trace.append("MUL start: 32x32 -> 64 shift-add (low 32)")
@@ -187,57 +144,47 @@ def mdu_mul(op: MulOp, rs1: Bits, rs2: Bits) -> Dict[str, object]:
 
 # Division / Remainder (RV32)
 
-def _restoring_div_unsigned(dividend: Bits, divisor: Bits, trace: List[str]) -> Tuple[Bits, Bits]:
+def _restoring_div_unsigned(dividend: Bits, divisor: Bits, trace: TraceLog) -> Tuple[Bits, Bits]:
     # Unsigned restoring division: dividend/divisor -> (quotient, remainder)
     # Iterates 32 steps; uses 33-bit remainder
     n = 32
-    Q = list(_assert_w(dividend, n))
-    D = _assert_w(divisor, n)
-    R = list(_zeros(n + 1))  # 33-bit remainder
+    Q = _assert_w(dividend, n)
+    D = concat(_zeros(1), _assert_w(divisor, n))  # align D under low n+1 bits
+    R = _zeros(n + 1)  # 33-bit remainder
 
     trace.append("DIV start: restoring unsigned")
 
     for i in range(n):
-        # Left shift (R,Q) by 1
-        # R: <<1; bring in Q[0] into R LSB
-        msb_q = Q[0]
-        # shift R << 1
-        for j in range(0, n):
-            R[j] = R[j + 1]
-        R[n] = msb_q
-        # shift Q << 1
-        for j in range(0, n - 1):
-            Q[j] = Q[j + 1]
-        Q[n - 1] = Bit(False)
+        # Left shift (R,Q) by 1: R <<1 bringing Q's MSB into R's LSB; Q <<1
+        R = BitVector(n + 1, (R.value << 1) | (Q.value >> (n - 1)))
+        Q = BitVector(n, Q.value << 1)
 
         # R = R - D
-        R_before = tuple(R)
-        R_sub, borrow = _sub_unsigned(tuple(R), _zeros(1) + D)  # align D under low n+1 bits
-        R = list(R_sub)
+        R_sub, borrow = _sub_unsigned(R, D)
         if bool(borrow):
-            # restore and set Q LSB=0
-            R = list(R_before)
-            Q[-1] = Bit(False)
-            trace.append(f"DIV step{i}: restore (R<D)")
+            # restore (keep R) and leave Q LSB=0
+            trace.add("DIV step{}: restore (R<D)", i)
         else:
             # keep and set Q LSB=1
-            Q[-1] = Bit(True)
-            trace.append(f"DIV step{i}: keep (R>=D)")
+            R = R_sub
+            Q = BitVector(n, Q.value | 1)
+            trace.add("DIV step{}: keep (R>=D)", i)
 
-    return tuple(Q), tuple(R)[-32:]  # quotient, remainder (low 32 of 33-bit)
+    return Q, R[-32:]  # quotient, remainder (low 32 of 33-bit)
 
 def _neg_if(bit: Bit, val: Bits) -> Bits:
     return _twos_negate(val) if bool(bit) else val
 
 def _is_int_min(x: Bits) -> bool:
-    return bool(x[0]) and all(not b for b in x[1:])
+    x = BitVector.of(x)
+    return x.value == 1 << (x.width - 1)
 
 def mdu_div(op: DivOp, rs1: Bits, rs2: Bits) -> Dict[str, object]:
     # DIV/DIVU/REM/REMU with RISC-V edge semantics and trace.
     # Returns: for DIV/DIVU -> {'q_bits':..., 'r_bits':..., 'flags': {'overflow': bool}, 'trace': [str,...]}
     # for REM/REMU -> same shape but you can ignore q_bits in callers if unused.
     
-    trace: List[str] = []
+    trace = TraceLog()
     a = _assert_w(rs1, 32)
     b = _assert_w(rs2, 32)
 
@@ -249,10 +196,10 @@ def mdu_div(op: DivOp, rs1: Bits, rs2: Bits) -> Dict[str, object]:
     if _is_zero(b):
         trace.append("DIV special: divide-by-zero")
         if op in ("DIV", "REM"):
-            q = tuple(Bit(True) for _ in range(32))  # -1
+            q = BitVector(32, -1)  # -1
             r = a
         else:  # DIVU/REMU
-            q = tuple(Bit(True) for _ in range(32))  # all ones
+            q = BitVector(32, -1)  # all ones
             r = a
         return {"q_bits": q, "r_bits": r, "flags": {"overflow": False}, "trace": trace}
 
@@ -265,10 +212,10 @@ def mdu_div(op: DivOp, rs1: Bits, rs2: Bits) -> Dict[str, object]:
 
     # Prepare operands for unsigned division
     if unsigned:
-        a_abs, a_neg = a, Bit(False)
-        b_abs, b_neg = b, Bit(False)
-        q_sign = Bit(False)
-        r_sign = Bit(False)
+        a_abs, a_neg = a, Bit.ZERO
+        b_abs, b_neg = b, Bit.ZERO
+        q_sign = Bit.ZERO
+        r_sign = Bit.ZERO
     else:
         a_abs, a_neg = _abs_signed32(a)
         b_abs, b_neg = _abs_signed32(b)
@@ -293,7 +240,4 @@ def mdu_div(op: DivOp, rs1: Bits, rs2: Bits) -> Dict[str, object]:
     
 # Quick helper
 def _is_all_ones(v: Bits) -> bool:
-    acc = Bit(True)
-    for b in v:
-        acc = g.and_gate(acc, b)
-    return bool(acc)
+    return bool(and_reduce(v))
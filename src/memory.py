@@ -1,13 +1,21 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Tuple, Iterable, List
+from typing import Tuple, Iterable, List, Optional
 
 class Bit:
-    # Bit is gonna do bit stuff 
+    # Bit is gonna do bit stuff. There are only two: Bit(x) returns the shared
+    # Bit.ZERO or Bit.ONE (set up below the class), so bits cost no
+    # allocation and code may test them by identity (b is Bit.ONE).
     __slots__ = ("_v",)
+    ZERO: Bit
+    ONE: Bit
 
-    def __init__(self, value: bool = False):
-        self._v = bool(value)
+    def __new__(cls, value: bool = False) -> Bit:
+        return cls.ONE if value else cls.ZERO
+
+    # copy/deepcopy/pickle go back through Bit(...) and get the singleton
+    def __reduce__(self):
+        return Bit, (self._v,)
 
     def __bool__(self) -> bool:
         return self._v
@@ -19,10 +27,13 @@ class Bit:
     def as_bool(self) -> bool:
         return self._v
     
-    # value-based equality so Bit(True) == Bit(True)
+    # value-based equality so Bit(True) == Bit(True); with two instances
+    # that is identity
     def __eq__(self, other) -> bool:
+        if other is self:
+            return True
         if isinstance(other, Bit):
-            return self._v == other._v
+            return False
         # allow comparison to plain bools/ints in a pinch
         try:
             return self._v == bool(other)
@@ -32,115 +43,227 @@ class Bit:
     # hash consistent with equality (lets Bits be used in sets/dicts)
     def __hash__(self) -> int:
         return 1 if self._v else 0
-    
-BitVec = Tuple[Bit, ...]
-Bitx12 = BitVec
-Bitx32 = BitVec
-
-# Bit Vector helpers (no num arithmetic here)
-
-def bits_zero(n: int) -> BitVec:
-    # n zeros
-    return tuple(Bit(False) for _ in range(n))
-
-def bits_one_hot_lsb(n: int) -> BitVec:
-    # ...0001 (LSB = 1)
-    if n <= 0:
-        return tuple()
-    return tuple(Bit(False) for _ in range(n-1)) + (Bit(True),)
-
-def concat(*vecs: Iterable[Bit]) -> BitVec:
-    out: List[Bit] = []
-    for v in vecs:
-        out.extend(v)
-    return tuple(out)
 
-def msb(v: BitVec) -> Bit:
-    return v[0] if v else Bit(False)
-
-def lsb(v: BitVec) -> Bit:
-    return v[-1] if v else Bit(False)
-
-def slice_bits(v: BitVec, start: int, end: int) -> BitVec:
-    return tuple(v[start:end])
+Bit.ZERO = object.__new__(Bit)
+Bit.ZERO._v = False
+Bit.ONE = object.__new__(Bit)
+Bit.ONE._v = True
+
+_B0, _B1 = Bit.ZERO, Bit.ONE
+_BYTE_BITS = tuple(tuple(_B1 if (b >> i) & 1 else _B0 for i in range(7, -1, -1)) for b in range(256))
+
+class BitVector:
+    # Fixed-width bit vector packed into one Python int. Indexing is MSB-first
+    # like the tuple vectors (v[0] is the MSB, v[-1] the LSB), and len(),
+    # iteration (MSB-first, yielding Bits), slicing, + (concatenation, also
+    # with a tuple on either side) and == (also against a tuple of Bits) all
+    # behave like the equivalent Tuple[Bit, ...], so code written for tuples
+    # takes a BitVector unchanged. The helpers below work on the int.
+    #
+    # Symbolic bits (objects with a true `symbolic` attribute, such as the
+    # wires netlist.record() feeds through a circuit) cannot be packed:
+    # of() leaves a sequence holding one as a tuple, and the helpers then
+    # apply the gates in gates.py bit by bit, so the recorder sees them.
+    __slots__ = ("width", "value")
+
+    def __init__(self, width: int, value: int = 0):
+        self.width = width
+        self.value = value & ((1 << width) - 1)
+
+    @classmethod
+    def of(cls, v: Iterable[Bit]) -> BitVector:
+        # Adapter: pack any MSB-first bit sequence (a BitVector is returned as
+        # is; one holding symbolic bits comes back as a tuple).
+        if isinstance(v, BitVector):
+            return v
+        v = tuple(v)
+        out = 0
+        try:
+            for b in v:
+                out = (out << 1) | b._v     # Bits: read the slot, skip __bool__
+        except AttributeError:
+            out = 0
+            for b in v:
+                if getattr(b, "symbolic", False):
+                    return v
+                out = (out << 1) | (1 if b else 0)
+        return cls(len(v), out)
+
+    def bits(self) -> Tuple[Bit, ...]:
+        # Adapter: the same vector as a tuple of Bits (whole bytes by table).
+        w, v = self.width, self.value
+        head = w & 7
+        out = tuple(_B1 if (v >> i) & 1 else _B0 for i in range(w - 1, w - 1 - head, -1))
+        for sh in range(w - head - 8, -1, -8):
+            out += _BYTE_BITS[(v >> sh) & 0xFF]
+        return out
+
+    def __len__(self) -> int:
+        return self.width
+
+    def __int__(self) -> int:
+        return self.value
+
+    def __iter__(self):
+        return iter(self.bits())
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self.width)
+            if step != 1:
+                return BitVector.of(self.bits()[i])
+            if stop <= start:
+                return BitVector(0)
+            return BitVector(stop - start, self.value >> (self.width - stop))
+        if i < 0:
+            i += self.width
+        if not 0 <= i < self.width:
+            raise IndexError("bit index out of range")
+        return _B1 if (self.value >> (self.width - 1 - i)) & 1 else _B0
+
+    def __add__(self, other):
+        if isinstance(other, (tuple, list)):
+            other = BitVector.of(other)
+            if not isinstance(other, BitVector):
+                return self.bits() + other
+        elif not isinstance(other, BitVector):
+            return NotImplemented
+        return BitVector(self.width + other.width, (self.value << other.width) | other.value)
 
-def zero_extend(v: BitVec, new_width: int) -> BitVec:
-    if len(v) >= new_width:
-        return tuple(v[-new_width:])
-    pad = bits_zero(new_width - len(v))
-    return concat(pad, v)
+    def __radd__(self, other):
+        if not isinstance(other, (tuple, list)):
+            return NotImplemented
+        other = BitVector.of(other)
+        if not isinstance(other, BitVector):
+            return other + self.bits()
+        return other + self
 
-def sign_extend(v: BitVec, new_width: int) -> BitVec:
-    s = msb(v)
-    if len(v) >= new_width:
-        return tuple(v[-new_width:])
-    pad = tuple(s for _ in range(new_width - len(v)))
-    return concat(pad, v)
+    def __eq__(self, other) -> bool:
+        if isinstance(other, BitVector):
+            return self.width == other.width and self.value == other.value
+        if isinstance(other, (tuple, list)):
+            return self.bits() == tuple(other)
+        return NotImplemented
 
-def not_bits(v: BitVec) -> BitVec:
-    return tuple(Bit(not b.as_bool()) for b in v)
+    # hash of the equal tuple, so both can key the same dict
+    def __hash__(self) -> int:
+        return hash(self.bits())
 
-def and_bits(a: BitVec, b: BitVec) -> BitVec:
-    return tuple(Bit(bool(x) and bool(y)) for x, y in zip(a, b))
+    def __repr__(self) -> str:
+        return "".join("1" if b else "0" for b in self) or "<empty>"
 
-def or_bits(a: BitVec, b: BitVec) -> BitVec:
-    return tuple(Bit(bool(x) or bool(y)) for x, y in zip(a, b))
+BitVec = Tuple[Bit, ...]        # or a BitVector; both are accepted everywhere
+Bitx12 = BitVec
+Bitx32 = BitVec
 
-def xor_bits(a: BitVec, b: BitVec) -> BitVec:
-    return tuple(Bit(bool(x) ^ bool(y)) for x, y in zip(a, b))
+# Bit-vector helpers. They take any MSB-first bit sequence and return a
+# BitVector, computed on the packed int (no per-bit work). Symbolic operands
+# (see BitVector) give a tuple, built with the gates.
 
-# Bit-vector helpers (no num math)
+def _per_bit(gate: str, *vecs) -> BitVec:
+    import gates
+    fn = getattr(gates, gate)
+    return tuple(fn(*bits) for bits in zip(*vecs))
 
-def bits_zero(n: int) -> BitVec:
+def bits_zero(n: int) -> BitVector:
     # n zeros
-    return tuple(Bit(False) for _ in range(n))
+    return BitVector(n)
 
-def bits_one_hot_lsb(n: int) -> BitVec:
+def bits_one_hot_lsb(n: int) -> BitVector:
     # ..0001 (LSB = 1)
-    if n <= 0:
-        return tuple()
-    return tuple(Bit(False) for _ in range(n-1)) + (Bit(True),)
+    return BitVector(n, 1)
 
-def concat(*vecs: Iterable[Bit]) -> BitVec:
-    out: List[Bit] = []
-    for v in vecs:
-        out.extend(v)
-    return tuple(out)
+def concat(*vecs: Iterable[Bit]) -> BitVector:
+    parts = [BitVector.of(v) for v in vecs]
+    if not all(isinstance(p, BitVector) for p in parts):
+        return tuple(b for p in parts for b in p)
+    out = BitVector(0)
+    for p in parts:
+        out = out + p
+    return out
 
 def msb(v: BitVec) -> Bit:
-    return v[0] if v else Bit(False)
+    return v[0] if v else _B0
 
 def lsb(v: BitVec) -> Bit:
-    return v[-1] if v else Bit(False)
+    return v[-1] if v else _B0
 
-def slice_bits(v: BitVec, start: int, end: int) -> BitVec:
+def slice_bits(v: BitVec, start: int, end: int) -> BitVector:
     # (start:end) MSB-indexed (0 is MSB)
-    return tuple(v[start:end])
-
-def zero_extend(v: BitVec, new_width: int) -> BitVec:
-    if len(v) >= new_width:
-        return tuple(v[-new_width:])
-    pad = bits_zero(new_width - len(v))
-    return concat(pad, v)
+    return BitVector.of(v)[start:end]
 
-def sign_extend(v: BitVec, new_width: int) -> BitVec:
-    s = msb(v)
+def zero_extend(v: BitVec, new_width: int) -> BitVector:
+    # Also truncates to the new_width LSBs when v is wider.
+    v = BitVector.of(v)
+    if isinstance(v, BitVector):
+        return BitVector(new_width, v.value)
     if len(v) >= new_width:
-        return tuple(v[-new_width:])
-    pad = tuple(s for _ in range(new_width - len(v)))
-    return concat(pad, v)
-
-def not_bits(v: BitVec) -> BitVec:
-    return tuple(Bit(not b.as_bool()) for b in v)
-
-def and_bits(a: BitVec, b: BitVec) -> BitVec:
-    return tuple(Bit(bool(x) and bool(y)) for x, y in zip(a, b))
-
-def or_bits(a: BitVec, b: BitVec) -> BitVec:
-    return tuple(Bit(bool(x) or bool(y)) for x, y in zip(a, b))
-
-def xor_bits(a: BitVec, b: BitVec) -> BitVec:
-    return tuple(Bit(bool(x) ^ bool(y)) for x, y in zip(a, b))
+        return v[len(v) - new_width:]
+    return (_B0,) * (new_width - len(v)) + v
+
+def sign_extend(v: BitVec, new_width: int) -> BitVector:
+    v = BitVector.of(v)
+    if not isinstance(v, BitVector):
+        if len(v) >= new_width:
+            return v[len(v) - new_width:]
+        return (msb(v),) * (new_width - len(v)) + v
+    if v.width < new_width and v.width and v.value >> (v.width - 1):
+        return BitVector(new_width, v.value | (-1 << v.width))
+    return BitVector(new_width, v.value)
+
+def not_bits(v: BitVec) -> BitVector:
+    v = BitVector.of(v)
+    if not isinstance(v, BitVector):
+        return _per_bit("not_gate", v)
+    return BitVector(v.width, ~v.value)
+
+def _packed_pair(a: BitVec, b: BitVec) -> Optional[Tuple[int, int, int]]:
+    # (width, a, b) cut to the common width like zip() would -- the leading
+    # (MSB) bits -- or None when either operand is symbolic.
+    a, b = BitVector.of(a), BitVector.of(b)
+    if not (isinstance(a, BitVector) and isinstance(b, BitVector)):
+        return None
+    n = min(a.width, b.width)
+    return n, a.value >> (a.width - n), b.value >> (b.width - n)
+
+def and_bits(a: BitVec, b: BitVec) -> BitVector:
+    r = _packed_pair(a, b)
+    if r is None:
+        return _per_bit("and_gate", a, b)
+    return BitVector(r[0], r[1] & r[2])
+
+def or_bits(a: BitVec, b: BitVec) -> BitVector:
+    r = _packed_pair(a, b)
+    if r is None:
+        return _per_bit("or_gate", a, b)
+    return BitVector(r[0], r[1] | r[2])
+
+def xor_bits(a: BitVec, b: BitVec) -> BitVector:
+    r = _packed_pair(a, b)
+    if r is None:
+        return _per_bit("xor_gate", a, b)
+    return BitVector(r[0], r[1] ^ r[2])
+
+# Reductions: the result of a chain of len(v) OR / AND gates
+
+def _chain(gate: str, acc: Bit, v) -> Bit:
+    import gates
+    fn = getattr(gates, gate)
+    for b in v:
+        acc = fn(acc, b)
+    return acc
+
+def or_reduce(v: BitVec) -> Bit:
+    v = BitVector.of(v)
+    if not isinstance(v, BitVector):
+        return _chain("or_gate", _B0, v)
+    return _B1 if v.value else _B0
+
+def and_reduce(v: BitVec) -> Bit:
+    v = BitVector.of(v)
+    if not isinstance(v, BitVector):
+        return _chain("and_gate", _B1, v)
+    return _B1 if v.value == (1 << v.width) - 1 else _B0
 
 class Reg:
     # Synchronous load/clear register storing a fixed-width bit vector.
@@ -205,9 +328,16 @@ class FPRegFile:
 ZERO32: Bitx32 = bits_zero(32)
 
 def make_bitx32(bits: Iterable[Bit]) -> Bitx32:
-    v = tuple(bits)
-    return zero_extend(v, 32) if len(v) < 32 else tuple(v[-32:])
+    return zero_extend(bits, 32)
 
 def make_bitx12(bits: Iterable[Bit]) -> Bitx12:
-    v = tuple(bits)
-    return zero_extend(v, 12) if len(v) < 12 else tuple(v[-12:])
\ No newline at end of file
+    return zero_extend(bits, 12)
+
+# Host int <-> bit-vector conversion (MSB-first), for code that bridges the
+# int-based runner and the bit-level units
+
+def bits_from_u32(v: int, width: int = 32) -> BitVector:
+    return BitVector(width, v)
+
+def u32_from_bits(v: Iterable[Bit]) -> int:
+    return BitVector.of(v).value
@@ -0,0 +1,234 @@
+from __future__ import annotations
+import io
+from bisect import bisect_right
+from typing import BinaryIO, List, Optional, Tuple
+from ram import MemoryFault
+
+# Memory-mapped I/O: a Bus wraps a RAM backend (ram.FlatMemory/PagedMemory)
+# and routes loads and stores that fall in a device's range to the device.
+# It has the same read_u8/u16/u32 and write_u8/u16/u32 interface, so the
+# runner, the block translator and the gate backend use it unchanged:
+#
+#     bus = Bus(PagedMemory())
+#     uart = bus.attach(0x1000_0000, Uart())
+#     run_hex(path, mem=bus)
+#
+# Routing: devices are kept sorted by base address, and everything they
+# cover lies in one window [lo, hi). An access outside the window -- all of
+# ordinary RAM, with devices mapped high -- costs one compare before going
+# to the RAM method. Inside the window, bisect over the bases finds the
+# candidate device; holes between devices still go to RAM.
+#
+# Bulk access (load/read/zero, used for images and syscalls), snapshots and
+# digests go straight to RAM; device state is not part of them.
+
+class Device:
+    # Base class: `size` bytes of registers; offsets are relative to the base
+    # the device is attached at. Unaligned and multi-byte accesses are passed
+    # through as one call with their width.
+    size = 4
+    name = "device"
+
+    def read(self, offset: int, width: int) -> int:
+        return 0
+
+    def write(self, offset: int, width: int, value: int) -> None:
+        pass
+
+class Bus:
+    __slots__ = ("ram", "devices", "starts", "ends", "lo", "hi",
+                 "_r8", "_r16", "_r32", "_w8", "_w16", "_w32")
+
+    def __init__(self, ram):
+        self.ram = ram
+        self.devices: List[Tuple[int, Device]] = []   # (base, device), sorted by base
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.lo = self.hi = 0                          # empty window
+        self._r8, self._r16, self._r32 = ram.read_u8, ram.read_u16, ram.read_u32
+        self._w8, self._w16, self._w32 = ram.write_u8, ram.write_u16, ram.write_u32
+
+    def attach(self, base: int, device: Device) -> Device:
+        end = base + device.size
+        if base < 0 or end > 1 << 32 or device.size <= 0:
+            raise ValueError(f"{device.name}: range 0x{base:X}+0x{device.size:X} is outside the address space")
+        for b, d in self.devices:
+            if base < b + d.size and b < end:
+                raise ValueError(f"{device.name} at 0x{base:08X} overlaps {d.name} at 0x{b:08X}")
+        self.devices.append((base, device))
+        self.devices.sort(key=lambda bd: bd[0])
+        self.starts = [b for b, _d in self.devices]
+        self.ends = [b + d.size for b, d in self.devices]
+        self.lo, self.hi = self.starts[0], max(self.ends)
+        return device
+
+    def find(self, addr: int) -> Optional[Tuple[int, Device]]:
+        # (base, device) covering addr, or None for RAM.
+        i = bisect_right(self.starts, addr) - 1
+        if i >= 0 and addr < self.ends[i]:
+            return self.devices[i]
+        return None
+
+    def _io_read(self, addr: int, width: int, ram_read):
+        hit = self.find(addr)
+        if hit is None:
+            return ram_read(addr)
+        base, dev = hit
+        if addr + width > base + dev.size:
+            raise MemoryFault(addr, width)
+        return dev.read(addr - base, width)
+
+    def _io_write(self, addr: int, width: int, val: int, ram_write) -> None:
+        hit = self.find(addr)
+        if hit is None:
+            ram_write(addr, val)
+            return
+        base, dev = hit
+        if addr + width > base + dev.size:
+            raise MemoryFault(addr, width)
+        dev.write(addr - base, width, val & ((1 << 8 * width) - 1))
+
+    # loads
+
+    def read_u8(self, addr: int) -> int:
+        if addr < self.lo or addr >= self.hi:
+            return self._r8(addr)
+        return self._io_read(addr, 1, self._r8)
+
+    def read_u16(self, addr: int) -> int:
+        if addr < self.lo or addr >= self.hi:
+            return self._r16(addr)
+        return self._io_read(addr, 2, self._r16)
+
+    def read_u32(self, addr: int) -> int:
+        if addr < self.lo or addr >= self.hi:
+            return self._r32(addr)
+        return self._io_read(addr, 4, self._r32)
+
+    # stores
+
+    def write_u8(self, addr: int, val: int):
+        if addr < self.lo or addr >= self.hi:
+            self._w8(addr, val)
+        else:
+            self._io_write(addr, 1, val, self._w8)
+
+    def write_u16(self, addr: int, val: int):
+        if addr < self.lo or addr >= self.hi:
+            self._w16(addr, val)
+        else:
+            self._io_write(addr, 2, val, self._w16)
+
+    def write_u32(self, addr: int, val: int):
+        if addr < self.lo or addr >= self.hi:
+            self._w32(addr, val)
+        else:
+            self._io_write(addr, 4, val, self._w32)
+
+    # everything else (load/read/zero/snapshot/restore/iter_pages/close...)
+
+    def __getattr__(self, name):
+        return getattr(self.ram, name)
+
+# devices
+
+class Uart(Device):
+    # Minimal 16550-style UART. Offset 0: write transmits a byte, read takes
+    # the next received byte (0 when none). Offset 5 (LSR): bit 0 = a byte is
+    # waiting, bit 5 = transmitter ready (always). Transmitted bytes collect
+    # in an io.BytesIO and reach the sink in bulk, like syscalls.Syscalls.
+    size = 8
+    name = "uart"
+    THR = RBR = 0
+    LSR = 5
+    LSR_DR = 0x01
+    LSR_THRE = 0x20
+
+    def __init__(self, rx: bytes = b"", sink: Optional[BinaryIO] = None, flush_bytes: int = 1 << 16):
+        self.rx = io.BytesIO(rx)
+        self.pending = len(rx)
+        self.tx = io.BytesIO()
+        self.sink = sink
+        self.flush_bytes = flush_bytes
+
+    def read(self, offset: int, width: int) -> int:
+        if offset == self.RBR:
+            b = self.rx.read(1)
+            if not b:
+                return 0
+            self.pending -= 1
+            return b[0]
+        if offset == self.LSR:
+            return self.LSR_THRE | (self.LSR_DR if self.pending else 0)
+        return 0
+
+    def write(self, offset: int, width: int, value: int) -> None:
+        if offset == self.THR:
+            self.tx.write(bytes((value & 0xFF,)))
+            if self.sink is not None and self.tx.tell() >= self.flush_bytes:
+                self.flush()
+
+    def flush(self) -> None:
+        if self.sink is not None and self.tx.tell():
+            self.sink.write(self.tx.getvalue())
+            self.sink.flush()
+            self.tx.seek(0)
+            self.tx.truncate()
+
+    def output(self) -> bytes:
+        return self.tx.getvalue()
+
+class Timer(Device):
+    # CLINT-style 64-bit mtime (offset 0/4) and mtimecmp (offset 8/12). There
+    # are no interrupts; `expired` (offset 16) reads 1 once mtime >= mtimecmp.
+    # mtime advances by `tick` on every read of its low word, so a polling
+    # loop sees time pass and runs stay deterministic.
+    size = 20
+    name = "timer"
+
+    def __init__(self, tick: int = 1):
+        self.tick = tick
+        self.mtime = 0
+        self.mtimecmp = (1 << 64) - 1
+
+    def read(self, offset: int, width: int) -> int:
+        if offset == 0:
+            self.mtime += self.tick
+            return self.mtime & 0xFFFFFFFF
+        if offset == 4:
+            return self.mtime >> 32 & 0xFFFFFFFF
+        if offset == 8:
+            return self.mtimecmp & 0xFFFFFFFF
+        if offset == 12:
+            return self.mtimecmp >> 32
+        if offset == 16:
+            return 1 if self.mtime >= self.mtimecmp else 0
+        return 0
+
+    def write(self, offset: int, width: int, value: int) -> None:
+        if offset == 0:
+            self.mtime = (self.mtime & ~0xFFFFFFFF) | value
+        elif offset == 4:
+            self.mtime = (self.mtime & 0xFFFFFFFF) | value << 32
+        elif offset == 8:
+            self.mtimecmp = (self.mtimecmp & ~0xFFFFFFFF) | value
+        elif offset == 12:
+            self.mtimecmp = (self.mtimecmp & 0xFFFFFFFF) | value << 32
+
+class Framebuffer(Device):
+    # width x height 32-bit pixels (0x00RRGGBB), row-major; plain storage.
+    name = "framebuffer"
+
+    def __init__(self, width: int = 320, height: int = 240):
+        self.width, self.height = width, height
+        self.size = 4 * width * height
+        self.pixels = bytearray(self.size)
+
+    def read(self, offset: int, width: int) -> int:
+        return int.from_bytes(self.pixels[offset:offset + width], "little")
+
+    def write(self, offset: int, width: int, value: int) -> None:
+        self.pixels[offset:offset + width] = value.to_bytes(width, "little")
+
+    def pixel(self, x: int, y: int) -> int:
+        return self.read(4 * (y * self.width + x), 4)
@@ -0,0 +1,346 @@
+from __future__ import annotations
+import json
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import gates
+from memory import Bit, BitVector
+
+# Gate netlists: record what a gates-based function computes, then evaluate
+# it bitsliced, many input vectors per pass.
+#
+# record(fn, widths) calls fn with symbolic inputs -- one MSB-first tuple of
+# Wires per argument -- while the primitive gates (in gates.py and in any
+# module passed in that imported them by name, as for gates.GateCounter)
+# add netlist nodes instead of computing bits. Constants fold away and a
+# gate repeated on the same inputs is shared. memory.py's vector helpers
+# apply the gates bit by bit to wires, so code written with them records as
+# the gates they stand for:
+#
+#     net = record(alu._ripple_add, (32, 32))     # outputs: sum, carry
+#     run = net.compile()
+#
+# The units sometimes branch on a computed bit (the shift-add multiplier
+# skips the add for a 0 multiplier bit; FPU32._add_into carries only while
+# the carry is 1), and a netlist is straight-line. So a recording follows
+# the path of one example input: bool() of a wire answers with the example's
+# value and is kept as a guard. The compiled netlist returns, with its
+# outputs, the lanes on which every guard holds. Circuit records further
+# paths for the other lanes as it meets them (up to max_paths, then it calls
+# fn lane by lane). Branch-free circuits such as the adders have one path.
+#
+# compile() turns a netlist into straight-line Python over bit planes: ints
+# whose bit L belongs to lane L. Every gate is then one &, | or ^ for all
+# lanes at once, for any number of lanes.
+#
+# Functions that read a packed BitVector (.value) cannot be recorded;
+# record() raises ValueError for them.
+
+DEFAULT_MAX_PATHS = 64
+
+# node op -> Python expression over bit planes (M: mask of all lanes)
+_EXPR = {
+    "not": "M ^ {0}",
+    "and": "{0} & {1}",
+    "or": "{0} | {1}",
+    "xor": "{0} ^ {1}",
+    "and3": "{0} & {1} & {2}",
+    "or3": "{0} | {1} | {2}",
+}
+
+class Wire:
+    # A symbolic bit while recording; `value` is the example input's value.
+    __slots__ = ("id", "value", "net")
+    symbolic = True
+
+    def __init__(self, id: int, value: bool, net: Netlist):
+        self.id = id
+        self.value = value
+        self.net = net
+
+    def __bool__(self) -> bool:
+        self.net.guards.setdefault(self.id, self.value)
+        return self.value
+
+    def __repr__(self) -> str:
+        return f"w{self.id}"
+
+class Netlist:
+    def __init__(self, widths: Sequence[int]):
+        self.widths = list(widths)
+        self.n_inputs = sum(self.widths)
+        self.nodes: List[Tuple[str, Tuple[int, ...]]] = []   # node k drives wire n_inputs + k
+        self.outputs: List[List] = []       # per output group: wire ids, or Bit constants
+        self.guards: Dict[int, bool] = {}   # wire id -> value this path needs
+        self._wires: List[Wire] = []
+        self._shared: Dict[Tuple, Wire] = {}
+
+    # recording
+
+    def _wire(self, value: bool) -> Wire:
+        w = Wire(len(self._wires), value, self)
+        self._wires.append(w)
+        return w
+
+    def _node(self, op: str, ins: List[Wire]) -> Wire:
+        key = (op, tuple(sorted(w.id for w in ins)))
+        w = self._shared.get(key)
+        if w is None:
+            vals = [x.value for x in ins]
+            if op == "not":
+                v = not vals[0]
+            elif op in ("and", "and3"):
+                v = all(vals)
+            elif op in ("or", "or3"):
+                v = any(vals)
+            else:
+                v = vals[0] != vals[1]
+            w = self._shared[key] = self._wire(v)
+            self.nodes.append((op, tuple(x.id for x in ins)))
+        return w
+
+    def gate(self, op: str, *args):
+        # One gate on Bits/bools/Wires: a Bit when the result is constant.
+        if op == "not":
+            (a,) = args
+            return self._node("not", [a]) if isinstance(a, Wire) else Bit(not a)
+        if op == "xor":
+            a, b = args
+            if not isinstance(a, Wire):
+                a, b = b, a
+            if not isinstance(a, Wire):
+                return Bit(bool(a) != bool(b))
+            if not isinstance(b, Wire):
+                return self._node("not", [a]) if b else a
+            return Bit.ZERO if a is b else self._node("xor", [a, b])
+        absorbing = op in ("or", "or3")     # or: a 1 decides; and: a 0 does
+        ins: List[Wire] = []
+        for x in args:
+            if isinstance(x, Wire):
+                if all(x is not y for y in ins):
+                    ins.append(x)
+            elif bool(x) == absorbing:
+                return Bit(absorbing)
+        if not ins:
+            return Bit(not absorbing)
+        if len(ins) == 1:
+            return ins[0]
+        base = "or" if absorbing else "and"
+        return self._node(base + ("3" if len(ins) == 3 else ""), ins)
+
+    # results
+
+    def depth(self) -> int:
+        # Logic depth: gates on the longest input-to-output path.
+        level = [0] * self.n_inputs
+        for _op, ins in self.nodes:
+            level.append(1 + max(level[i] for i in ins))
+        outs = [r for grp in self.outputs for r in grp if isinstance(r, int)]
+        return max((level[r] for r in outs), default=0)
+
+    def report(self) -> Dict:
+        by_op: Dict[str, int] = {}
+        for op, _ins in self.nodes:
+            by_op[op] = by_op.get(op, 0) + 1
+        return {
+            "inputs": self.widths,
+            "outputs": [len(g) for g in self.outputs],
+            "gates": len(self.nodes),
+            "by_op": dict(sorted(by_op.items())),
+            "depth": self.depth(),
+            "guards": len(self.guards),
+        }
+
+    def report_json(self) -> str:
+        return json.dumps(self.report(), indent=2)
+
+    # compilation
+
+    def source(self, name: str = "netlist") -> str:
+        # def name(x, M) -> (output groups of planes, ok): x holds one plane
+        # per input bit (arguments in order, MSB first).
+        def ref(r) -> str:
+            if isinstance(r, int):
+                return f"w{r}"
+            return "M" if r else "0"
+        lines = [f"def {name}(x, M):"]
+        lines += [f"    w{i} = x[{i}]" for i in range(self.n_inputs)]
+        for k, (op, ins) in enumerate(self.nodes):
+            lines.append(f"    w{self.n_inputs + k} = " + _EXPR[op].format(*(f"w{i}" for i in ins)))
+        lines.append("    ok = M")
+        lines += [f"    ok &= w{i}" if v else f"    ok &= ~w{i}" for i, v in self.guards.items()]
+        groups = ", ".join("[" + ", ".join(ref(r) for r in grp) + "]" for grp in self.outputs)
+        lines.append(f"    return [{groups}], ok")
+        return "\n".join(lines) + "\n"
+
+    def compile(self) -> Callable[[Sequence[int], int], Tuple[List[List[int]], int]]:
+        scope: Dict = {}
+        exec(compile(self.source(), "<netlist>", "exec"), scope)
+        return scope["netlist"]
+
+class _Recording:
+    # Swap the primitive gates (and mux2) for recording versions, in
+    # gates.py and in every module passed in that imported them by name.
+    NAMES = {"not_gate": "not", "and_gate": "and", "or_gate": "or", "xor_gate": "xor",
+             "and3_gate": "and3", "or3_gate": "or3"}
+
+    def __init__(self, net: Netlist, modules=()):
+        self.modules = [gates, *modules]
+        self.swap = {}
+        for name, op in self.NAMES.items():
+            self.swap[getattr(gates, name)] = lambda *args, _op=op: net.gate(_op, *args)
+        def mux2(sel, a, b):
+            if not isinstance(sel, Wire):
+                return b if sel else a
+            return net.gate("or", net.gate("and", sel, b), net.gate("and", net.gate("not", sel), a))
+        self.swap[gates.mux2] = mux2
+        self._saved = []
+
+    def __enter__(self) -> _Recording:
+        for mod in self.modules:
+            for name, obj in list(vars(mod).items()):
+                w = self.swap.get(obj) if callable(obj) else None
+                if w is not None:
+                    self._saved.append((mod, name, obj))
+                    setattr(mod, name, w)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for mod, name, obj in reversed(self._saved):
+            setattr(mod, name, obj)
+        self._saved.clear()
+
+def _is_bit(x) -> bool:
+    return isinstance(x, (Wire, Bit, bool))
+
+def _groups(out) -> List[List]:
+    # fn's result as output groups: a bit, or a sequence of bits, is one
+    # group (MSB first); a sequence of anything else is split into groups.
+    if _is_bit(out):
+        return [[out]]
+    seq = list(out)
+    if all(_is_bit(x) for x in seq):
+        return [seq]
+    return [grp for x in seq for grp in _groups(x)]
+
+def record(fn: Callable, widths: Sequence[int], example: Optional[Sequence[int]] = None,
+           modules=()) -> Netlist:
+    # Netlist of fn on len(widths) bit-vector arguments, following the path
+    # the example input values take (all zeros by default).
+    net = Netlist(widths)
+    example = list(example) if example is not None else [0] * len(widths)
+    args = [tuple(net._wire(bool((v >> i) & 1)) for i in range(w - 1, -1, -1))
+            for w, v in zip(widths, example)]
+    with _Recording(net, modules):
+        try:
+            out = fn(*args)
+        except AttributeError as e:
+            raise ValueError(f"cannot record {getattr(fn, '__name__', fn)}: "
+                             f"it reads packed bit-vector state ({e})") from e
+    net.outputs = [[x.id if isinstance(x, Wire) else Bit(x) for x in grp] for grp in _groups(out)]
+    return net
+
+# bit planes
+
+def to_planes(vectors: Sequence[Sequence[int]], widths: Sequence[int]) -> List[int]:
+    # Lane-major input values (one tuple of ints per lane) -> one plane per
+    # input bit, MSB first per argument.
+    planes: List[int] = []
+    for k, w in enumerate(widths):
+        if not vectors:
+            planes += [0] * w
+            continue
+        mask = (1 << w) - 1
+        rows = [format(v[k] & mask, f"0{w}b") for v in vectors] if w else []
+        planes += [int("".join(col)[::-1], 2) for col in zip(*rows)]
+    return planes
+
+def from_planes(groups: List[List[int]], lanes: int) -> List[Tuple[int, ...]]:
+    # Output planes per group -> one tuple of ints per lane.
+    per_group = []
+    for planes in groups:
+        if not planes or not lanes:
+            per_group.append([0] * lanes)
+            continue
+        cols = [format(p, f"0{lanes}b")[::-1] for p in planes]
+        per_group.append([int("".join(bits), 2) for bits in zip(*cols)])
+    return list(zip(*per_group)) if per_group else [()] * lanes
+
+class Circuit:
+    # A gates-based function evaluated bitsliced, with a compiled netlist
+    # per control path (see the top of the file).
+    def __init__(self, fn: Callable, widths: Sequence[int], modules=(),
+                 max_paths: int = DEFAULT_MAX_PATHS):
+        self.fn = fn
+        self.widths = list(widths)
+        self.modules = modules
+        self.max_paths = max_paths
+        self.paths: List[Tuple[Netlist, Callable]] = []
+        self.lane_calls = 0         # lanes evaluated by calling fn directly
+
+    def evaluate(self, vectors: Sequence[Sequence[int]]) -> List[Tuple[int, ...]]:
+        # One tuple of input ints per lane -> one tuple of output ints per lane.
+        planes = to_planes(vectors, self.widths)
+        return from_planes(self.run(planes, len(vectors)), len(vectors))
+
+    def run(self, planes: Sequence[int], lanes: int) -> List[List[int]]:
+        # Bitsliced in and out: one plane per input bit -> planes per output group.
+        pending = (1 << lanes) - 1
+        out: Optional[List[List[int]]] = None
+        for net, run in self.paths:
+            if not pending:
+                break
+            out = self._merge(out, net, run, planes, pending)
+            pending &= ~self._ok
+        while pending and len(self.paths) < self.max_paths:
+            lane = (pending & -pending).bit_length() - 1
+            net = record(self.fn, self.widths, self._lane_inputs(planes, lane), self.modules)
+            run = net.compile()
+            self.paths.append((net, run))
+            out = self._merge(out, net, run, planes, pending)
+            pending &= ~self._ok
+        while pending:
+            lane = (pending & -pending).bit_length() - 1
+            pending &= pending - 1
+            out = self._call(out, planes, lane)
+        return out if out is not None else []
+
+    def _merge(self, out, net: Netlist, run, planes, mask: int):
+        groups, ok = run(planes, mask)
+        ok &= mask
+        if out is None:
+            out = [[0] * len(g) for g in groups]
+        elif [len(g) for g in groups] != [len(g) for g in out]:
+            raise ValueError("output shape differs between control paths")
+        for o, g in zip(out, groups):
+            for j, p in enumerate(g):
+                o[j] |= p & ok
+        self._ok = ok
+        return out
+
+    def _lane_inputs(self, planes, lane: int) -> List[int]:
+        vals, i = [], 0
+        for w in self.widths:
+            v = 0
+            for p in planes[i:i + w]:
+                v = (v << 1) | ((p >> lane) & 1)
+            vals.append(v)
+            i += w
+        return vals
+
+    def _call(self, out, planes, lane: int):
+        self.lane_calls += 1
+        args = [BitVector(w, v) for w, v in zip(self.widths, self._lane_inputs(planes, lane))]
+        groups = _groups(self.fn(*args))
+        if out is None:
+            out = [[0] * len(g) for g in groups]
+        for o, g in zip(out, groups):
+            for j, b in enumerate(g):
+                if b:
+                    o[j] |= 1 << lane
+        return out
+
+    def report(self) -> Dict:
+        return {
+            "paths": len(self.paths),
+            "lane_calls": self.lane_calls,
+            "gates": [net.report()["gates"] for net, _run in self.paths],
+        }
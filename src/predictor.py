@@ -0,0 +1,253 @@
+from __future__ import annotations
+import json
+from array import array
+from typing import Dict, Optional
+from decoder import OPS, X0_SINK
+
+# Branch prediction for the pipeline timing model (timing.PipelineTiming).
+# The timed loop hands every conditional branch, jal and jalr to resolve(),
+# which predicts it as the front end would have at fetch, trains on the real
+# outcome and returns how the front end fared:
+#   HIT       predicted direction and target: no bubble
+#   REDIRECT  right direction, but the target was only known in decode
+#             (a taken branch or jal that missed the BTB): the ID redirect
+#   MISS      wrong direction, or a jalr target that was not predicted:
+#             resolved in EX and the wrong-path fetches are flushed
+#
+# Direction predictors: StaticPredictor (not-taken / taken / btfn),
+# BimodalPredictor (2-bit counters by pc) and GsharePredictor (2-bit counters
+# by pc xor global history). Any of them can add a direct-mapped BTB and a
+# return-address stack. Tables are arrays, so a lookup is an index and a
+# couple of integer ops.
+
+HIT, REDIRECT, MISS = 0, 1, 2
+LINK_REGS = (1, 5)    # ra, t0: jal/jalr writing these are calls
+BRANCH_FNS = frozenset(fn for _name, fn, fmt in OPS.values() if fmt == "B")
+
+class BranchPredictor:
+    kind = "base"
+
+    def __init__(self, btb_entries: int = 0, ras_depth: int = 0):
+        if btb_entries & (btb_entries - 1) or btb_entries < 0:
+            raise ValueError("BTB entries must be 0 or a power of two")
+        if ras_depth < 0:
+            raise ValueError("RAS depth cannot be negative")
+        self.btb_entries = btb_entries
+        self.btb_mask = btb_entries - 1
+        self.btb_tag = array("I", bytes(4 * btb_entries))      # pc + 1 (0 = empty)
+        self.btb_target = array("I", bytes(4 * btb_entries))
+        self.ras_depth = ras_depth
+        self.ras = array("I", bytes(4 * ras_depth))            # circular
+        self.ras_top = 0
+        self.ras_count = 0
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.instructions = 0    # filled in by the runner, for MPKI
+        self.branches = 0
+        self.branch_misses = 0
+        self.jumps = 0
+        self.jump_misses = 0
+        self.redirects = 0
+
+    # direction (subclasses)
+
+    def predict(self, pc: int, imm: int) -> bool:
+        return False
+
+    def train(self, pc: int, taken: bool) -> None:
+        pass
+
+    # target structures
+
+    def _btb_lookup(self, pc: int) -> Optional[int]:
+        if not self.btb_entries:
+            return None
+        i = (pc >> 2) & self.btb_mask
+        return self.btb_target[i] if self.btb_tag[i] == pc + 1 else None
+
+    def _btb_update(self, pc: int, target: int) -> None:
+        if self.btb_entries:
+            i = (pc >> 2) & self.btb_mask
+            self.btb_tag[i] = pc + 1
+            self.btb_target[i] = target
+
+    def _push(self, ret: int) -> None:
+        if self.ras_depth:
+            self.ras[self.ras_top] = ret
+            self.ras_top = (self.ras_top + 1) % self.ras_depth
+            if self.ras_count < self.ras_depth:
+                self.ras_count += 1    # else the oldest entry was overwritten
+
+    def _pop(self) -> Optional[int]:
+        if not self.ras_count:
+            return None
+        self.ras_top = (self.ras_top - 1) % self.ras_depth
+        self.ras_count -= 1
+        return self.ras[self.ras_top]
+
+    def resolve(self, pc: int, d, next_pc: int) -> int:
+        if d.fn in BRANCH_FNS:
+            self.branches += 1
+            taken = next_pc != pc + 4
+            guess = self.predict(pc, d.imm)
+            self.train(pc, taken)
+            if not taken:
+                if guess:
+                    self.branch_misses += 1
+                    return MISS
+                return HIT
+            hit = self._btb_lookup(pc) == next_pc
+            self._btb_update(pc, next_pc)
+            if not guess:
+                self.branch_misses += 1
+                return MISS
+            if hit:
+                return HIT
+            self.redirects += 1
+            return REDIRECT
+        self.jumps += 1
+        if d.name == "jal":
+            hit = self._btb_lookup(pc) == next_pc
+            self._btb_update(pc, next_pc)
+            if d.rd in LINK_REGS:
+                self._push(pc + 4)
+            if hit:
+                return HIT
+            self.redirects += 1
+            return REDIRECT
+        # jalr: returns come off the RAS, other indirect jumps from the BTB
+        if d.rd == X0_SINK and d.rs1 in LINK_REGS and self.ras_depth:
+            guess = self._pop()
+        else:
+            guess = self._btb_lookup(pc)
+        self._btb_update(pc, next_pc)
+        if d.rd in LINK_REGS:
+            self._push(pc + 4)
+        if guess == next_pc:
+            return HIT
+        self.jump_misses += 1
+        return MISS
+
+    # results
+
+    @property
+    def mispredicts(self) -> int:
+        return self.branch_misses + self.jump_misses
+
+    @property
+    def accuracy(self) -> float:
+        n = self.branches + self.jumps
+        return 1.0 - self.mispredicts / n if n else 1.0
+
+    @property
+    def mpki(self) -> float:
+        return 1000.0 * self.mispredicts / self.instructions if self.instructions else 0.0
+
+    def describe(self) -> str:
+        extra = []
+        if self.btb_entries:
+            extra.append(f"btb={self.btb_entries}")
+        if self.ras_depth:
+            extra.append(f"ras={self.ras_depth}")
+        return self.kind + (f" ({', '.join(extra)})" if extra else "")
+
+    def report(self) -> Dict:
+        return {
+            "predictor": self.describe(),
+            "instructions": self.instructions,
+            "branches": self.branches,
+            "branch_misses": self.branch_misses,
+            "direction_accuracy": round(1.0 - self.branch_misses / self.branches, 4) if self.branches else 1.0,
+            "jumps": self.jumps,
+            "jump_misses": self.jump_misses,
+            "redirects": self.redirects,
+            "accuracy": round(self.accuracy, 4),
+            "mpki": round(self.mpki, 3),
+        }
+
+    def report_json(self) -> str:
+        return json.dumps(self.report(), indent=2)
+
+    def report_text(self) -> str:
+        r = self.report()
+        return (f"predictor {r['predictor']}: accuracy {100 * r['accuracy']:.2f}%, "
+                f"MPKI {r['mpki']:.3f}\n"
+                f"  branches {r['branches']} ({r['branch_misses']} mispredicted), "
+                f"jumps {r['jumps']} ({r['jump_misses']} mispredicted), "
+                f"decode redirects {r['redirects']}\n")
+
+class StaticPredictor(BranchPredictor):
+    # not-taken, taken, or btfn (backward taken, forward not taken)
+    POLICIES = ("not-taken", "taken", "btfn")
+
+    def __init__(self, policy: str = "not-taken", btb_entries: int = 0, ras_depth: int = 0):
+        if policy not in self.POLICIES:
+            raise ValueError(f"unknown static policy {policy}")
+        super().__init__(btb_entries, ras_depth)
+        self.policy = policy
+        self.kind = f"static {policy}"
+
+    def predict(self, pc: int, imm: int) -> bool:
+        if self.policy == "btfn":
+            return imm < 0
+        return self.policy == "taken"
+
+class BimodalPredictor(BranchPredictor):
+    # 2**index_bits two-bit saturating counters indexed by pc; >= 2 predicts
+    # taken. Counters start weakly not-taken.
+    kind = "bimodal"
+
+    def __init__(self, index_bits: int = 10, btb_entries: int = 0, ras_depth: int = 0):
+        super().__init__(btb_entries, ras_depth)
+        self.mask = (1 << index_bits) - 1
+        self.table = array("B", b"\x01" * (1 << index_bits))
+
+    def predict(self, pc: int, imm: int) -> bool:
+        return self.table[(pc >> 2) & self.mask] >= 2
+
+    def train(self, pc: int, taken: bool) -> None:
+        i = (pc >> 2) & self.mask
+        c = self.table[i]
+        if taken:
+            if c < 3:
+                self.table[i] = c + 1
+        elif c:
+            self.table[i] = c - 1
+
+class GsharePredictor(BimodalPredictor):
+    # Bimodal counters indexed by pc xor the last history_bits branch outcomes.
+    kind = "gshare"
+
+    def __init__(self, index_bits: int = 12, history_bits: Optional[int] = None,
+                 btb_entries: int = 0, ras_depth: int = 0):
+        super().__init__(index_bits, btb_entries, ras_depth)
+        self.hmask = (1 << (index_bits if history_bits is None else history_bits)) - 1
+        self.history = 0
+
+    def predict(self, pc: int, imm: int) -> bool:
+        return self.table[((pc >> 2) ^ self.history) & self.mask] >= 2
+
+    def train(self, pc: int, taken: bool) -> None:
+        i = ((pc >> 2) ^ self.history) & self.mask
+        c = self.table[i]
+        if taken:
+            if c < 3:
+                self.table[i] = c + 1
+        elif c:
+            self.table[i] = c - 1
+        self.history = ((self.history << 1) | taken) & self.hmask
+
+PREDICTORS = ("static", "btfn", "taken", "bimodal", "gshare")
+
+def make_predictor(kind: str, btb_entries: int = 0, ras_depth: int = 0) -> BranchPredictor:
+    # Predictor by name, as the CLI spells it.
+    if kind == "static":
+        return StaticPredictor("not-taken", btb_entries, ras_depth)
+    if kind in ("btfn", "taken"):
+        return StaticPredictor(kind, btb_entries, ras_depth)
+    if kind == "bimodal":
+        return BimodalPredictor(btb_entries=btb_entries, ras_depth=ras_depth)
+    if kind == "gshare":
+        return GsharePredictor(btb_entries=btb_entries, ras_depth=ras_depth)
+    raise ValueError(f"unknown predictor {kind}")
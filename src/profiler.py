@@ -0,0 +1,110 @@
+from __future__ import annotations
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+from decoder import TRACE_KIND, TK_JUMP
+
+# Guest-program profiler for the host-side runner (run_hex(..., profile=...)).
+# The profiled loop (runner._run_profiled) only does bookkeeping when a block
+# ends, i.e. at each branch/jump: it counts the block by its entry pc, records
+# how many instructions it ran and the host time it took, and charges those
+# instructions to the current call stack. Per-PC and per-opcode counts are
+# derived from the block counts afterwards.
+#
+# Calls are jal/jalr that link into ra or t0; returns are jalr x0, 0(ra|t0).
+# Stack frames are named by symbol (ELF runs) or by entry pc.
+
+JUMP_FNS = frozenset(fn for fn, kind in TRACE_KIND.items() if kind == TK_JUMP)
+LINK_REGS = (1, 5)
+
+class Profile:
+    def __init__(self, symbolize: Optional[Callable[[int], Optional[str]]] = None):
+        self.symbolize = symbolize
+        self.code = None                         # CodeCache of the profiled run
+        self.block_count: Dict[int, int] = {}    # entry pc -> times run to its end
+        self.block_len: Dict[int, int] = {}      # entry pc -> instructions in the block
+        self.block_ns: Dict[int, int] = {}       # entry pc -> host time (ns)
+        self.partial: Dict[int, int] = {}        # pc -> count, for blocks cut short
+        self.stacks: Dict[Tuple[int, ...], int] = {}  # call stack -> instructions
+        self.stack: List[int] = []               # current call stack (entry pcs)
+        self.steps = 0
+
+    # derived counts
+
+    def pc_counts(self) -> Dict[int, int]:
+        out: Dict[int, int] = dict(self.partial)
+        for entry, n in self.block_count.items():
+            for k in range(self.block_len[entry]):
+                pc = entry + 4 * k
+                out[pc] = out.get(pc, 0) + n
+        return out
+
+    def op_counts(self) -> Dict[str, int]:
+        out: Dict[str, int] = {}
+        for pc, n in self.pc_counts().items():
+            d = self.code[pc]
+            name = d.name if d is not None else "?"
+            out[name] = out.get(name, 0) + n
+        return dict(sorted(out.items(), key=lambda kv: -kv[1]))
+
+    def symbol(self, pc: int) -> Optional[str]:
+        return self.symbolize(pc) if self.symbolize is not None else None
+
+    def name_of(self, pc: int) -> str:
+        return self.symbol(pc) or f"0x{pc:08X}"
+
+    def hot_blocks(self, top: int = 20) -> List[Dict]:
+        rows = []
+        total = self.steps or 1
+        for entry, n in self.block_count.items():
+            steps = n * self.block_len[entry]
+            rows.append({
+                "entry": entry,
+                "name": self.name_of(entry),
+                "count": n,
+                "length": self.block_len[entry],
+                "steps": steps,
+                "share": steps / total,
+                "ns": self.block_ns.get(entry, 0),
+            })
+        rows.sort(key=lambda r: (-r["steps"], r["entry"]))
+        return rows[:top]
+
+    # reports
+
+    def report(self, top: int = 20) -> Dict:
+        pcs = sorted(self.pc_counts().items(), key=lambda kv: (-kv[1], kv[0]))[:top]
+        return {
+            "steps": self.steps,
+            "blocks": self.hot_blocks(top),
+            "pcs": [{"pc": pc, "count": n, "op": self.code[pc].name if self.code[pc] else "?"}
+                    for pc, n in pcs],
+            "ops": self.op_counts(),
+        }
+
+    def report_json(self, top: int = 20) -> str:
+        return json.dumps(self.report(top), indent=2)
+
+    def report_text(self, top: int = 20) -> str:
+        r = self.report(top)
+        lines = [f"{r['steps']} instructions", "",
+                 "hot blocks:",
+                 f"  {'steps':>10} {'%':>6} {'count':>9} {'len':>4} {'time ms':>9}  entry"]
+        for b in r["blocks"]:
+            lines.append(f"  {b['steps']:>10} {100 * b['share']:>6.2f} {b['count']:>9} "
+                         f"{b['length']:>4} {b['ns'] / 1e6:>9.3f}  0x{b['entry']:08X}"
+                         + (f" {b['name']}" if self.symbol(b["entry"]) else ""))
+        lines += ["", "hot pcs:"]
+        for p in r["pcs"]:
+            lines.append(f"  {p['count']:>10}  0x{p['pc']:08X}  {p['op']}")
+        lines += ["", "opcodes:"]
+        for op, n in r["ops"].items():
+            lines.append(f"  {n:>10}  {op}")
+        return "\n".join(lines) + "\n"
+
+    def collapsed(self) -> str:
+        # One "frame;frame;frame count" line per distinct call stack, the input
+        # format of flamegraph.pl / speedscope / inferno.
+        lines = []
+        for stack, n in sorted(self.stacks.items()):
+            lines.append(";".join(self.name_of(pc) for pc in stack) + f" {n}")
+        return "\n".join(lines) + ("\n" if lines else "")
@@ -0,0 +1,540 @@
+from __future__ import annotations
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Optional, Tuple
+
+# Simulator main memory for the host-side runner.
+# FlatMemory is one contiguous little-endian byte array. Aligned halfword/word
+# accesses go through memoryview casts of the same buffer, so a load or store is
+# a single index operation; unaligned ones fall back to struct.
+# PagedMemory covers the full 32-bit space with 4 KiB pages allocated on first
+# write, optionally backed by an mmap'd file instead of the Python heap.
+
+M32 = 0xFFFFFFFF
+DEFAULT_SIZE = 1 << 24   # 16 MiB
+
+_LE = sys.byteorder == "little"
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+
+def _word_bytes(words) -> bytes:
+    # Little-endian image of a word sequence; an array('I') on a little-endian
+    # host is already in that layout.
+    if isinstance(words, array) and words.itemsize == 4:
+        if _LE:
+            return words.tobytes()
+        a = array(words.typecode, words)
+        a.byteswap()
+        return a.tobytes()
+    return struct.pack(f"<{len(words)}I", *[w & M32 for w in words])
+
+class MemoryFault(IndexError):
+    # Access outside the mapped address range.
+    def __init__(self, addr: int, width: int = 4):
+        super().__init__(f"memory fault at 0x{addr & M32:08X} ({width} bytes)")
+        self.addr = addr & M32
+        self.width = width
+
+class _StructView:
+    # Stand-in for memoryview.cast on big-endian hosts: same indexing, but the
+    # buffer stays little-endian.
+    def __init__(self, data: bytearray, st: struct.Struct):
+        self.data = data
+        self.st = st
+        self.n = st.size
+
+    def __getitem__(self, k: int) -> int:
+        try:
+            return self.st.unpack_from(self.data, k * self.n)[0]
+        except struct.error:
+            raise IndexError(k) from None
+
+    def __setitem__(self, k: int, v: int):
+        try:
+            self.st.pack_into(self.data, k * self.n, v)
+        except struct.error:
+            raise IndexError(k) from None
+
+def _cast(view: memoryview, data: bytearray, fmt: str, st: struct.Struct):
+    return view.cast(fmt) if _LE else _StructView(data, st)
+
+class FlatMemory:
+    # Byte-addressable RAM covering [base, base + size).
+    # Offsets are computed modulo 2**32, so an address below base wraps to a huge
+    # offset and faults like any other out-of-range access.
+
+    __slots__ = ("base", "size", "data", "view", "_h", "_w")
+
+    def __init__(self, size: int = DEFAULT_SIZE, base: int = 0, buffer=None):
+        # buffer: existing writable memory to use instead of a fresh bytearray
+        # (e.g. a multiprocessing.shared_memory block shared between harts).
+        if size <= 0 or size & 3:
+            raise ValueError("memory size must be a positive multiple of 4")
+        self.base = base & M32
+        self.size = size
+        if buffer is None:
+            self.data = bytearray(size)
+        else:
+            self.data = memoryview(buffer).cast("B")[:size]
+            if self.data.readonly or len(self.data) < size:
+                raise ValueError("buffer must be writable and at least size bytes")
+        self.view = memoryview(self.data)
+        self._h = _cast(self.view, self.data, "H", _U16)
+        self._w = _cast(self.view, self.data, "I", _U32)
+
+    # loads
+
+    def read_u8(self, addr: int) -> int:
+        try:
+            return self.data[(addr - self.base) & M32]
+        except IndexError:
+            raise MemoryFault(addr, 1) from None
+
+    def read_u16(self, addr: int) -> int:
+        i = (addr - self.base) & M32
+        try:
+            if not i & 1:
+                return self._h[i >> 1]
+            return self.data[i] | (self.data[i + 1] << 8)
+        except IndexError:
+            raise MemoryFault(addr, 2) from None
+
+    def read_u32(self, addr: int) -> int:
+        i = (addr - self.base) & M32
+        try:
+            if not i & 3:
+                return self._w[i >> 2]
+            if i + 4 > self.size:
+                raise IndexError(i)
+            return _U32.unpack_from(self.data, i)[0]
+        except IndexError:
+            raise MemoryFault(addr, 4) from None
+
+    # stores
+
+    def write_u8(self, addr: int, val: int):
+        try:
+            self.data[(addr - self.base) & M32] = val & 0xFF
+        except IndexError:
+            raise MemoryFault(addr, 1) from None
+
+    def write_u16(self, addr: int, val: int):
+        i = (addr - self.base) & M32
+        try:
+            if not i & 1:
+                self._h[i >> 1] = val & 0xFFFF
+            else:
+                if i + 2 > self.size:
+                    raise IndexError(i)
+                _U16.pack_into(self.data, i, val & 0xFFFF)
+        except IndexError:
+            raise MemoryFault(addr, 2) from None
+
+    def write_u32(self, addr: int, val: int):
+        i = (addr - self.base) & M32
+        try:
+            if not i & 3:
+                self._w[i >> 2] = val & M32
+            else:
+                if i + 4 > self.size:
+                    raise IndexError(i)
+                _U32.pack_into(self.data, i, val & M32)
+        except IndexError:
+            raise MemoryFault(addr, 4) from None
+
+    # bulk access
+
+    def load(self, addr: int, blob) -> None:
+        # Copy bytes (or any buffer) into memory starting at addr.
+        i = (addr - self.base) & M32
+        n = len(blob)
+        if i + n > self.size:
+            raise MemoryFault(addr, n)
+        self.view[i:i + n] = blob
+
+    def load_words(self, addr: int, words) -> None:
+        self.load(addr, _word_bytes(words))
+
+    def zero(self, addr: int, n: int) -> None:
+        i = (addr - self.base) & M32
+        if i + n > self.size:
+            raise MemoryFault(addr, n)
+        self.view[i:i + n] = bytes(n)
+
+    def read(self, addr: int, n: int) -> bytes:
+        i = (addr - self.base) & M32
+        if i + n > self.size:
+            raise MemoryFault(addr, n)
+        return bytes(self.view[i:i + n])
+
+    def snapshot(self) -> bytes:
+        # Plain copy of the whole array (PagedMemory does copy-on-write).
+        return bytes(self.data)
+
+    def restore(self, snap: bytes) -> None:
+        self.view[:] = snap
+
+    def iter_pages(self):
+        # (address, buffer) for each PAGE_SIZE chunk, for digest().
+        for off in range(0, self.size, PAGE_SIZE):
+            yield (self.base + off) & M32, self.view[off:off + PAGE_SIZE]
+
+    def close(self) -> None:
+        # Release the views on an external buffer so its owner can close it.
+        for v in (self._w, self._h, self.view, self.data):
+            if isinstance(v, memoryview):
+                v.release()
+
+
+PAGE_BITS = 12
+PAGE_SIZE = 1 << PAGE_BITS
+PAGE_MASK = PAGE_SIZE - 1
+
+# A page is (bytes, halfword view, word view) over the same 4 KiB buffer.
+Page = Tuple[object, object, object]
+
+def _make_page(buf) -> Page:
+    view = buf if isinstance(buf, memoryview) else memoryview(buf)
+    return (buf, _cast(view, buf, "H", _U16), _cast(view, buf, "I", _U32))
+
+class MemSnapshot:
+    # Frozen page table of a PagedMemory: the pages that changed relative to
+    # the parent snapshot (None = page dropped). flat() resolves the chain
+    # once and caches the full table.
+
+    __slots__ = ("parent", "delta", "_flat")
+
+    def __init__(self, parent: Optional[MemSnapshot], delta: Dict[int, Optional[Page]]):
+        self.parent = parent
+        self.delta = delta
+        self._flat: Optional[Dict[int, Page]] = None if parent is not None else delta
+
+    def flat(self) -> Dict[int, Page]:
+        if self._flat is None:
+            chain = []
+            node = self
+            while node._flat is None:
+                chain.append(node)
+                node = node.parent
+            table = dict(node._flat)
+            for node in reversed(chain):
+                for pn, pg in node.delta.items():
+                    if pg is None:
+                        table.pop(pn, None)
+                    else:
+                        table[pn] = pg
+            self._flat = table
+            self.parent = None   # self-contained now; ancestors can be freed
+        return self._flat
+
+class PagedMemory:
+    # Sparse byte-addressable RAM over the 32-bit address space.
+    # Pages are created on first store; loads from a page that was never
+    # written read as zero without allocating it. The most recently used page is
+    # cached so runs of accesses to the same page skip the page-table lookup.
+    #
+    # backing: optional path of a file to mmap as the whole address space
+    # (created/extended sparsely to `size` bytes). Its existing contents are
+    # visible as initial memory, and resident pages live in the OS page cache
+    # rather than the Python heap. Addresses at or above `size` fault.
+
+    __slots__ = ("pages", "size", "_lpn", "_lb", "_lh", "_lw", "_wpn", "_wb", "_wh", "_ww",
+                 "_mm", "_mv", "backing", "_base", "_owned")
+
+    def __init__(self, backing: Optional[str] = None, size: int = 1 << 32):
+        if size <= 0 or size & PAGE_MASK:
+            raise ValueError("memory size must be a positive multiple of the page size")
+        self.pages: Dict[int, Page] = {}
+        self.size = size
+        self._lpn = self._wpn = -1
+        self._lb = self._lh = self._lw = None
+        self._wb = self._wh = self._ww = None
+        self._base: Optional[MemSnapshot] = None   # snapshot the pages derive from
+        self._owned: Optional[set] = None          # pages written since _base
+        self.backing = backing
+        self._mm = None
+        self._mv = None
+        if backing is not None:
+            fd = os.open(backing, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                self._mm = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+            self._mv = memoryview(self._mm)
+
+    # page table
+
+    def _alloc(self, pn: int) -> Page:
+        if self._mv is not None:
+            pg = _make_page(self._mv[pn << PAGE_BITS:(pn + 1) << PAGE_BITS])
+        else:
+            pg = _make_page(bytearray(PAGE_SIZE))
+        self.pages[pn] = pg
+        return pg
+
+    def _select(self, pn: int) -> bool:
+        # Make pn the cached page for loads. Returns False for an unmapped page.
+        pg = self.pages.get(pn)
+        if pg is None:
+            if pn << PAGE_BITS >= self.size:
+                raise MemoryFault(pn << PAGE_BITS, PAGE_SIZE)
+            if self._mv is None:
+                return False
+            pg = self._alloc(pn)
+        self._lpn = pn
+        self._lb, self._lh, self._lw = pg
+        return True
+
+    def _select_w(self, pn: int):
+        # Make pn the cached page for stores (and loads). While a snapshot is
+        # outstanding, the first store to a page it shares copies the page.
+        pg = self.pages.get(pn)
+        owned = self._owned
+        if pg is None:
+            if pn << PAGE_BITS >= self.size:
+                raise MemoryFault(pn << PAGE_BITS, PAGE_SIZE)
+            pg = self._alloc(pn)
+        elif owned is not None and pn not in owned:
+            pg = _make_page(bytearray(pg[0]))
+            self.pages[pn] = pg
+        if owned is not None:
+            owned.add(pn)
+        self._lpn = self._wpn = pn
+        self._lb, self._lh, self._lw = pg
+        self._wb, self._wh, self._ww = pg
+
+    @property
+    def resident_pages(self) -> int:
+        return len(self.pages)
+
+    # loads
+
+    def read_u8(self, addr: int) -> int:
+        pn = addr >> PAGE_BITS
+        if pn != self._lpn and not self._select(pn):
+            return 0
+        return self._lb[addr & PAGE_MASK]
+
+    def read_u16(self, addr: int) -> int:
+        off = addr & PAGE_MASK
+        if off & 1:
+            return self.read_u8(addr) | (self.read_u8((addr + 1) & M32) << 8)
+        pn = addr >> PAGE_BITS
+        if pn != self._lpn and not self._select(pn):
+            return 0
+        return self._lh[off >> 1]
+
+    def read_u32(self, addr: int) -> int:
+        off = addr & PAGE_MASK
+        if off & 3:
+            return self.read_u16(addr) | (self.read_u16((addr + 2) & M32) << 16)
+        pn = addr >> PAGE_BITS
+        if pn != self._lpn and not self._select(pn):
+            return 0
+        return self._lw[off >> 2]
+
+    # stores
+
+    def write_u8(self, addr: int, val: int):
+        pn = addr >> PAGE_BITS
+        if pn != self._wpn:
+            self._select_w(pn)
+        self._wb[addr & PAGE_MASK] = val & 0xFF
+
+    def write_u16(self, addr: int, val: int):
+        off = addr & PAGE_MASK
+        if off & 1:
+            self.write_u8(addr, val)
+            self.write_u8((addr + 1) & M32, val >> 8)
+            return
+        pn = addr >> PAGE_BITS
+        if pn != self._wpn:
+            self._select_w(pn)
+        self._wh[off >> 1] = val & 0xFFFF
+
+    def write_u32(self, addr: int, val: int):
+        off = addr & PAGE_MASK
+        if off & 3:
+            self.write_u16(addr, val)
+            self.write_u16((addr + 2) & M32, val >> 16)
+            return
+        pn = addr >> PAGE_BITS
+        if pn != self._wpn:
+            self._select_w(pn)
+        self._ww[off >> 2] = val & M32
+
+    # bulk access (page-sized chunks)
+
+    def load(self, addr: int, blob) -> None:
+        src = memoryview(blob).cast("B")
+        n = len(src)
+        if addr + n > self.size:
+            raise MemoryFault(addr, n)
+        pos = 0
+        while pos < n:
+            a = addr + pos
+            off = a & PAGE_MASK
+            k = min(PAGE_SIZE - off, n - pos)
+            self._select_w(a >> PAGE_BITS)
+            self._wb[off:off + k] = src[pos:pos + k]
+            pos += k
+
+    def load_words(self, addr: int, words) -> None:
+        self.load(addr, _word_bytes(words))
+
+    def map(self, addr: int, buf) -> None:
+        # Install whole pages that alias an existing writable buffer (e.g. a
+        # copy-on-write mmap of an ELF file) instead of copying it.
+        src = memoryview(buf).cast("B")
+        n = len(src)
+        if addr & PAGE_MASK or n & PAGE_MASK:
+            raise ValueError("map() needs a page-aligned address and length")
+        if src.readonly:
+            raise ValueError("map() needs a writable buffer")
+        if addr + n > self.size:
+            raise MemoryFault(addr, n)
+        for k in range(0, n, PAGE_SIZE):
+            pn = (addr + k) >> PAGE_BITS
+            self.pages[pn] = _make_page(src[k:k + PAGE_SIZE])
+            if self._owned is not None:
+                self._owned.add(pn)
+        self._drop_caches()
+
+    def zero(self, addr: int, n: int) -> None:
+        # Clear [addr, addr + n). Whole unbacked pages are simply dropped.
+        if addr + n > self.size:
+            raise MemoryFault(addr, n)
+        end = addr + n
+        while addr < end:
+            off = addr & PAGE_MASK
+            k = min(PAGE_SIZE - off, end - addr)
+            pn = addr >> PAGE_BITS
+            if k == PAGE_SIZE and self._mv is None:
+                if self.pages.pop(pn, None) is not None:
+                    if self._owned is not None:
+                        self._owned.add(pn)
+                    self._drop_caches()
+            elif pn in self.pages or self._mv is not None:
+                self._select_w(pn)
+                self._wb[off:off + k] = bytes(k)
+            addr += k
+
+    def read(self, addr: int, n: int) -> bytes:
+        if addr + n > self.size:
+            raise MemoryFault(addr, n)
+        out = bytearray()
+        pos = 0
+        while pos < n:
+            a = addr + pos
+            off = a & PAGE_MASK
+            k = min(PAGE_SIZE - off, n - pos)
+            if self._select(a >> PAGE_BITS):
+                out += self._lb[off:off + k]
+            else:
+                out += bytes(k)
+            pos += k
+        return bytes(out)
+
+    def iter_pages(self):
+        # (address, buffer) for each resident page in address order.
+        for pn in sorted(self.pages):
+            yield pn << PAGE_BITS, self.pages[pn][0]
+
+    # copy-on-write snapshots
+
+    def _drop_caches(self) -> None:
+        self._lpn = self._wpn = -1
+        self._lb = self._lh = self._lw = None
+        self._wb = self._wh = self._ww = None
+
+    @property
+    def dirty_pages(self) -> int:
+        # Pages written since the last snapshot()/restore() (all resident
+        # pages if there was none).
+        return len(self.pages if self._owned is None else self._owned)
+
+    def snapshot(self) -> MemSnapshot:
+        # Freeze the current contents. No page is copied here: pages become
+        # shared with the snapshot and are copied on their next store. The
+        # first snapshot records the whole page table, later ones only the
+        # pages written since the previous snapshot.
+        if self._mv is not None:
+            raise ValueError("snapshots need heap pages, not an mmap backing")
+        if self._base is None:
+            snap = MemSnapshot(None, dict(self.pages))
+        else:
+            get = self.pages.get
+            snap = MemSnapshot(self._base, {pn: get(pn) for pn in self._owned})
+        self._base = snap
+        self._owned = set()
+        self._wpn = -1   # next store to each page goes through the COW check
+        return snap
+
+    def restore(self, snap: MemSnapshot) -> None:
+        # Return to a snapshot taken from this memory. Going back to the most
+        # recent one only touches the pages written since; any other snapshot
+        # swaps in its page table.
+        if self._mv is not None:
+            raise ValueError("snapshots need heap pages, not an mmap backing")
+        flat = snap.flat()
+        if snap is self._base:
+            for pn in self._owned:
+                pg = flat.get(pn)
+                if pg is None:
+                    self.pages.pop(pn, None)
+                else:
+                    self.pages[pn] = pg
+        else:
+            self.pages = dict(flat)
+        self._base = snap
+        self._owned = set()
+        self._drop_caches()
+
+    # mmap lifetime
+
+    def flush(self) -> None:
+        if self._mm is not None:
+            self._mm.flush()
+
+    def close(self) -> None:
+        # Views into the mmap must be released before it can be closed.
+        if self._mm is None:
+            return
+        self._drop_caches()
+        for buf, h, w in self.pages.values():
+            for v in (w, h, buf):
+                if isinstance(v, memoryview):
+                    v.release()
+        self.pages.clear()
+        self._mv.release()
+        self._mm.close()
+        self._mm = self._mv = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_ZERO_PAGE = bytes(PAGE_SIZE)
+
+def nonzero_pages(mem):
+    # (address, buffer) for the pages of any backend that hold data.
+    for addr, buf in mem.iter_pages():
+        if buf != _ZERO_PAGE[:len(buf)]:
+            yield addr, buf
+
+def digest(mem) -> str:
+    # Content hash of a memory backend: only non-zero pages count, so the same
+    # contents give the same digest in FlatMemory and PagedMemory alike.
+    h = hashlib.blake2b(digest_size=16)
+    for addr, buf in nonzero_pages(mem):
+        h.update(addr.to_bytes(4, "little"))
+        h.update(buf)
+    return h.hexdigest()
@@ -1,139 +1,627 @@
 from __future__ import annotations
-from typing import Tuple
-from memory import Bit
-from loader import load_hex_file
+from time import perf_counter_ns
+from typing import Optional, Tuple
+from loader import load_hex_words
+from decoder import (CodeCache, predecode, is_self_jump, NREGS, FREG, M32, X0_SINK,
+                     TRACE_KIND, TK_LOAD, TK_STORE, TK_JUMP)
+from translate import BlockCache
+from ram import PagedMemory, MemoryFault
+from elf import load_elf
+from tracebuf import TraceBuffer
+from profiler import Profile, JUMP_FNS, LINK_REGS
+from timing import PipelineTiming, UNIT_DIV
+from cache import L1
+from lockstep import Lockstep
+from gatesim import GateBackend
 
-# Simple host-side interpreter for a small RV32I subset:
-# addi, add, sub, lui, lw, sw, beq, jal
-
-def _bits_to_u32(bits: Tuple[Bit, ...]) -> int:
-    v = 0
-    for b in bits:
-        v = (v << 1) | (1 if b else 0)
-    return v & 0xFFFFFFFF
-
-def _sign_extend(val: int, bits: int) -> int:
-    m = 1 << (bits - 1)
-    val = val & ((1 << bits) - 1)
-    return (val ^ m) - m
+# Simple host-side interpreter for RV32IM + a small RV32F subset (see
+# decoder.OPS for the table).
+#
+# Each code word is decoded once into a record (decoder.CodeCache, keyed by
+# pc); the loop below only fetches the record for pc and calls its handler.
+# Hex images are predecoded up front, ELF code is decoded on first fetch.
+# mode="block" instead runs whole basic blocks compiled to Python functions by
+# translate.py. trace=True records every instruction into a tracebuf ring;
+# timing=PipelineTiming() also counts cycles (timing.py), caches=L1(...) runs
+# fetches and loads/stores through cache models (cache.py), and
+# lockstep=Lockstep(...) re-checks sampled results against the bit-accurate
+# units (lockstep.py). mode="gate" executes every ALU/shift/MDU/FPU operation
+# on those units instead of the host (gatesim.py). Every loop stops at
+# `jal x0, 0` and at loops that spin without changing any state (IdleLoops).
 
 def _u32(x: int) -> int:
     return x & 0xFFFFFFFF
 
-def _read_u32(mem: dict, addr: int) -> int:
-    # word-aligned simple memory (word-addressed for the sample)
-    return mem.get(addr, 0)
+def load_hex_program(path: str, mem):
+    # Hex image at address 0 -> (code, regs, pc)
+    prog = load_hex_words(path)  # each line is a 32-bit word (one instruction)
+    mem.load_words(0, prog)      # the image is also readable as data
+    code = CodeCache(mem, [(0, 4 * len(prog))])
+    code.update(zip(range(0, 4 * len(prog), 4), predecode(prog)))
+    regs = [0] * NREGS  # x0..x31 (+ write sink for x0)
+    return code, regs, 0
+
+STACK_TOP = 0x7FFFFFF0   # initial sp for ELF programs
+
+def load_elf_program(path: str, mem):
+    # ELF32 RISC-V executable -> (code, regs, pc, image). Code is fetched from
+    # the executable segments; sp starts at STACK_TOP and gp at
+    # __global_pointer$ when the symbol table has it.
+    img = load_elf(path, mem)
+    regs = [0] * NREGS
+    regs[2] = STACK_TOP
+    gp = img.symbols.get("__global_pointer$")
+    if gp is not None:
+        regs[3] = gp.value
+    return CodeCache(mem, img.exec_ranges()), regs, img.entry, img
 
-def _write_u32(mem: dict, addr: int, val: int):
-    mem[addr] = _u32(val)
+def run_hex(path: str, max_steps: int = 1000, trace=False, mode: str = "interp",
+            mem=None, profile=None, timing=None, caches=None,
+            lockstep=None, syscalls=None):
+    if mem is None:
+        mem = PagedMemory()  # sparse 4 GiB RAM (sample data lives at 0x0001_0000)
+    code, regs, pc = load_hex_program(path, mem)
+    return run_program(code, regs, mem, pc, max_steps, trace, mode, profile, timing, caches,
+                       lockstep, syscalls)
 
-def run_hex(path: str, max_steps: int = 1000, trace: bool = False):
-    # Load program: each line is a 32-bit word (one instruction)
-    words = load_hex_file(path)  # -> list[Tuple[Bit,...]]
-    prog = [_bits_to_u32(w) for w in words]
+def run_elf(path: str, max_steps: int = 1000, trace=False, mode: str = "interp",
+            mem=None, profile=None, timing=None, caches=None,
+            lockstep=None, syscalls=None):
+    if mem is None:
+        mem = PagedMemory()
+    code, regs, pc, img = load_elf_program(path, mem)
+    if profile is not None and profile.symbolize is None:
+        profile.symbolize = img.symbol_at
+    if syscalls is not None:
+        syscalls.set_break(max(sg.vaddr + sg.memsz for sg in img.segments))
+    out = run_program(code, regs, mem, pc, max_steps, trace, mode, profile, timing, caches,
+                       lockstep, syscalls)
+    out["elf"] = img
+    return out
+
+def run_program(code: CodeCache, regs, mem, pc: int, max_steps: int = 1000,
+                trace=False, mode: str = "interp", profile=None, timing=None, caches=None,
+                lockstep=None, syscalls=None):
+    # trace: True for a fresh TraceBuffer, or a TraceBuffer to append to (it
+    # is returned as result["trace"]). Tracing is per-instruction, so it
+    # always goes through the interpreter.
+    # profile: a profiler.Profile to accumulate into (result["profile"]);
+    # also interpreter-only, and not combined with trace.
+    # timing: a timing.PipelineTiming to accumulate into (result["timing"]);
+    # interpreter-only and exclusive with trace/profile like the others.
+    # caches: a cache.L1 whose icache/dcache see every fetch/load/store
+    # (result["caches"]); same rules. A recorded trace can be replayed into
+    # caches afterwards instead (cache.trace_streams).
+    # lockstep: a lockstep.Lockstep that cross-checks sampled instructions
+    # (result["lockstep"]); same rules again. With stop_on_divergence the run
+    # halts with "divergence" just after the offending instruction.
+    # syscalls: a syscalls.Syscalls servicing ECALL (result["syscalls"]);
+    # without one an ecall stops the run. An exit call halts with "exit".
+    # mode="gate": gate-level execution (result["gates"], a gatesim.GateBackend);
+    # it has its own loop, so none of the above apply.
+    if mode not in ("interp", "block", "gate"):
+        raise ValueError(f"unknown run mode {mode}")
+    tracing = isinstance(trace, TraceBuffer) or bool(trace)   # an empty buffer is falsy
+    extras = tracing + sum(x is not None for x in (profile, timing, caches, lockstep))
+    if extras > 1:
+        raise ValueError("trace, profile, timing, caches and lockstep cannot be combined")
+    if extras and mode == "gate":
+        raise ValueError("gate mode cannot be combined with trace, profile, timing, caches or lockstep")
+    tb = None
+    gates = None
+    if mode == "gate":
+        gates = GateBackend()
+        run = lambda pc, n: _run_gate(code, regs, mem, pc, n, gates)
+    elif tracing:
+        tb = trace if isinstance(trace, TraceBuffer) else TraceBuffer()
+        run = lambda pc, n: _run_traced(code, regs, mem, pc, n, tb)
+    elif profile is not None:
+        run = lambda pc, n: _run_profiled(code, regs, mem, pc, n, profile)
+    elif timing is not None:
+        run = lambda pc, n: _run_timed(code, regs, mem, pc, n, timing)
+    elif caches is not None:
+        run = lambda pc, n: _run_cached(code, regs, mem, pc, n, caches)
+    elif lockstep is not None:
+        run = lambda pc, n: _run_lockstep(code, regs, mem, pc, n, lockstep)
+    else:
+        loop = _run_blocks if mode == "block" else _run_fast
+        run = lambda pc, n: loop(code, regs, mem, pc, n)
+    pc, steps, halt = run(pc, max_steps)
+    if syscalls is not None:
+        # The loops stop at an ecall like at any other halt; service it here
+        # and carry on after it, so the hot loops never test for it.
+        syscalls.set_break(max(hi for _lo, hi in code.ranges))
+        try:
+            while halt == "ecall" and steps < max_steps:
+                steps += 1
+                if syscalls.ecall(regs, mem, steps):
+                    halt = HALT_EXIT
+                    break
+                pc, k, halt = run(pc + 4, max_steps - steps)
+                steps += k
+        finally:
+            syscalls.retired += steps
+            syscalls.flush()
+
+    out = {
+        "regs": [r & 0xFFFFFFFF for r in regs[:32]],
+        "fregs": regs[FREG:FREG + 32],
+        "mem": mem,
+        "pc": pc,
+        "steps": steps,
+        "halt": halt,
+    }
+    if tb is not None:
+        out["trace"] = tb
+    if profile is not None:
+        out["profile"] = profile
+    if timing is not None:
+        out["timing"] = timing
+    if caches is not None:
+        out["caches"] = caches
+    if lockstep is not None:
+        out["lockstep"] = lockstep
+    if gates is not None:
+        out["gates"] = gates
+    if syscalls is not None:
+        out["syscalls"] = syscalls
+        if halt == HALT_EXIT:
+            out["exit_code"] = syscalls.exit_code
+    return out
 
-    # Simple state
-    regs = [0] * 32  # x0..x31
-    pc = 0
-    mem = {}         # word-addressed RAM (for sample’s 0x0001_0000)
+# Why a run stopped (the "halt" entry of run_hex's result)
+HALT_MAX_STEPS = "max_steps"
+HALT_SELF_LOOP = "self-loop"        # jal x0, 0
+HALT_PC_RANGE = "pc out of range"   # also misaligned pc
+HALT_MEM_FAULT = "memory fault"     # load/store outside the memory backend
+HALT_DIVERGENCE = "divergence"      # lockstep check failed (stop_on_divergence)
+HALT_IDLE = "idle loop"             # a loop iterating without changing anything
+HALT_EXIT = "exit"                  # exit syscall (result["exit_code"])
+# otherwise the decoded name of the stopping instruction: illegal/ecall/ebreak
 
-    def x(i): return regs[i] & 0xFFFFFFFF
-    def setx(i, v):
-        if i != 0:
-            regs[i] = _u32(v)
+IDLE_MAX_BODY = 64   # longest loop body (instructions) considered for idle detection
+IDLE_MAX_SKIP = 256  # back edges a run loop may pass between two idle checks
 
+class IdleLoops:
+    # Idle-loop detection for the run loops, consulted on backward
+    # branches/jumps (next_pc <= pc). A candidate loop is a back edge whose
+    # body, target .. branch, is straight-line code without stores, ecall or
+    # illegal words: `beq x0, x0, .`, or polling a word with `lw` + branch.
+    # Nothing but the registers the body writes can change across an
+    # iteration (memory cannot, without a store), so once two back-to-back
+    # trips over the same back edge see the same values in those registers,
+    # every later iteration repeats the last one and the run can stop.
+    #
+    # The run loops call back_edge() on every back edge; it returns where to
+    # stop when the loop is idle. Only every so many back edges is a real
+    # check: after each loop found busy the skip doubles (up to
+    # IDLE_MAX_SKIP), so a hot counting loop pays for a check only now and
+    # then, and a loop that goes idle is caught within a few hundred
+    # iterations.
+    def __init__(self, code: CodeCache):
+        self.code = code
+        # With devices on the bus (mmio.Bus) a load may read a status register
+        # that changes by itself, so loops that load are never idle there.
+        self.volatile = bool(getattr(code.mem, "devices", None))
+        self.bodies = {}    # (branch pc, target) -> registers written, or None
+        self.last = None    # (branch pc, target, steps, values) at the last check
+        self.backoff = 1
+        self.skip = 0       # back edges left before the next check
+
+    def back_edge(self, pc: int, target: int, steps: int, regs) -> Optional[Tuple[int, str]]:
+        # The branch/jump at pc just retired, going back to target. Returns
+        # (pc, halt) to stop the run with -- (target, HALT_IDLE) -- or None.
+        self.skip -= 1
+        if self.skip >= 0:
+            return None
+        self.skip = self(pc, target, steps, regs)
+        return (target, HALT_IDLE) if self.skip < 0 else None
+
+    def __call__(self, pc: int, target: int, steps: int, regs) -> int:
+        # How many back edges may pass before the next check, or -1 if idle.
+        key = (pc, target)
+        written = self.bodies.get(key, False)
+        if written is False:
+            written = self.bodies[key] = self._body(pc, target)
+        if written is None:
+            return self._busy()
+        vals = tuple([regs[r] for r in written])
+        last = self.last
+        self.last = (pc, target, steps, vals)
+        if (last is None or last[0] != pc or last[1] != target
+                or steps - last[2] != (pc - target) // 4 + 1):
+            return 0        # fresh snapshot: compare at the very next back edge
+        if last[3] == vals:
+            return -1
+        return self._busy()
+
+    def _busy(self) -> int:
+        skip = self.backoff
+        self.backoff = min(2 * skip, IDLE_MAX_SKIP)
+        return skip
+
+    def _body(self, pc: int, target: int):
+        if pc - target > 4 * (IDLE_MAX_BODY - 1):
+            return None
+        written = []
+        for a in range(target, pc + 4, 4):
+            d = self.code[a]
+            if d is None or d.fn is None:
+                return None
+            kind = TRACE_KIND[d.fn]
+            if kind == TK_STORE or (kind == TK_JUMP and a != pc) or (kind == TK_LOAD and self.volatile):
+                return None
+            if d.rd != X0_SINK and d.rd and d.rd not in written:
+                written.append(d.rd)
+        return tuple(written)
+
+def _run_fast(code, regs, mem, pc, max_steps):
+    idle = IdleLoops(code)
     steps = 0
-    while steps < max_steps:
-        if pc // 4 < 0 or pc // 4 >= len(prog):
-            if trace: print(f"PC out of range: 0x{pc:08X}")
-            break
-        inst = prog[pc // 4]
-        if trace: print(f"PC=0x{pc:08X} INST=0x{inst:08X}")
-
-        opcode = inst & 0x7F
-        rd     = (inst >> 7) & 0x1F
-        funct3 = (inst >> 12) & 0x7
-        rs1    = (inst >> 15) & 0x1F
-        rs2    = (inst >> 20) & 0x1F
-        funct7 = (inst >> 25) & 0x7F
-
-        next_pc = pc + 4
-
-        if opcode == 0x13:  # OP-IMM (ADDI)
-            imm = _sign_extend(inst >> 20, 12)
-            if funct3 == 0x0:  # ADDI
-                setx(rd, x(rs1) + imm)
-                if trace: print(f"  addi x{rd}, x{rs1}, {imm} -> x{rd}=0x{regs[rd]:08X}")
-
-        elif opcode == 0x33:  # OP
-            if funct3 == 0x0 and funct7 == 0x00:  # ADD
-                setx(rd, x(rs1) + x(rs2))
-                if trace: print(f"  add x{rd}, x{rs1}, x{rs2} -> x{rd}=0x{regs[rd]:08X}")
-            elif funct3 == 0x0 and funct7 == 0x20:  # SUB
-                setx(rd, x(rs1) - x(rs2))
-                if trace: print(f"  sub x{rd}, x{rs1}, x{rs2} -> x{rd}=0x{regs[rd]:08X}")
-
-        elif opcode == 0x37:  # LUI
-            imm_u = inst & 0xFFFFF000
-            setx(rd, imm_u)
-            if trace: print(f"  lui x{rd}, 0x{imm_u>>12:05X} -> x{rd}=0x{regs[rd]:08X}")
-
-        elif opcode == 0x23:  # STORE (SW)
-            imm = ((inst >> 7) & 0x1F) | (((inst >> 25) & 0x7F) << 5)
-            imm = _sign_extend(imm, 12)
-            if funct3 == 0x2:  # SW
-                addr = _u32(x(rs1) + imm)
-                _write_u32(mem, addr, x(rs2))
-                if trace: print(f"  sw x{rs2}, {imm}(x{rs1}) -> mem[0x{addr:08X}]=0x{_read_u32(mem,addr):08X}")
-
-        elif opcode == 0x03:  # LOAD (LW)
-            imm = _sign_extend(inst >> 20, 12)
-            if funct3 == 0x2:  # LW
-                addr = _u32(x(rs1) + imm)
-                setx(rd, _read_u32(mem, addr))
-                if trace: print(f"  lw x{rd}, {imm}(x{rs1}) -> x{rd}=0x{regs[rd]:08X}")
-
-        elif opcode == 0x63:  # BRANCH (BEQ)
-            imm = (
-                ((inst >> 7) & 0x1) << 11 |
-                ((inst >> 8) & 0xF) << 1  |
-                ((inst >> 25) & 0x3F) << 5 |
-                ((inst >> 31) & 0x1) << 12
-            )
-            imm = _sign_extend(imm, 13)
-            if funct3 == 0x0:  # BEQ
-                if x(rs1) == x(rs2):
-                    next_pc = _u32(pc + imm)
-                if trace: print(f"  beq x{rs1}, x{rs2}, {imm} -> pc=0x{next_pc:08X}")
-
-        elif opcode == 0x6F:  # JAL
-            imm = (
-                ((inst >> 21) & 0x3FF) << 1 |
-                ((inst >> 20) & 0x1) << 11  |
-                ((inst >> 12) & 0xFF) << 12 |
-                ((inst >> 31) & 0x1) << 20
-            )
-            imm = _sign_extend(imm, 21)
-            setx(rd, pc + 4)
-            next_pc = _u32(pc + imm)
-            if trace: print(f"  jal x{rd}, {imm} -> pc=0x{next_pc:08X}")
-
-        else:
-            if trace: print(f"  (unimplemented opcode 0x{opcode:02X})")
-            break
+    try:
+        while steps < max_steps:
+            d = code[pc]
+            if d is None:
+                return pc, steps, HALT_PC_RANGE
+            fn, rd, rs1, rs2, imm, _name, _inst = d
+            if fn is None:
+                return pc, steps, d.name
+            next_pc = fn(regs, mem, pc, rd, rs1, rs2, imm)
+            steps += 1
+            if next_pc <= pc:
+                if next_pc == pc and is_self_jump(d):
+                    return pc, steps, HALT_SELF_LOOP
+                stop = idle.back_edge(pc, next_pc, steps, regs)
+                if stop is not None:
+                    return stop[0], steps, stop[1]
+            pc = next_pc
+    except MemoryFault:
+        # the faulting instruction did not retire; pc still points at it
+        return pc, steps, HALT_MEM_FAULT
+    return pc, steps, HALT_MAX_STEPS
 
-        pc = next_pc
-        regs[0] = 0
-        steps += 1
+def _run_traced(code, regs, mem, pc, max_steps, tb: TraceBuffer):
+    # Interpreter loop that also appends one record per retired instruction to
+    # the ring buffer tb (arrays written in place; nothing is formatted here).
+    t_pc, t_inst, t_rd, t_val, t_addr = tb.pc, tb.inst, tb.rd, tb.value, tb.addr
+    cap = tb.capacity
+    seq = tb.count
+    kind_of = TRACE_KIND
+    idle = IdleLoops(code)
+    steps = 0
+    try:
+        while steps < max_steps:
+            d = code[pc]
+            if d is None:
+                return pc, steps, HALT_PC_RANGE
+            fn, rd, rs1, rs2, imm, _name, inst = d
+            if fn is None:
+                return pc, steps, d.name
+            kind = kind_of[fn]
+            addr = (regs[rs1] + imm) & M32 if kind == TK_LOAD or kind == TK_STORE else 0
+            next_pc = fn(regs, mem, pc, rd, rs1, rs2, imm)
+            i = seq % cap
+            t_pc[i] = pc
+            t_inst[i] = inst
+            if kind == TK_STORE:
+                t_rd[i] = 0
+                t_val[i] = regs[rs2]
+            else:
+                t_rd[i] = 0 if rd == X0_SINK else rd
+                t_val[i] = regs[rd] if rd != X0_SINK else 0
+            t_addr[i] = next_pc & M32 if kind == TK_JUMP else addr
+            seq += 1
+            steps += 1
+            if next_pc <= pc:
+                if next_pc == pc and is_self_jump(d):
+                    return pc, steps, HALT_SELF_LOOP
+                stop = idle.back_edge(pc, next_pc, steps, regs)
+                if stop is not None:
+                    return stop[0], steps, stop[1]
+            pc = next_pc
+    except MemoryFault:
+        return pc, steps, HALT_MEM_FAULT
+    finally:
+        tb.count = seq
+    return pc, steps, HALT_MAX_STEPS
 
-        # Safety stop if we detect the infinite loop (JAL x0, 0)
-        if opcode == 0x6F and rd == 0 and next_pc == pc:
-            if trace: print("  halt (jal x0, 0)")
-            break
+def _run_profiled(code, regs, mem, pc, max_steps, prof: Profile):
+    # Interpreter loop with per-block accounting (see profiler.py). Work per
+    # instruction is one counter and a set lookup; the rest happens when a
+    # branch/jump ends the block.
+    jumps = JUMP_FNS
+    bcount, blen, bns, stacks = prof.block_count, prof.block_len, prof.block_ns, prof.stacks
+    stack = prof.stack
+    if not stack:
+        stack.append(pc)
+    key = tuple(stack)
+    prof.code = code
+    clock = perf_counter_ns
+    entry = pc
+    idle = IdleLoops(code)
+    n = steps = 0
+    halt = HALT_MAX_STEPS
+    t0 = clock()
+    try:
+        while steps < max_steps:
+            d = code[pc]
+            if d is None:
+                halt = HALT_PC_RANGE
+                break
+            fn, rd, rs1, rs2, imm, _name, _inst = d
+            if fn is None:
+                halt = d.name
+                break
+            next_pc = fn(regs, mem, pc, rd, rs1, rs2, imm)
+            steps += 1
+            n += 1
+            if fn in jumps:
+                now = clock()
+                bcount[entry] = bcount.get(entry, 0) + 1
+                blen[entry] = n
+                bns[entry] = bns.get(entry, 0) + now - t0
+                stacks[key] = stacks.get(key, 0) + n
+                if rd in LINK_REGS:
+                    stack.append(next_pc)
+                    key = tuple(stack)
+                elif rd == X0_SINK and rs1 in LINK_REGS and _name == "jalr" and len(stack) > 1:
+                    stack.pop()
+                    key = tuple(stack)
+                entry = next_pc
+                n = 0
+                t0 = now
+                if next_pc <= pc:
+                    if next_pc == pc and is_self_jump(d):
+                        halt = HALT_SELF_LOOP
+                        break
+                    stop = idle.back_edge(pc, next_pc, steps, regs)
+                    if stop is not None:
+                        pc, halt = stop
+                        break
+            pc = next_pc
+    except MemoryFault:
+        halt = HALT_MEM_FAULT
+    if n:
+        # block cut short (stop, fault or budget): charge its pcs one by one
+        for k in range(n):
+            prof.partial[entry + 4 * k] = prof.partial.get(entry + 4 * k, 0) + 1
+        bns[entry] = bns.get(entry, 0) + clock() - t0
+        stacks[key] = stacks.get(key, 0) + n
+    prof.steps += steps
+    return pc, steps, halt
 
-    return {
-        "regs": [r & 0xFFFFFFFF for r in regs],
-        "mem": mem,
-        "pc": pc,
-        "steps": steps
-    }
\ No newline at end of file
+def _run_timed(code, regs, mem, pc, max_steps, tm: PipelineTiming):
+    # Interpreter loop plus the scoreboard of timing.py: per instruction, a
+    # few max() steps on the operands' ready cycles.
+    op_timing = tm.op_timing()
+    ready = tm.ready
+    units = tm.unit_counts
+    jumps = JUMP_FNS
+    resolve = tm.predictor.resolve
+    penalty = tm.control_penalty()
+    t = tm.issue
+    div_free = tm.div_free
+    data = control = struct = 0
+    idle = IdleLoops(code)
+    steps = 0
+    halt = HALT_MAX_STEPS
+    try:
+        while steps < max_steps:
+            d = code[pc]
+            if d is None:
+                halt = HALT_PC_RANGE
+                break
+            fn, rd, rs1, rs2, imm, name, _inst = d
+            if fn is None:
+                halt = name
+                break
+            next_pc = fn(regs, mem, pc, rd, rs1, rs2, imm)
+            lat, unit = op_timing[name]
+            issue = t + 1
+            r = ready[rs1]
+            if ready[rs2] > r:
+                r = ready[rs2]
+            if r > issue:
+                data += r - issue
+                issue = r
+            if unit is UNIT_DIV:
+                if div_free > issue:
+                    struct += div_free - issue
+                    issue = div_free
+                div_free = issue + lat
+            ready[rd] = issue + lat
+            units[unit] = units.get(unit, 0) + 1
+            t = issue
+            steps += 1
+            if fn in jumps:
+                if next_pc <= pc:
+                    if next_pc == pc and is_self_jump(d):
+                        halt = HALT_SELF_LOOP
+                        break
+                    stop = idle.back_edge(pc, next_pc, steps, regs)
+                    if stop is not None:
+                        pc, halt = stop
+                        break
+                pen = penalty[resolve(pc, d, next_pc)]
+                control += pen
+                t += pen
+            pc = next_pc
+    except MemoryFault:
+        halt = HALT_MEM_FAULT
+    tm.issue = t
+    tm.div_free = div_free
+    tm.instructions += steps
+    tm.predictor.instructions += steps
+    tm.data_stalls += data
+    tm.control_stalls += control
+    tm.structural_stalls += struct
+    return pc, steps, halt
+
+def _run_cached(code, regs, mem, pc, max_steps, l1: L1):
+    # Interpreter loop feeding the L1 models. A fetch from the line fetched
+    # last is a hit that changes no replacement state, so it is only counted.
+    ic, dc = l1.icache, l1.dcache
+    iaccess = ic.access_line if ic is not None else None
+    ishift = ic.line_shift if ic is not None else 0
+    daccess = dc.access if dc is not None else None
+    kind_of = TRACE_KIND
+    iline = -1
+    repeats = 0
+    idle = IdleLoops(code)
+    steps = 0
+    halt = HALT_MAX_STEPS
+    try:
+        while steps < max_steps:
+            d = code[pc]
+            if d is None:
+                halt = HALT_PC_RANGE
+                break
+            fn, rd, rs1, rs2, imm, _name, _inst = d
+            if fn is None:
+                halt = d.name
+                break
+            if iaccess is not None:
+                line = pc >> ishift
+                if line == iline:
+                    repeats += 1
+                else:
+                    iaccess(line)
+                    iline = line
+            if daccess is not None:
+                kind = kind_of[fn]
+                if kind == TK_LOAD or kind == TK_STORE:
+                    daccess((regs[rs1] + imm) & M32, kind == TK_STORE)
+            next_pc = fn(regs, mem, pc, rd, rs1, rs2, imm)
+            steps += 1
+            if next_pc <= pc:
+                if next_pc == pc and is_self_jump(d):
+                    halt = HALT_SELF_LOOP
+                    break
+                stop = idle.back_edge(pc, next_pc, steps, regs)
+                if stop is not None:
+                    pc, halt = stop
+                    break
+            pc = next_pc
+    except MemoryFault:
+        halt = HALT_MEM_FAULT
+    if ic is not None:
+        ic.hits += repeats
+    return pc, steps, halt
+
+def _run_lockstep(code, regs, mem, pc, max_steps, ls: Lockstep):
+    # Interpreter loop that hands one in ls.every candidate instructions to
+    # the lockstep checker. Operands are captured before the handler runs,
+    # since rd may be one of them.
+    ops = ls.ops
+    every = ls.every
+    countdown = ls.countdown
+    operands, check = ls.operands, ls.check
+    stop = ls.stop_on_divergence
+    seq0 = ls.seq
+    cand = 0
+    a = b = 0
+    idle = IdleLoops(code)
+    steps = 0
+    halt = HALT_MAX_STEPS
+    try:
+        while steps < max_steps:
+            d = code[pc]
+            if d is None:
+                halt = HALT_PC_RANGE
+                break
+            fn, rd, rs1, rs2, imm, name, _inst = d
+            if fn is None:
+                halt = name
+                break
+            sample = False
+            if name in ops:
+                cand += 1
+                countdown -= 1
+                if not countdown:
+                    countdown = every
+                    sample = rd != X0_SINK
+                    if sample:
+                        a, b = operands(d, regs)
+            next_pc = fn(regs, mem, pc, rd, rs1, rs2, imm)
+            steps += 1
+            if sample:
+                ls.seq = seq0 + steps - 1
+                if not check(d, pc, a, b, regs[rd]) and stop:
+                    pc = next_pc
+                    halt = HALT_DIVERGENCE
+                    break
+            if next_pc <= pc:
+                if next_pc == pc and is_self_jump(d):
+                    halt = HALT_SELF_LOOP
+                    break
+                stop = idle.back_edge(pc, next_pc, steps, regs)
+                if stop is not None:
+                    pc, halt = stop
+                    break
+            pc = next_pc
+    except MemoryFault:
+        halt = HALT_MEM_FAULT
+    ls.seq = seq0 + steps
+    ls.candidates += cand
+    ls.countdown = countdown
+    return pc, steps, halt
+
+def _run_gate(code, regs, mem, pc, max_steps, gb: GateBackend):
+    # Interpreter loop with GateBackend.step in place of the handlers. The
+    # gate counter stays patched in for the whole run.
+    step = gb.step
+    idle = IdleLoops(code)
+    steps = 0
+    with gb.counter:
+        try:
+            while steps < max_steps:
+                d = code[pc]
+                if d is None:
+                    return pc, steps, HALT_PC_RANGE
+                if d.fn is None:
+                    return pc, steps, d.name
+                next_pc = step(d, regs, mem, pc)
+                steps += 1
+                if next_pc <= pc:
+                    if next_pc == pc and is_self_jump(d):
+                        return pc, steps, HALT_SELF_LOOP
+                    stop = idle.back_edge(pc, next_pc, steps, regs)
+                    if stop is not None:
+                        return stop[0], steps, stop[1]
+                pc = next_pc
+        except MemoryFault:
+            return pc, steps, HALT_MEM_FAULT
+    return pc, steps, HALT_MAX_STEPS
+
+def _run_blocks(code, regs, mem, pc, max_steps):
+    cache = code.blocks
+    if cache is None:
+        cache = code.blocks = BlockCache(code)
+    get = cache.get
+    idle = IdleLoops(code)
+    steps = 0
+    while steps < max_steps:
+        fn, n, halt_pc, _start, _src = get(pc)
+        if fn is None:
+            # illegal instruction or pc out of range: let the interpreter decide
+            pc, k, halt = _run_fast(code, regs, mem, pc, max_steps - steps)
+            return pc, steps + k, halt
+        if steps + n > max_steps:
+            # not enough budget for the whole block; finish one at a time
+            pc, k, halt = _run_fast(code, regs, mem, pc, max_steps - steps)
+            return pc, steps + k, halt
+        try:
+            next_pc = fn(regs, mem)
+        except MemoryFault as e:
+            # blocks write back registers up to the faulting instruction
+            return pc + 4 * e.retired, steps + e.retired, HALT_MEM_FAULT
+        steps += n
+        if next_pc == halt_pc:
+            return halt_pc, steps, HALT_SELF_LOOP
+        end = pc + 4 * (n - 1)      # the block's branch/jump
+        if next_pc <= end:
+            stop = idle.back_edge(end, next_pc, steps, regs)
+            if stop is not None:
+                return stop[0], steps, stop[1]
+        pc = next_pc
+    return pc, steps, HALT_MAX_STEPS
@@ -1,44 +1,29 @@
 from __future__ import annotations
 from typing import Tuple, Literal
-from memory import Bit
+from memory import Bit, BitVector, zero_extend
 import gates as g
 
 Bits = Tuple[Bit, ...]
 Op = Literal["SLL", "SRL", "SRA"]
 
-def _zeros(n: int) -> Bits:
-    return tuple(Bit(False) for _ in range(n))
+# Each stage is one row of 2:1 muxes wired k places over; on a BitVector
+# that wiring is a shift of the packed int.
 
-def _stage_sll(a: Bits, k: int) -> Bits:
+def _stage_sll(a: BitVector, k: int) -> BitVector:
     if k == 0: return a
-    n = len(a)
-    out = list(a)
-    for _ in range(k):
-        for i in range(n - 1):
-            out[i] = out[i + 1]
-        out[-1] = Bit(False)
-    return tuple(out)
+    return BitVector(a.width, a.value << k)
 
-def _stage_srl(a: Bits, k: int) -> Bits:
+def _stage_srl(a: BitVector, k: int) -> BitVector:
     if k == 0: return a
-    n = len(a)
-    out = list(a)
-    for _ in range(k):
-        for i in range(n - 1, 0, -1):
-            out[i] = out[i - 1]
-        out[0] = Bit(False)
-    return tuple(out)
+    return BitVector(a.width, a.value >> k)
 
-def _stage_sra(a: Bits, k: int) -> Bits:
+def _stage_sra(a: BitVector, k: int) -> BitVector:
     if k == 0: return a
-    n = len(a)
-    sign = a[0] if n > 0 else Bit(False)
-    out = list(a)
-    for _ in range(k):
-        for i in range(n - 1, 0, -1):
-            out[i] = out[i - 1]
-        out[0] = sign
-    return tuple(out)
+    n = a.width
+    fill = 0
+    if n and a.value >> (n - 1):
+        fill = ((1 << n) - 1) ^ (((1 << n) - 1) >> k)  # sign copies in the top k bits
+    return BitVector(n, (a.value >> k) | fill)
 
 def _shamt5_to_bools(shamt5: Bits) -> Tuple[bool, bool, bool, bool, bool]:
     # MSB-first 32b input; we only look at the **last 5** bits (LSB .. LSB-4)
@@ -50,8 +35,8 @@ def _shamt5_to_bools(shamt5: Bits) -> Tuple[bool, bool, bool, bool, bool]:
     b4 = bool(shamt5[-5])
     return b0, b1, b2, b3, b4
 
-def shift32(a: Bits, shamt5: Bits, op: Op) -> Bits:
-    a = a[-32:] if len(a) >= 32 else (_zeros(32 - len(a)) + a)
+def shift32(a: Bits, shamt5: Bits, op: Op) -> BitVector:
+    a = zero_extend(a, 32)
     s0, s1, s2, s3, s4 = _shamt5_to_bools(shamt5)
     out = a
     if op == "SLL":
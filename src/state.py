@@ -0,0 +1,117 @@
+from __future__ import annotations
+import json
+import struct
+from typing import List, NamedTuple, Optional, Tuple
+from decoder import CodeCache, FREG
+from ram import PagedMemory, nonzero_pages
+from runner import load_hex_program, load_elf_program, run_program
+
+# Resumable simulator state for the host-side runner.
+# SimState owns what run_hex keeps in locals (registers, pc, memory, decode
+# cache), so a run can be paused, checkpointed and continued. snapshot() on a
+# PagedMemory is copy-on-write: nothing is copied up front and later stores
+# copy only the pages they touch, so checkpointing a warmed-up program and
+# branching many runs from it costs O(dirty pages) per branch.
+#
+# Snapshots live in memory; save()/load() write the current state to disk
+# (resident non-zero pages only).
+
+class Checkpoint(NamedTuple):
+    regs: Tuple[int, ...]
+    pc: int
+    steps: int
+    halt: Optional[str]
+    mem: object     # backend snapshot (ram.MemSnapshot for PagedMemory)
+
+_MAGIC = b"SDSIMST1"
+_LEN = struct.Struct("<I")
+
+class SimState:
+    def __init__(self, code: CodeCache, regs: List[int], mem, pc: int = 0):
+        self.code = code
+        self.regs = regs
+        self.mem = mem
+        self.pc = pc
+        self.steps = 0
+        self.halt: Optional[str] = None
+
+    @classmethod
+    def from_hex(cls, path: str, mem=None) -> SimState:
+        mem = PagedMemory() if mem is None else mem
+        code, regs, pc = load_hex_program(path, mem)
+        return cls(code, regs, mem, pc)
+
+    @classmethod
+    def from_elf(cls, path: str, mem=None) -> SimState:
+        mem = PagedMemory() if mem is None else mem
+        code, regs, pc, _img = load_elf_program(path, mem)
+        return cls(code, regs, mem, pc)
+
+    def run(self, max_steps: int = 1000, mode: str = "interp", trace=False, profile=None,
+            timing=None, caches=None, lockstep=None, syscalls=None) -> str:
+        # Continue from the current pc for up to max_steps more instructions.
+        out = run_program(self.code, self.regs, self.mem, self.pc, max_steps, trace, mode,
+                          profile, timing, caches, lockstep, syscalls)
+        self.pc = out["pc"]
+        self.steps += out["steps"]
+        self.halt = out["halt"]
+        return self.halt
+
+    def result(self) -> dict:
+        # Same shape as run_hex's return value (steps are cumulative).
+        return {
+            "regs": [r & 0xFFFFFFFF for r in self.regs[:32]],
+            "fregs": self.regs[FREG:FREG + 32],
+            "mem": self.mem,
+            "pc": self.pc,
+            "steps": self.steps,
+            "halt": self.halt,
+        }
+
+    # checkpoints
+
+    def snapshot(self) -> Checkpoint:
+        return Checkpoint(tuple(self.regs), self.pc, self.steps, self.halt, self.mem.snapshot())
+
+    def restore(self, cp: Checkpoint) -> None:
+        self.regs[:] = cp.regs   # in place: the list may be shared with callers
+        self.pc = cp.pc
+        self.steps = cp.steps
+        self.halt = cp.halt
+        self.mem.restore(cp.mem)
+
+    # on disk: magic, header length, JSON header, then the page bytes in order
+
+    def save(self, path: str) -> None:
+        pages = list(nonzero_pages(self.mem))
+        header = json.dumps({
+            "pc": self.pc,
+            "steps": self.steps,
+            "halt": self.halt,
+            "regs": self.regs[:32],
+            "fregs": self.regs[FREG:FREG + 32],
+            "code": self.code.ranges,
+            "pages": [[addr, len(buf)] for addr, buf in pages],
+        }).encode()
+        with open(path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(_LEN.pack(len(header)))
+            f.write(header)
+            for _addr, buf in pages:
+                f.write(buf)
+
+    @classmethod
+    def load(cls, path: str, mem=None) -> SimState:
+        mem = PagedMemory() if mem is None else mem
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path}: not a saved simulator state")
+            (n,) = _LEN.unpack(f.read(_LEN.size))
+            h = json.loads(f.read(n))
+            for addr, size in h["pages"]:
+                mem.load(addr, f.read(size))
+        regs = list(h["regs"]) + [0] * (FREG - 32) + list(h.get("fregs", [0] * 32))
+        st = cls(CodeCache(mem, h["code"]), regs, mem, h["pc"])
+        st.steps = h["steps"]
+        st.halt = h["halt"]
+        return st
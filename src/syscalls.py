@@ -0,0 +1,188 @@
+from __future__ import annotations
+import io
+import json
+import time
+from typing import BinaryIO, Dict, Optional, Union
+from ram import MemoryFault
+
+# Host interface for ECALL (run_hex(..., syscalls=Syscalls(...))).
+# Calls follow the Linux/riscv-pk convention newlib's libgloss uses: the
+# number in a7, arguments in a0..a2, the result (or -errno) back in a0.
+#
+#   exit / exit_group (93 / 94)     stop the run, status a0 -> exit_code
+#   read(fd, buf, count)      (63)  fd 0 only, from the stdin bytes/file;
+#                                   returns what is available, like read(2)
+#   write(fd, buf, count)     (64)  fd 1 and 2
+#   brk(addr)                (214)  grows/queries the program break
+#   clock_gettime(id, tp)    (113)  struct timespec {int64 sec; int32 nsec}
+#
+# Anything else returns -ENOSYS and is counted. Console writes go into one
+# io.BytesIO per fd; with a sink (a binary file such as sys.stdout.buffer)
+# the buffer is written out in bulk once it holds flush_bytes, and by
+# flush() at the end of every run_program call. Without a sink it keeps the
+# whole output for output().
+#
+# The clock is simulated by default: retired instructions at clock_hz, so
+# runs are reproducible. clock="host" reads the host clocks instead.
+
+SYS_READ = 63
+SYS_WRITE = 64
+SYS_EXIT = 93
+SYS_EXIT_GROUP = 94
+SYS_CLOCK_GETTIME = 113
+SYS_BRK = 214
+
+NAMES = {SYS_READ: "read", SYS_WRITE: "write", SYS_EXIT: "exit", SYS_EXIT_GROUP: "exit_group",
+         SYS_CLOCK_GETTIME: "clock_gettime", SYS_BRK: "brk"}
+
+EBADF, EFAULT, EINVAL, ENOSYS = 9, 14, 22, 38
+CLOCK_REALTIME, CLOCK_MONOTONIC = 0, 1
+
+A0, A1, A2, A7 = 10, 11, 12, 17
+M32 = 0xFFFFFFFF
+
+class Syscalls:
+    def __init__(self, stdin: Union[bytes, BinaryIO] = b"", stdout: Optional[BinaryIO] = None,
+                 stderr: Optional[BinaryIO] = None, brk: Optional[int] = None,
+                 clock: str = "sim", clock_hz: int = 100_000_000, flush_bytes: int = 1 << 16):
+        if clock not in ("sim", "host"):
+            raise ValueError(f"unknown clock {clock}")
+        self.stdin = io.BytesIO(stdin) if isinstance(stdin, (bytes, bytearray)) else stdin
+        self.console = {1: io.BytesIO(), 2: io.BytesIO()}
+        self.sinks = {1: stdout, 2: stderr}
+        self.flush_bytes = flush_bytes
+        self.brk = brk              # None: run_program sets it past the image
+        self.brk_base = brk
+        self.clock = clock
+        self.clock_hz = clock_hz
+        self.retired = 0            # instructions retired by earlier run_program calls
+        self.exit_code: Optional[int] = None
+        self.calls: Dict[str, int] = {}
+        self.unknown: Dict[int, int] = {}
+        self.bytes_written = 0
+        self.bytes_read = 0
+
+    def set_break(self, addr: int) -> None:
+        # Initial program break (first call wins; an explicit brk= is kept).
+        if self.brk is None:
+            self.brk = self.brk_base = (addr + 15) & ~15
+
+    def ecall(self, regs, mem, instret: int) -> bool:
+        # Service the call in regs; True when the program exited. instret
+        # counts this run_program call's retired instructions so far.
+        num = regs[A7]
+        name = NAMES.get(num)
+        if name is None:
+            self.unknown[num] = self.unknown.get(num, 0) + 1
+            regs[A0] = -ENOSYS & M32
+            return False
+        self.calls[name] = self.calls.get(name, 0) + 1
+        a0, a1, a2 = regs[A0], regs[A1], regs[A2]
+        if num == SYS_EXIT or num == SYS_EXIT_GROUP:
+            self.exit_code = a0 - (1 << 32) if a0 & 0x80000000 else a0
+            self.flush()
+            return True
+        try:
+            if num == SYS_WRITE:
+                ret = self._write(mem, a0, a1, a2)
+            elif num == SYS_READ:
+                ret = self._read(mem, a0, a1, a2)
+            elif num == SYS_BRK:
+                ret = self._brk(mem, a0)
+            else:
+                ret = self._clock_gettime(mem, a0, a1, instret)
+        except MemoryFault:
+            ret = -EFAULT
+        regs[A0] = ret & M32
+        return False
+
+    def _write(self, mem, fd: int, buf: int, n: int) -> int:
+        out = self.console.get(fd)
+        if out is None:
+            return -EBADF
+        out.write(mem.read(buf, n))
+        self.bytes_written += n
+        if self.sinks[fd] is not None and out.tell() >= self.flush_bytes:
+            self._flush(fd)
+        return n
+
+    def _read(self, mem, fd: int, buf: int, n: int) -> int:
+        if fd != 0:
+            return -EBADF
+        self.flush()        # a prompt written before the read shows up first
+        # read1 returns what is available (one line from a terminal or a pipe)
+        # instead of blocking until n bytes or EOF, like read(2) does
+        read = getattr(self.stdin, "read1", None) or self.stdin.read
+        data = read(n) or b""
+        mem.load(buf, data)
+        self.bytes_read += len(data)
+        return len(data)
+
+    def _brk(self, mem, addr: int) -> int:
+        # brk(0) or an address below the initial break just queries it. The
+        # memory backend needs no allocation; a FlatMemory bounds it.
+        if addr >= self.brk_base:
+            try:
+                if addr > self.brk:
+                    mem.read_u8(addr - 1)
+                self.brk = addr
+            except MemoryFault:
+                pass
+        return self.brk
+
+    def _clock_gettime(self, mem, clk: int, tp: int, instret: int) -> int:
+        if clk not in (CLOCK_REALTIME, CLOCK_MONOTONIC):
+            return -EINVAL
+        if self.clock == "sim":
+            ns = (self.retired + instret) * 1_000_000_000 // self.clock_hz
+        elif clk == CLOCK_REALTIME:
+            ns = time.time_ns()
+        else:
+            ns = time.monotonic_ns()
+        sec, nsec = divmod(ns, 1_000_000_000)
+        mem.load(tp, sec.to_bytes(8, "little") + nsec.to_bytes(4, "little") + bytes(4))
+        return 0
+
+    # console
+
+    def _flush(self, fd: int) -> None:
+        out, sink = self.console[fd], self.sinks[fd]
+        if sink is None or not out.tell():
+            return
+        sink.write(out.getvalue())
+        sink.flush()
+        out.seek(0)
+        out.truncate()
+
+    def flush(self) -> None:
+        for fd in self.console:
+            self._flush(fd)
+
+    def output(self, fd: int = 1) -> bytes:
+        # What is still buffered for fd (everything, when it has no sink).
+        return self.console[fd].getvalue()
+
+    # results
+
+    def report(self) -> Dict:
+        return {
+            "exit_code": self.exit_code,
+            "calls": dict(sorted(self.calls.items())),
+            "unknown": {str(k): v for k, v in sorted(self.unknown.items())},
+            "bytes_written": self.bytes_written,
+            "bytes_read": self.bytes_read,
+            "brk": self.brk,
+        }
+
+    def report_json(self) -> str:
+        return json.dumps(self.report(), indent=2)
+
+    def report_text(self) -> str:
+        r = self.report()
+        calls = ", ".join(f"{k} {v}" for k, v in r["calls"].items()) or "none"
+        line = f"syscalls: {calls}; {r['bytes_written']} bytes written, {r['bytes_read']} read"
+        if r["unknown"]:
+            line += "; unsupported " + ", ".join(f"#{k} x{v}" for k, v in r["unknown"].items())
+        if r["exit_code"] is not None:
+            line += f"; exit code {r['exit_code']}"
+        return line + "\n"
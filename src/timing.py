@@ -0,0 +1,117 @@
+from __future__ import annotations
+import json
+from typing import Dict, List, Optional, Tuple
+from decoder import OPS, NREGS
+from predictor import BranchPredictor, StaticPredictor
+
+# Cycle-approximate timing for a classic 5-stage in-order pipeline
+# (IF ID EX MEM WB) driven by the functional runner (run_hex(..., timing=...)).
+#
+# Rather than simulating the pipeline latches, each instruction is given an
+# issue cycle (when it enters EX) from a per-register scoreboard:
+#   issue = max(previous issue + 1, ready[rs1], ready[rs2], unit free)
+#   ready[rd] = issue + latency
+# With full forwarding ALU results are ready the next cycle (latency 1), a
+# load's data one cycle later (latency 2: the load-use stall). The multiplier
+# and FPU are pipelined; the divider is not, so back-to-back divides stall on
+# the unit. Control transfers go through a branch predictor (predictor.py;
+# static not-taken with no BTB by default): a mispredicted branch or jalr
+# resolves in EX and flushes two instructions, a taken branch or jal whose
+# target only turns up in decode is redirected in ID for one. Total cycles add
+# the four cycles it takes to fill the pipeline.
+#
+# The model accumulates across runs, so a resumed SimState keeps counting.
+
+PIPELINE_DEPTH = 5
+
+UNIT_ALU, UNIT_LOAD, UNIT_MUL, UNIT_DIV, UNIT_FPU = "alu", "load", "mul", "div", "fpu"
+_UNIT_OF: Dict[str, str] = {}
+for _name, _fn, _fmt in OPS.values():
+    if _name in ("lb", "lh", "lw", "lbu", "lhu", "flw"):
+        _UNIT_OF[_name] = UNIT_LOAD
+    elif _name.startswith("mul"):
+        _UNIT_OF[_name] = UNIT_MUL
+    elif _name.startswith(("div", "rem")):
+        _UNIT_OF[_name] = UNIT_DIV
+    elif _name in ("fadd.s", "fsub.s", "fmul.s"):
+        _UNIT_OF[_name] = UNIT_FPU
+    else:
+        _UNIT_OF[_name] = UNIT_ALU
+
+def unit_of(name: str) -> str:
+    return _UNIT_OF.get(name, UNIT_ALU)
+
+class PipelineTiming:
+    def __init__(self, load_latency: int = 2, mul_latency: int = 3, div_latency: int = 34,
+                 fpu_latency: int = 4, branch_penalty: int = 2, jump_penalty: int = 1,
+                 predictor: Optional[BranchPredictor] = None):
+        if min(load_latency, mul_latency, div_latency, fpu_latency) < 1:
+            raise ValueError("latencies must be at least 1 cycle")
+        if min(branch_penalty, jump_penalty) < 0:
+            raise ValueError("penalties cannot be negative")
+        self.latency: Dict[str, int] = {
+            UNIT_ALU: 1,
+            UNIT_LOAD: load_latency,
+            UNIT_MUL: mul_latency,
+            UNIT_DIV: div_latency,
+            UNIT_FPU: fpu_latency,
+        }
+        self.branch_penalty = branch_penalty   # mispredict (resolved in EX)
+        self.jump_penalty = jump_penalty       # target found in ID
+        self.predictor = StaticPredictor() if predictor is None else predictor
+        self.reset()
+
+    def reset(self) -> None:
+        self.ready: List[int] = [0] * NREGS    # cycle each register's value is forwardable
+        self.issue = 0                         # issue cycle of the last instruction
+        self.div_free = 0                      # cycle the divider accepts a new op
+        self.instructions = 0
+        self.data_stalls = 0
+        self.control_stalls = 0
+        self.structural_stalls = 0
+        self.unit_counts: Dict[str, int] = {}
+
+    def control_penalty(self) -> Tuple[int, int, int]:
+        # bubbles indexed by predictor outcome (HIT, REDIRECT, MISS)
+        return (0, self.jump_penalty, self.branch_penalty)
+
+    def op_timing(self) -> Dict[str, Tuple[int, str]]:
+        # mnemonic -> (result latency, unit) for the runner's loop
+        return {name: (self.latency[unit], unit) for name, unit in _UNIT_OF.items()}
+
+    # results
+
+    @property
+    def cycles(self) -> int:
+        return self.issue + PIPELINE_DEPTH - 1 if self.instructions else 0
+
+    @property
+    def cpi(self) -> float:
+        return self.cycles / self.instructions if self.instructions else 0.0
+
+    def report(self) -> Dict:
+        return {
+            "cycles": self.cycles,
+            "instructions": self.instructions,
+            "cpi": round(self.cpi, 4),
+            "stalls": {
+                "data": self.data_stalls,
+                "control": self.control_stalls,
+                "structural": self.structural_stalls,
+            },
+            "units": dict(sorted(self.unit_counts.items())),
+            "predictor": self.predictor.report(),
+        }
+
+    def report_json(self) -> str:
+        return json.dumps(self.report(), indent=2)
+
+    def report_text(self) -> str:
+        r = self.report()
+        s = r["stalls"]
+        lines = [f"{r['cycles']} cycles, {r['instructions']} instructions, CPI {self.cpi:.3f}",
+                 f"stall cycles: data {s['data']}, control {s['control']}, "
+                 f"structural {s['structural']}"]
+        for unit, n in r["units"].items():
+            lines.append(f"  {n:>10}  {unit}")
+        return "\n".join(lines) + "\n" + self.predictor.report_text()
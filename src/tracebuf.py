@@ -0,0 +1,129 @@
+from __future__ import annotations
+from array import array
+from typing import Iterator, List, NamedTuple, Optional
+from decoder import decode, format_trace
+
+# Execution trace recording.
+# TraceBuffer is a fixed-size ring of (pc, inst, rd, value, addr) records kept
+# in preallocated arrays, so recording an instruction is a handful of array
+# stores and no string is built until someone asks for a window of the trace.
+#   value: rd after the instruction (for stores: rs2, the data stored)
+#   addr:  load/store address, or the next pc for branches and jumps
+#
+# TraceLog is the same idea for the gate-level units' step traces (mdu/fpu):
+# parameterised messages are kept as (template, arg) and only formatted when
+# the trace is read.
+
+DEFAULT_CAPACITY = 1 << 16
+
+class TraceRecord(NamedTuple):
+    seq: int      # instruction number since the buffer was created/cleared
+    pc: int
+    inst: int
+    rd: int
+    value: int
+    addr: int
+
+class TraceBuffer:
+    __slots__ = ("capacity", "pc", "inst", "rd", "value", "addr", "count")
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity <= 0:
+            raise ValueError("trace capacity must be positive")
+        self.capacity = capacity
+        self.pc = array("I", bytes(4 * capacity))
+        self.inst = array("I", bytes(4 * capacity))
+        self.rd = array("B", bytes(capacity))
+        self.value = array("I", bytes(4 * capacity))
+        self.addr = array("I", bytes(4 * capacity))
+        self.count = 0   # records ever written; slot = count % capacity
+
+    def record(self, pc: int, inst: int, rd: int, value: int, addr: int) -> None:
+        # The runner's traced loop writes the arrays directly; this is the
+        # same thing for other producers.
+        i = self.count % self.capacity
+        self.pc[i] = pc
+        self.inst[i] = inst
+        self.rd[i] = rd
+        self.value[i] = value
+        self.addr[i] = addr
+        self.count += 1
+
+    def clear(self) -> None:
+        self.count = 0
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    @property
+    def first_seq(self) -> int:
+        # Sequence number of the oldest record still held.
+        return self.count - len(self)
+
+    def records(self, start: Optional[int] = None, stop: Optional[int] = None) -> Iterator[TraceRecord]:
+        # Records with start <= seq < stop, clipped to what the ring still holds.
+        lo = self.first_seq if start is None else max(start, self.first_seq)
+        hi = self.count if stop is None else min(stop, self.count)
+        cap = self.capacity
+        for seq in range(lo, hi):
+            i = seq % cap
+            yield TraceRecord(seq, self.pc[i], self.inst[i], self.rd[i], self.value[i], self.addr[i])
+
+    def tail(self, n: int) -> Iterator[TraceRecord]:
+        return self.records(self.count - n)
+
+    def format(self, start: Optional[int] = None, stop: Optional[int] = None) -> List[str]:
+        # Text for a window of the trace (two lines per instruction, as the
+        # old print-based --trace did).
+        out: List[str] = []
+        for r in self.records(start, stop):
+            out.append(f"PC=0x{r.pc:08X} INST=0x{r.inst:08X}")
+            out.append(format_trace(decode(r.inst), r.value, r.addr))
+        return out
+
+    # raw dump: the retained window, oldest first, one array after another
+
+    def dump(self, f) -> None:
+        n, cap = self.count, self.capacity
+        for col in (self.pc, self.inst, self.rd, self.value, self.addr):
+            if n <= cap:
+                col[:n].tofile(f)
+            else:
+                col[n % cap:].tofile(f)
+                col[:n % cap].tofile(f)
+
+class TraceLog:
+    # List-like step trace: append(str) for fixed messages, add(template, arg)
+    # for parameterised ones. Iterating/indexing yields formatted strings.
+
+    __slots__ = ("_ev",)
+
+    def __init__(self):
+        self._ev: List[object] = []
+
+    def append(self, msg: str) -> None:
+        self._ev.append(msg)
+
+    def add(self, template: str, arg) -> None:
+        self._ev.append((template, arg))
+
+    @staticmethod
+    def _fmt(ev) -> str:
+        return ev if isinstance(ev, str) else ev[0].format(ev[1])
+
+    def __len__(self) -> int:
+        return len(self._ev)
+
+    def __iter__(self) -> Iterator[str]:
+        return map(self._fmt, self._ev)
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self._fmt(e) for e in self._ev[k]]
+        return self._fmt(self._ev[k])
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return f"TraceLog({list(self)!r})"
@@ -0,0 +1,200 @@
+from __future__ import annotations
+from typing import Callable, Dict, List, NamedTuple, Optional
+from decoder import CodeCache, Decoded, OPS, X0_SINK, M32, SIGN32
+from ram import MemoryFault
+
+# Basic-block translator for the host-side runner.
+# A basic block is straight-line code starting at some pc and ending at the
+# first control transfer (branch/jal/jalr). Each block is turned into Python
+# source, compiled once, and cached by entry pc. Registers live in locals for the
+# duration of the block and are written back before it returns next_pc.
+# Ops with no inline expansion (div/rem, the FP subset) call their decoder
+# handler on regs, with the block's dirty registers written back around it.
+
+MAX_BLOCK = 64
+BRANCHES = {
+    # mnemonic -> condition on locals a (rs1) and b (rs2)
+    "beq":  "{a} == {b}",
+    "bne":  "{a} != {b}",
+    "blt":  "({a} ^ SIGN32) < ({b} ^ SIGN32)",
+    "bge":  "({a} ^ SIGN32) >= ({b} ^ SIGN32)",
+    "bltu": "{a} < {b}",
+    "bgeu": "{a} >= {b}",
+}
+TERMINATORS = set(BRANCHES) | {"jal", "jalr"}
+
+# mnemonic -> right-hand side for ops that only write rd; {a}=rs1, {b}=rs2,
+# {imm}=decoded immediate, {pcimm}=pc + imm for auipc.
+EXPRS = {
+    "add":   "({a} + {b}) & M32",
+    "sub":   "({a} - {b}) & M32",
+    "sll":   "({a} << ({b} & 31)) & M32",
+    "slt":   "1 if ({a} ^ SIGN32) < ({b} ^ SIGN32) else 0",
+    "sltu":  "1 if {a} < {b} else 0",
+    "xor":   "{a} ^ {b}",
+    "srl":   "{a} >> ({b} & 31)",
+    "sra":   "((({a} ^ SIGN32) - SIGN32) >> ({b} & 31)) & M32",
+    "or":    "{a} | {b}",
+    "and":   "{a} & {b}",
+    "addi":  "({a} + {imm}) & M32",
+    "slti":  "1 if ({a} ^ SIGN32) < {imm} else 0",
+    "sltiu": "1 if {a} < {imm} else 0",
+    "xori":  "{a} ^ {imm}",
+    "ori":   "{a} | {imm}",
+    "andi":  "{a} & {imm}",
+    "slli":  "({a} << {imm}) & M32",
+    "srli":  "{a} >> {imm}",
+    "srai":  "((({a} ^ SIGN32) - SIGN32) >> {imm}) & M32",
+    "lui":   "{imm}",
+    "auipc": "{pcimm}",
+    "lb":    "((mem.read_u8(({a} + {imm}) & M32) ^ 0x80) - 0x80) & M32",
+    "lh":    "((mem.read_u16(({a} + {imm}) & M32) ^ 0x8000) - 0x8000) & M32",
+    "lw":    "mem.read_u32(({a} + {imm}) & M32)",
+    "lbu":   "mem.read_u8(({a} + {imm}) & M32)",
+    "lhu":   "mem.read_u16(({a} + {imm}) & M32)",
+    "mul":   "({a} * {b}) & M32",
+    "mulh":  "(((({a} ^ SIGN32) - SIGN32) * (({b} ^ SIGN32) - SIGN32)) >> 32) & M32",
+    "mulhsu": "(((({a} ^ SIGN32) - SIGN32) * {b}) >> 32) & M32",
+    "mulhu": "({a} * {b}) >> 32",
+}
+LOADS = {"lb", "lh", "lw", "lbu", "lhu"}
+STORES = {"sb": "mem.write_u8", "sh": "mem.write_u16", "sw": "mem.write_u32"}
+INLINE = set(EXPRS) | set(STORES) | {"fence", "fence.i"}
+
+class Block(NamedTuple):
+    fn: Optional[Callable]  # fn(regs, mem) -> next_pc; None if nothing to run
+    length: int             # instructions retired by one call
+    halt_pc: int            # pc of a trailing 'jal x0, 0', else -1
+    start: int
+    source: str
+
+def _r(i: int) -> str:
+    # Register read: x0 folds to the literal 0.
+    return "0" if i == 0 else f"x{i}"
+
+def _emit(d: Decoded, pc: int) -> List[str]:
+    # Straight-line body for one non-terminating instruction.
+    n = d.name
+    if n in STORES:
+        return [f"{STORES[n]}(({_r(d.rs1)} + {d.imm}) & M32, {_r(d.rs2)})"]
+    rhs = EXPRS.get(n)
+    if rhs is None:
+        return []  # fence / fence.i
+    if d.rd == X0_SINK:
+        if n not in LOADS:
+            return []
+        tgt = "_"  # the load still happens
+    else:
+        tgt = f"x{d.rd}"
+    rhs = rhs.format(a=_r(d.rs1), b=_r(d.rs2), imm=d.imm, pcimm=(pc + d.imm) & M32)
+    return [f"{tgt} = {rhs}"]
+
+def _emit_exit(d: Optional[Decoded], pc: int, wb: List[str]) -> List[str]:
+    # Write back dirty registers, then return next_pc.
+    n = d.name if d is not None else None
+    if n in BRANCHES:
+        tgt = (pc + d.imm) & M32
+        cond = BRANCHES[n].format(a=_r(d.rs1), b=_r(d.rs2))
+        return wb + [f"return {tgt} if {cond} else {pc + 4}"]
+    link = [] if d is None or d.rd == X0_SINK else [f"regs[{d.rd}] = {(pc + 4) & M32}"]
+    if n == "jal":
+        return wb + link + [f"return {(pc + d.imm) & M32}"]
+    if n == "jalr":
+        # target uses rs1 as it was before the link write
+        return wb + [f"_t = ({_r(d.rs1)} + {d.imm}) & 0xFFFFFFFE"] + link + ["return _t"]
+    return wb + [f"return {pc}"]
+
+def _emit_call(d: Decoded, pc: int, dirty: set) -> List[str]:
+    # Out-of-line op: store the dirty locals, run the handler on regs, then
+    # pick up an integer result.
+    out = [f"regs[{r}] = x{r}" for r in sorted(dirty)]
+    out.append(f"{d.fn.__name__}(regs, mem, {pc}, {d.rd}, {d.rs1}, {d.rs2}, {d.imm})")
+    if 0 < d.rd < X0_SINK:
+        out.append(f"x{d.rd} = regs[{d.rd}]")
+    return out
+
+def _regs_of(d: Decoded):
+    # Integer registers only: float registers are never held in locals.
+    reads = [r for r in (d.rs1, d.rs2) if 0 < r < X0_SINK]
+    write = d.rd if 0 < d.rd < X0_SINK else None
+    return reads, write
+
+def find_block(code: CodeCache, start: int) -> List[Decoded]:
+    # Collect decoded records from start pc up to and including a terminator.
+    out: List[Decoded] = []
+    pc = start
+    while len(out) < MAX_BLOCK:
+        d = code[pc]
+        if d is None or d.fn is None:
+            break
+        out.append(d)
+        if d.name in TERMINATORS:
+            break
+        pc += 4
+    return out
+
+def gen_source(block: List[Decoded], start: int) -> str:
+    body: List[str] = []
+    touched: set = set()
+    dirty: set = set()
+    pc = start
+    exit_d: Optional[Decoded] = None
+    has_mem = False
+    for k, d in enumerate(block):
+        reads, write = _regs_of(d)
+        touched.update(reads)
+        if d.name in TERMINATORS:
+            exit_d = d
+            break
+        inline = d.name in INLINE
+        if d.name in LOADS or d.name in STORES or not inline:
+            # remember how many instructions retired before a possible fault
+            body.append(f"_n = {k}")
+            has_mem = True
+        body.extend(_emit(d, pc) if inline else _emit_call(d, pc, dirty))
+        if write is not None:
+            dirty.add(write)
+        pc += 4
+    # Registers the block touches are pulled into locals on entry; the ones it
+    # wrote are stored back on exit (or on a memory fault, so the fault is
+    # precise: the caller sees state as of the faulting instruction).
+    prologue = [f"x{r} = regs[{r}]" for r in sorted(touched | dirty)]
+    wb = [f"regs[{r}] = x{r}" for r in sorted(dirty)]
+    if has_mem:
+        body = (["try:"] + ["    " + s for s in body] +
+                ["except MemoryFault as e:"] +
+                ["    " + s for s in wb] +
+                ["    e.retired = _n", "    raise"])
+    body.extend(_emit_exit(exit_d, pc, wb))
+    lines = ["def _blk(regs, mem):"] + ["    " + s for s in prologue + body]
+    return "\n".join(lines) + "\n"
+
+_NAMESPACE = {"M32": M32, "SIGN32": SIGN32, "MemoryFault": MemoryFault}
+_NAMESPACE.update((fn.__name__, fn) for _name, fn, _fmt in OPS.values())
+
+def translate(code: CodeCache, start: int) -> Block:
+    block = find_block(code, start)
+    if not block:
+        return Block(None, 0, -1, start, "")
+    src = gen_source(block, start)
+    ns: Dict[str, object] = dict(_NAMESPACE)
+    exec(compile(src, f"<block 0x{start:08X}>", "exec"), ns)
+    last = block[-1]
+    halt_pc = -1
+    if last.name == "jal" and last.rd == X0_SINK and last.imm == 0:
+        halt_pc = start + 4 * (len(block) - 1)
+    return Block(ns["_blk"], len(block), halt_pc, start, src)
+
+class BlockCache:
+    # Entry-pc -> compiled Block. Blocks are translated on first execution.
+
+    def __init__(self, code: CodeCache):
+        self.code = code
+        self.blocks: Dict[int, Block] = {}
+
+    def get(self, pc: int) -> Block:
+        b = self.blocks.get(pc)
+        if b is None:
+            b = translate(self.code, pc)
+            self.blocks[pc] = b
+        return b
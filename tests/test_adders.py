@@ -0,0 +1,83 @@
+import random
+import unittest
+import adders
+import alu
+import mdu
+from memory import Bit, BitVector
+from alu import ALU32
+from fpu import FPU32
+from gates import GateCounter
+from gatesim import GateBackend
+
+class TestAdders(unittest.TestCase):
+    def setUp(self):
+        random.seed(25)
+
+    def test_every_adder_adds(self):
+        for kind, fn in adders._ADD_FNS.items():
+            for n in (1, 2, 3, 5, 8, 24, 27, 32, 64):
+                for _ in range(50):
+                    a, b, c = random.getrandbits(n), random.getrandbits(n), random.getrandbits(1)
+                    s, carry = fn(BitVector(n, a), BitVector(n, b), Bit(c))
+                    self.assertEqual((s.value, bool(carry)), ((a + b + c) % (1 << n), a + b + c >= 1 << n),
+                                     f"{kind} {n}-bit {a:x}+{b:x}+{c}")
+
+    def test_ripple_is_the_default_and_keeps_gate_counts(self):
+        self.assertEqual(adders.selected(), adders.DEFAULT_ADDER)
+        with GateCounter([alu]) as gc:
+            ALU32().exec(BitVector(32, 5), BitVector(32, 7), "ADD")
+        self.assertEqual(gc.count, 192)
+
+    def test_select_and_use(self):
+        a, b = BitVector(32, 0xDEADBEEF), BitVector(32, 0x12345678)
+        expect = ALU32().exec(a, b, "SUB")
+        for kind in adders.ADDERS:
+            with adders.use(kind):
+                self.assertEqual(adders.selected(), kind)
+                self.assertEqual(ALU32().exec(a, b, "SUB"), expect)
+                self.assertEqual(mdu.mdu_mul("MULH", a, b)["rd_bits"], BitVector(32, 0xFDA16776))
+                self.assertEqual(FPU32().add(BitVector(32, 0x3F800000), BitVector(32, 0x40000000))["res_bits"],
+                                 BitVector(32, 0x40400000))
+        self.assertEqual(adders.selected(), "ripple")
+        with self.assertRaises(ValueError):
+            adders.select("carry-save")
+        self.assertEqual(adders.select("brent-kung"), "ripple")
+        self.assertEqual(adders.select("ripple"), "brent-kung")
+
+    def test_report(self):
+        r = {x["adder"]: x for x in adders.compare(32)}
+        self.assertEqual((r["ripple"]["gates"], r["ripple"]["depth"]), (157, 63))
+        # the prefix adders trade gates for depth
+        self.assertLess(r["kogge-stone"]["depth"], r["brent-kung"]["depth"])
+        self.assertLess(r["brent-kung"]["depth"], r["cla"]["depth"])
+        self.assertLess(r["cla"]["depth"], r["ripple"]["depth"])
+        self.assertLess(r["brent-kung"]["gates"], r["kogge-stone"]["gates"])
+        self.assertEqual(adders.report("kogge-stone", 8)["width"], 8)
+        self.assertIn("brent-kung", adders.report_text())
+
+    def test_gate_backend_adder(self):
+        ripple, ks = GateBackend(), GateBackend(adder="kogge-stone")
+        with ripple.counter:
+            expect = ripple.unit("ADD", 0xFFFFFFFF, 1)
+        with ks.counter:
+            self.assertEqual(ks.unit("ADD", 0xFFFFFFFF, 1), expect)
+        self.assertEqual(ripple.evaluated, 192)
+        self.assertGreater(ks.evaluated, ripple.evaluated)
+        self.assertEqual((ripple.report()["adder"], ks.report()["adder"]), ("ripple", "kogge-stone"))
+        self.assertEqual(adders.selected(), "ripple")
+
+    def test_multipliers_add_on_the_selected_adder(self):
+        cases = {"MUL": (0xDEADBEEF, 0x12345679), "MULH": (0xDEADBEEF, 0x12345679), "FMUL": (0x3FC00000, 0x40490FDB)}
+        gates = {}
+        for kind in ("ripple", "kogge-stone"):
+            gb = GateBackend(adder=kind)
+            with gb.counter:
+                self.assertEqual(gb.unit("MUL", *cases["MUL"])[0], 0xDEADBEEF * 0x12345679 & 0xFFFFFFFF)
+                self.assertEqual(gb.unit("MULH", *cases["MULH"])[0], 0xFDA16776)
+                gb.unit("FMUL", *cases["FMUL"])
+            gates[kind] = {op: gb.memo[(op,) + ab][2] for op, ab in cases.items()}
+        for op in cases:
+            self.assertGreater(gates["kogge-stone"][op], gates["ripple"][op], op)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,9 @@
+import random
 import unittest
+from unittest import mock
+import alu
 from memory import Bit
-from alu import ALU32, alu32
+from alu import ALU32, alu32, alu32_batch
 
 # Helpers
 def hex32_to_bits_msb(h: str):
@@ -102,4 +105,60 @@ class TestALU32(unittest.TestCase):
         out = alu32(a, b, "ADD")
         self.assertEqual(bits_to_hex32(out["result"]), "0x00000005")  # sanity
     
-    #AI-END
\ No newline at end of file
+    #AI-END
+
+
+class TestALU32Batch(unittest.TestCase):
+    OPS = ("ADD", "SUB", "AND", "OR", "XOR", "SLL", "SRL", "SRA", "NOP")
+    CORNERS = (0, 1, 2, 31, 32, 0x7FFFFFFF, 0x80000000, 0x80000001, 0xFFFFFFFE, 0xFFFFFFFF)
+
+    def _lanes(self):
+        rng = random.Random(7)
+        pairs = [(a, b) for a in self.CORNERS for b in self.CORNERS]
+        pairs += [(rng.getrandbits(32), rng.getrandbits(32)) for _ in range(100)]
+        return [a for a, _ in pairs], [b for _, b in pairs]
+
+    def _check_against_exec(self):
+        a, b = self._lanes()
+        for op in self.OPS:
+            out = alu32_batch(a, b, op)
+            for i in range(len(a)):
+                want = ALU32().exec(hex32_to_bits_msb(f"{a[i]:08X}"), hex32_to_bits_msb(f"{b[i]:08X}"), op)
+                got_flags = {k: bool(v[i]) for k, v in out["flags"].items()}
+                self.assertEqual(f"0x{int(out['result'][i]):08X}", bits_to_hex32(want["result"]), (op, a[i], b[i]))
+                self.assertEqual(got_flags, want["flags"], (op, a[i], b[i]))
+
+    def test_loop_matches_exec(self):
+        with mock.patch.object(alu, "np", None):
+            self._check_against_exec()
+
+    @unittest.skipIf(alu.np is None, "numpy not installed")
+    def test_numpy_matches_exec(self):
+        self._check_against_exec()
+
+    def test_scalar_operand_broadcasts(self):
+        out = alu32_batch([1, 2, 0xFFFFFFFF], 1, "add")
+        self.assertEqual([int(x) for x in out["result"]], [2, 3, 0])
+        self.assertEqual([bool(x) for x in out["flags"]["C"]], [False, False, True])
+
+    @unittest.skipIf(alu.np is None, "numpy not installed")
+    def test_numpy_matches_loop(self):
+        # operands outside uint32 wrap the same way on both backends
+        wide = [-1, -0x80000000, 1 << 32, (1 << 32) + 5, (1 << 64) + 3, -(1 << 70)]
+        a, b = self._lanes()
+        a, b = a + wide + [7] * len(wide), b + [3] * len(wide) + wide
+        for op in self.OPS:
+            for x, y in ((a, b), (a, 1), (-1, b), (-1, 1 << 32)):
+                got = alu32_batch(x, y, op)
+                with mock.patch.object(alu, "np", None):
+                    want = alu32_batch(x, y, op)
+                self.assertEqual(alu.np.asarray(got["result"]).tolist(), want["result"], op)
+                for k, v in want["flags"].items():
+                    self.assertEqual(alu.np.asarray(got["flags"][k]).tolist(), v, (op, k))
+
+    def test_two_scalars_give_a_scalar(self):
+        with mock.patch.object(alu, "np", None):
+            out = alu32_batch(5, 7, "ADD")
+            self.assertEqual(out, {"result": 12, "flags": {"N": False, "Z": False, "C": False, "V": False}})
+            out = alu32_batch(0xFFFFFFFF, 1, "ADD")
+            self.assertEqual((out["result"], out["flags"]["Z"], out["flags"]["C"]), (0, True, True))
@@ -0,0 +1,84 @@
+import io
+import json
+import os
+import struct
+import tempfile
+import unittest
+from unittest import mock
+from batch import run_batch, run_one, collect_images, write_jsonl
+from ram import FlatMemory, MemoryFault, PagedMemory, digest
+from runner import run_hex
+from test_runner import count_loop, SAMPLE
+from test_elf import build_elf
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.paths = []
+        for n in (1, 5, 9, 20):
+            path = os.path.join(self.dir.name, f"loop{n:02d}.hex")
+            with open(path, "w") as f:
+                f.write("\n".join(f"{w & 0xFFFFFFFF:08X}" for w in count_loop(n)))
+            self.paths.append(path)
+
+    def test_directory_and_manifest(self):
+        self.assertEqual(collect_images(self.dir.name), self.paths)
+        manifest = os.path.join(self.dir.name, "list.txt")
+        with open(manifest, "w") as f:
+            f.write("# nightly\nloop05.hex\n\n" + self.paths[0] + "  # absolute\n")
+        self.assertEqual(collect_images(manifest), [self.paths[1], self.paths[0]])
+
+    def test_pool_matches_inline(self):
+        inline = list(run_batch(self.paths, max_steps=500, jobs=1))
+        pooled = list(run_batch(self.paths, max_steps=500, jobs=2, chunk=1))
+        self.assertEqual(inline, pooled)
+        self.assertEqual([r["regs"][1] for r in inline], [1, 5, 9, 20])
+        unordered = list(run_batch(self.paths, max_steps=500, jobs=2, chunk=1, ordered=False))
+        self.assertEqual(sorted(r["path"] for r in unordered), self.paths)
+
+    def test_record_fields_and_errors(self):
+        rec = run_one(SAMPLE, max_steps=200)
+        out = run_hex(SAMPLE, max_steps=200)
+        self.assertEqual((rec["pc"], rec["steps"], rec["halt"]), (out["pc"], out["steps"], out["halt"]))
+        self.assertEqual(rec["mem"], digest(out["mem"]))
+        missing = run_one(os.path.join(self.dir.name, "nope.hex"))
+        self.assertIn("error", missing)
+        truncated = os.path.join(self.dir.name, "short.elf")
+        with open(truncated, "wb") as f:
+            f.write(build_elf([0])[:28] + struct.pack("<I", 0x1000) + build_elf([0])[32:52])
+        self.assertIn("past end of file", run_one(truncated)["error"])
+        buf = io.StringIO()
+        self.assertEqual(write_jsonl([rec, missing], buf), 2)
+        self.assertEqual(json.loads(buf.getvalue().splitlines()[0]), rec)
+
+    def test_bad_image_does_not_stop_the_batch(self):
+        blob = bytearray(build_elf([0], data=b"\x01"))
+        blob[84 + 8:84 + 12] = struct.pack("<I", 0xFFFFFFF0)    # data segment vaddr
+        blob[84 + 20:84 + 24] = struct.pack("<I", 0x104)        # and memsz
+        oversized = os.path.join(self.dir.name, "big.elf")
+        with open(oversized, "wb") as f:
+            f.write(blob)
+        paths = [self.paths[0], oversized, self.paths[1]]
+        for jobs in (1, 2):
+            recs = list(run_batch(paths, max_steps=500, jobs=jobs, chunk=3))
+            self.assertEqual([r["path"] for r in recs], paths)
+            self.assertIn("does not fit in memory", recs[1]["error"])
+            self.assertEqual([recs[0]["regs"][1], recs[2]["regs"][1]], [1, 5])
+        # a fault while loading is that image's error, not the batch's
+        with mock.patch("batch.run_elf", side_effect=MemoryFault(0xFFFFFFF0, 0x104)):
+            self.assertIn("MemoryFault: memory fault at 0xFFFFFFF0", run_one(oversized)["error"])
+
+class TestDigest(unittest.TestCase):
+    def test_backend_independent(self):
+        a, b = FlatMemory(1 << 16), PagedMemory()
+        self.assertEqual(digest(a), digest(b))
+        a.write_u32(0x1234, 5)
+        b.write_u32(0x1234, 5)
+        b.write_u32(0x8000, 0)   # resident but zero
+        self.assertEqual(digest(a), digest(b))
+        b.write_u8(0x8000, 1)
+        self.assertNotEqual(digest(a), digest(b))
+
+if __name__ == "__main__":
+    unittest.main()
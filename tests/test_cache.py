@@ -0,0 +1,128 @@
+import random
+import unittest
+import cache
+from cache import Cache, L1, parse_cache_spec, sweep, trace_streams
+from runner import run_hex
+from tracebuf import TraceBuffer
+from test_runner import HexProgramCase, SAMPLE, count_loop
+
+def random_trace(n, seed=0):
+    r = random.Random(seed)
+    addrs, writes = [], []
+    for i in range(n):
+        addrs.append(r.randrange(1 << 12) * 4 if r.random() < 0.4 else (i * 4) & 0x3FFF)
+        writes.append(1 if r.random() < 0.25 else 0)
+    return addrs, writes
+
+def counts(c):
+    return (c.hits, c.misses, c.evictions, c.writebacks)
+
+class TestCache(unittest.TestCase):
+    def test_geometry_checks(self):
+        c = Cache(1024, 2, 16)
+        self.assertEqual(c.sets, 32)
+        for bad in ((1000, 2, 16), (1024, 3, 16), (1024, 2, 24)):
+            with self.assertRaises(ValueError):
+                Cache(*bad)
+        with self.assertRaises(ValueError):
+            Cache(policy="fifo")
+        with self.assertRaises(ValueError):
+            Cache(128 * 16, 128, 16, "plru")
+
+    def test_lru_evicts_least_recent(self):
+        c = Cache(2 * 16, 2, 16)                  # one set, two ways
+        a, b, d = 0x000, 0x100, 0x200
+        self.assertEqual([c.access(x) for x in (a, b, a, d, a, b)],
+                         [False, False, True, False, True, False])
+        self.assertEqual((c.misses, c.evictions), (4, 2))
+
+    def test_plru_keeps_most_recent_line(self):
+        c = Cache(4 * 16, 4, 16, "plru")
+        lines = [0x40 * k for k in range(4)]
+        for x in lines:
+            c.access(x)
+        r = random.Random(3)
+        for _ in range(200):
+            x = r.choice(lines + [0x1000, 0x2000])
+            c.access(x)
+            self.assertTrue(c.access(x))
+        wide = Cache(64 * 16, 64, 16, "plru")       # tree bits up to 63
+        for x in r.choices(range(0, 0x4000, 0x10), k=500):
+            wide.access(x)
+            self.assertTrue(wide.access(x))
+        self.assertGreater(wide.evictions, 0)
+        two_way = [Cache(2 * 16, 2, 16, p) for p in ("lru", "plru")]
+        addrs, _ = random_trace(500)
+        for c in two_way:
+            for x in addrs:
+                c.access(x & 0x3F0)
+        self.assertEqual(counts(two_way[0]), counts(two_way[1]))
+
+    def test_dirty_lines_are_written_back(self):
+        c = Cache(16, 1, 16)
+        c.access(0x0, write=True)
+        c.access(0x10)
+        c.access(0x0)
+        self.assertEqual((c.evictions, c.writebacks), (2, 1))
+
+    def test_random_policy_is_seeded(self):
+        addrs, writes = random_trace(2000)
+        a, b = Cache(1024, 4, 16, "random", seed=7), Cache(1024, 4, 16, "random", seed=7)
+        for c in (a, b):
+            for x, w in zip(addrs, writes):
+                c.access(x, w)
+        self.assertEqual(counts(a), counts(b))
+
+    def test_replay_matches_access_by_access(self):
+        addrs, writes = random_trace(5000)
+        for policy in ("lru", "plru"):
+            one = Cache(2048, 4, 32, policy)
+            for x, w in zip(addrs, writes):
+                one.access(x, w)
+            bulk = Cache(2048, 4, 32, policy)
+            bulk.replay(addrs, writes)
+            self.assertEqual(counts(bulk), counts(one))
+
+    @unittest.skipIf(cache.np is None, "numpy not installed")
+    def test_sweep_with_numpy(self):
+        addrs, writes = random_trace(5000)
+        cfgs = [(1024, 1, 16, "lru"), (4096, 4, 32, "plru")]
+        got = sweep(cache.np.array(addrs), cfgs, writes)
+        for cfg, r in zip(cfgs, got):
+            c = Cache(*cfg)
+            for x, w in zip(addrs, writes):
+                c.access(x, w)
+            self.assertEqual(r, c.report())
+
+    def test_parse_spec(self):
+        c = parse_cache_spec("8k:2:32:plru", "L1D")
+        self.assertEqual((c.size, c.ways, c.line, c.policy), (8192, 2, 32, "plru"))
+        self.assertEqual(c.describe(), "L1D 8KiB 2-way 32B plru")
+        with self.assertRaises(ValueError):
+            parse_cache_spec("8k:2")
+
+class TestInlineCaches(HexProgramCase):
+    def test_counts_every_fetch_and_data_access(self):
+        l1 = L1(Cache(256, 2, 16, name="L1I"), Cache(256, 2, 16, name="L1D"))
+        out = run_hex(SAMPLE, caches=l1)
+        plain = run_hex(SAMPLE)
+        self.assertEqual((out["regs"], out["pc"], out["steps"]), (plain["regs"], plain["pc"], plain["steps"]))
+        self.assertEqual(l1.icache.accesses, out["steps"])
+        self.assertEqual(l1.dcache.accesses, 2)        # one sw, one lw
+        self.assertIn("L1D", l1.report_text())
+
+    def test_inline_matches_trace_replay(self):
+        path = self.hexfile(count_loop(100))
+        l1 = L1(Cache(64, 2, 16, "plru"), None)
+        run_hex(path, max_steps=10_000, caches=l1)
+        tb = TraceBuffer()
+        run_hex(path, max_steps=10_000, trace=tb)
+        fetch, _data, _writes = trace_streams(tb)
+        c = Cache(64, 2, 16, "plru")
+        c.replay(fetch)
+        self.assertEqual(counts(c), counts(l1.icache))
+
+    def test_exclusive_with_timing(self):
+        from timing import PipelineTiming
+        with self.assertRaises(ValueError):
+            run_hex(SAMPLE, timing=PipelineTiming(), caches=L1(Cache()))
@@ -0,0 +1,148 @@
+import os
+import struct
+import tempfile
+import unittest
+from elf import ElfImage, load_elf
+from ram import FlatMemory, PagedMemory, PAGE_SIZE
+from runner import run_elf
+from test_runner import enc_i, enc_s, enc_u, enc_j
+
+TEXT = 0x00010000
+DATA = 0x00020000
+
+def build_elf(text, data=b"", bss=0, symbols=(), entry=TEXT):
+    # Minimal ELF32 RISC-V executable: one R+X segment for text (file offset
+    # 0x1000, page aligned like a real linker), one RW segment for data + bss,
+    # and a .symtab/.strtab pair.
+    text = b"".join(struct.pack("<I", w) for w in text)
+    text_off = 0x1000
+    data_off = text_off + ((len(text) + 0xFFF) & ~0xFFF)
+    strtab = b"\0"
+    syms = [b"\0" * 16]
+    for name, value in symbols:
+        syms.append(struct.pack("<IIIBBH", len(strtab), value, 0, 0x12, 0, 1))
+        strtab += name.encode() + b"\0"
+    symtab = b"".join(syms)
+    sym_off = data_off + len(data)
+    str_off = sym_off + len(symtab)
+    sh_off = (str_off + len(strtab) + 3) & ~3
+    shdrs = [b"\0" * 40,
+             struct.pack("<10I", 0, 2, 0, 0, sym_off, len(symtab), 2, 1, 4, 16),
+             struct.pack("<10I", 0, 3, 0, 0, str_off, len(strtab), 0, 0, 1, 0)]
+    phdrs = [struct.pack("<8I", 1, text_off, TEXT, TEXT, len(text), len(text), 5, 0x1000),
+             struct.pack("<8I", 1, data_off, DATA, DATA, len(data), len(data) + bss, 6, 0x1000)]
+    ehdr = struct.pack("<16sHHIIIIIHHHHHH", b"\x7fELF\x01\x01\x01" + b"\0" * 9,
+                       2, 243, 1, entry, 52, sh_off, 0, 52, 32, 2, 40, 3, 0)
+    img = bytearray(sh_off + 40 * len(shdrs))
+    img[0:52] = ehdr
+    img[52:52 + 64] = b"".join(phdrs)
+    img[text_off:text_off + len(text)] = text
+    img[data_off:data_off + len(data)] = data
+    img[sym_off:sym_off + len(symtab)] = symtab
+    img[str_off:str_off + len(strtab)] = strtab
+    img[sh_off:] = b"".join(shdrs)
+    return bytes(img)
+
+class ElfCase(unittest.TestCase):
+    def elffile(self, blob):
+        fd, path = tempfile.mkstemp(suffix=".elf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+        self.addCleanup(os.remove, path)
+        return path
+
+class TestElfImage(ElfCase):
+    def test_header_segments_and_symbols(self):
+        path = self.elffile(build_elf([enc_j(0, 0)], data=b"abcd", bss=8,
+                                      symbols=[("_start", TEXT), ("buf", DATA + 4)]))
+        img = ElfImage(path)
+        self.assertEqual(img.entry, TEXT)
+        self.assertEqual([(s.vaddr, s.filesz, s.memsz) for s in img.segments],
+                         [(TEXT, 4, 4), (DATA, 4, 12)])
+        self.assertEqual(img.exec_ranges(), [(TEXT, TEXT + 4)])
+        self.assertEqual(img.symbols["buf"].value, DATA + 4)
+        self.assertEqual(img.symbol_at(TEXT + 2), "_start")
+        self.assertIsNone(img.symbol_at(TEXT - 1))
+
+    def test_rejects_non_riscv(self):
+        blob = bytearray(build_elf([0]))
+        blob[18:20] = struct.pack("<H", 62)   # x86-64
+        with self.assertRaises(ValueError):
+            ElfImage(self.elffile(bytes(blob)))
+
+    def test_truncated_header_tables(self):
+        # a valid 52-byte header whose tables lie past the end of the file
+        ehdr = bytearray(build_elf([0])[:52])
+        ehdr[28:32] = struct.pack("<I", 0x1000)   # e_phoff
+        with self.assertRaisesRegex(ValueError, "program header table"):
+            ElfImage(self.elffile(bytes(ehdr)))
+        blob = bytearray(build_elf([0]))
+        blob[32:36] = struct.pack("<I", len(blob) - 8)   # e_shoff
+        with self.assertRaisesRegex(ValueError, "section header table"):
+            ElfImage(self.elffile(bytes(blob)))
+
+    def test_segment_placement_is_checked(self):
+        def data_phdr(vaddr, filesz, memsz):
+            blob = bytearray(build_elf([0], data=b"\x01\x02"))
+            blob[84 + 8:84 + 12] = struct.pack("<I", vaddr)
+            blob[84 + 16:84 + 24] = struct.pack("<II", filesz, memsz)
+            return self.elffile(bytes(blob))
+        with self.assertRaisesRegex(ValueError, "does not fit in memory"):
+            ElfImage(data_phdr(0xFFFFFFF0, 2, 0x104))
+        with self.assertRaisesRegex(ValueError, "memsz < filesz"):
+            ElfImage(data_phdr(DATA, 2, 1))
+        # fits in 32 bits, but not in this memory
+        path = data_phdr(0x3FFF0, 2, 0x20)
+        with self.assertRaisesRegex(ValueError, "does not fit in memory"):
+            load_elf(path, FlatMemory(1 << 18))
+        load_elf(path, PagedMemory())
+
+    def test_whole_pages_alias_the_file_copy_on_write(self):
+        text = [enc_i(k, 0, 0, 1) for k in range(PAGE_SIZE // 4 + 3)]
+        path = self.elffile(build_elf(text))
+        mem = PagedMemory()
+        load_elf(path, mem)
+        self.assertEqual(mem.read_u32(TEXT + 4 * 5), text[5])
+        self.assertEqual(mem.read_u32(TEXT + PAGE_SIZE + 8), text[-1])
+        self.assertIsInstance(mem.pages[TEXT >> 12][0], memoryview)  # shared, not copied
+        mem.write_u32(TEXT, 0xDEADBEEF)
+        self.assertEqual(mem.read_u32(TEXT), 0xDEADBEEF)
+        with open(path, "rb") as f:
+            f.seek(0x1000)
+            self.assertEqual(struct.unpack("<I", f.read(4))[0], text[0])
+
+    def test_bss_is_cleared_in_flat_memory(self):
+        path = self.elffile(build_elf([enc_j(0, 0)], data=b"\x01\x02", bss=6))
+        mem = FlatMemory(1 << 18)
+        mem.write_u32(DATA + 4, 0xFFFFFFFF)
+        load_elf(path, mem)
+        self.assertEqual(mem.read(DATA, 8), b"\x01\x02" + bytes(6))
+
+class TestRunElf(ElfCase):
+    def test_runs_from_entry_with_stack_and_data(self):
+        text = [
+            enc_j(8, 0),                   # _start: skip a word
+            enc_j(0, 0),
+            enc_u(DATA >> 12, 5),          # lui  x5, DATA
+            enc_i(0, 5, 2, 6, op=0x03),    # lw   x6, 0(x5)
+            enc_i(1, 6, 0, 6),             # addi x6, x6, 1
+            enc_s(-4, 6, 2, 2),            # sw   x6, -4(sp)
+            enc_i(-4, 2, 2, 7, op=0x03),   # lw   x7, -4(sp)
+            enc_j(0, 0),                   # halt
+        ]
+        path = self.elffile(build_elf(text, data=struct.pack("<I", 41),
+                                      symbols=[("_start", TEXT), ("__global_pointer$", DATA + 0x800)]))
+        for mode in ("interp", "block"):
+            out = run_elf(path, max_steps=100, mode=mode)
+            self.assertEqual(out["halt"], "self-loop")
+            self.assertEqual(out["pc"], TEXT + 28)
+            self.assertEqual(out["regs"][7], 42)
+            self.assertEqual(out["regs"][3], DATA + 0x800)
+
+    def test_fetch_outside_text_stops(self):
+        path = self.elffile(build_elf([enc_j(0x100, 0)]))
+        out = run_elf(path, max_steps=10)
+        self.assertEqual((out["halt"], out["pc"]), ("pc out of range", TEXT + 0x100))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from runner import run_hex
+from gatesim import GateBackend
+from test_runner import HexProgramCase, SAMPLE, count_loop, enc_i, enc_r, enc_b, enc_j
+from test_lockstep import alu_program
+
+HALT = enc_j(0, 0)
+
+def compare_program():
+    # slt/sltu/branches against b == 0, where the ALU32 SUB carry is off
+    return [enc_i(-5, 0, 0, 1),             # addi x1, x0, -5
+            enc_r(0x00, 0, 1, 3, 2),        # sltu x2, x1, x0
+            enc_r(0x00, 0, 1, 2, 3),        # slt  x3, x1, x0
+            enc_i(0, 1, 3, 4),              # sltiu x4, x1, 0
+            enc_i(1, 0, 3, 5),              # sltiu x5, x0, 1
+            enc_b(8, 0, 1, 6),              # bltu x1, x0, +8 (not taken)
+            enc_i(1, 0, 0, 6),              # addi x6, x0, 1
+            enc_b(8, 0, 1, 7),              # bgeu x1, x0, +8 (taken)
+            enc_i(1, 0, 0, 7),              # addi x7, x0, 1 (skipped)
+            HALT]
+
+class TestGateMode(HexProgramCase):
+    def assertSameAsInterp(self, path, max_steps=1000):
+        out = run_hex(path, max_steps=max_steps, mode="gate")
+        plain = run_hex(path, max_steps=max_steps)
+        for k in ("regs", "pc", "steps", "halt"):
+            self.assertEqual(out[k], plain[k], k)
+        return out
+
+    def test_sample_and_alu_program_match_interp(self):
+        out = self.assertSameAsInterp(SAMPLE)
+        self.assertEqual(out["mem"].read_u32(0x00010000), run_hex(SAMPLE)["mem"].read_u32(0x00010000))
+        out = self.assertSameAsInterp(self.hexfile(alu_program()))
+        ops = out["gates"].report()["ops"]
+        for name in ("add", "sub", "mul", "div", "remu"):
+            self.assertGreater(ops[name]["per_insn"], 0)
+        self.assertEqual((ops["srai"]["gates"], ops["sll"]["gates"]), (0, 0))   # the shifter is wiring
+
+    def test_compares_against_zero(self):
+        out = self.assertSameAsInterp(self.hexfile(compare_program()))
+        self.assertEqual(out["regs"][2:8], [0, 1, 0, 1, 1, 0])
+
+    def test_loops_hit_the_memo(self):
+        out = self.assertSameAsInterp(self.hexfile(count_loop(50)))
+        gb = out["gates"]
+        r = gb.report()
+        self.assertGreater(r["memo_hit_rate"], 0.3)
+        self.assertLess(r["gates_evaluated"], r["gates_modelled"])
+        self.assertEqual(r["instructions"], out["steps"])
+
+    def test_memo_is_bounded(self):
+        gb = GateBackend(memo_size=2)
+        with gb.counter:
+            for a in range(5):
+                self.assertEqual(gb.unit("ADD", a, 7)[0], a + 7)
+            self.assertEqual(gb.unit("ADD", 4, 7)[0], 11)
+        self.assertLessEqual(len(gb.memo), 2)
+        self.assertEqual((gb.memo_misses, gb.memo_hits), (5, 1))
+        self.assertEqual(gb.evaluated, 5 * 192)
+
+    def test_not_combined_with_other_modes(self):
+        with self.assertRaises(ValueError):
+            run_hex(SAMPLE, mode="gate", trace=True)
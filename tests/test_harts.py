@@ -0,0 +1,101 @@
+import unittest
+from harts import MultiHart, HALT_ALL
+from ram import FlatMemory
+from test_runner import HexProgramCase, enc_i, enc_s, enc_u, enc_b, enc_j
+
+HALT = enc_j(0, 0)
+
+def handshake():
+    # hart 0 stores 42 at 0x10000; hart 1 waits for it, stores 43 at 0x10004
+    return [enc_b(20, 0, 10, 1),            # 0: bne a0, x0, hart1
+            enc_u(0x10, 5),                 # 4: lui x5, 0x10
+            enc_i(42, 0, 0, 6),             # 8: addi x6, x0, 42
+            enc_s(0, 6, 5, 2),              # 12: sw x6, 0(x5)
+            HALT,                           # 16
+            enc_u(0x10, 5),                 # 20: hart1: lui x5, 0x10
+            enc_i(0, 5, 2, 7, 0x03),        # 24: lw x7, 0(x5)
+            enc_b(-4, 0, 7),                # 28: beq x7, x0, 24
+            enc_i(1, 7, 0, 7),              # 32: addi x7, x7, 1
+            enc_s(4, 7, 5, 2),              # 36: sw x7, 4(x5)
+            HALT]                           # 40
+
+def deadlock():
+    # both harts wait for a word nobody writes
+    return [enc_u(0x10, 5), enc_i(0, 5, 2, 7, 0x03), enc_b(-4, 0, 7), HALT]
+
+def ping_pong():
+    # the harts take turns at a flag (0x10000 = whose turn) and bump a shared
+    # counter at 0x10004; each waits at the same pc with the same registers
+    # every time, but stores in between
+    return [enc_u(0x10, 5),                 # 0: lui x5, 0x10
+            enc_i(1, 10, 4, 7),             # 4: xori x7, a0, 1
+            enc_i(0, 5, 2, 6, 0x03),        # 8: L: lw x6, 0(x5)
+            enc_b(-4, 10, 6, 1),            # 12: bne x6, a0, L
+            enc_i(4, 5, 2, 6, 0x03),        # 16: lw x6, 4(x5)
+            enc_i(1, 6, 0, 6),              # 20: addi x6, x6, 1
+            enc_s(4, 6, 5, 2),              # 24: sw x6, 4(x5)
+            enc_s(0, 7, 5, 2),              # 28: sw x7, 0(x5)
+            enc_j(-24, 0)]                  # 32: jal x0, L
+
+class TestRoundRobin(HexProgramCase):
+    def test_handshake_through_shared_memory(self):
+        for quantum in (1, 3, 1000):
+            mh = MultiHart.from_hex(self.hexfile(handshake()), harts=2, quantum=quantum)
+            self.assertEqual(mh.run(10_000), HALT_ALL)
+            self.assertEqual(mh.mem.read_u32(0x10004), 43)
+            r = mh.result()
+            self.assertEqual([h["halt"] for h in r["harts"]], ["self-loop", "self-loop"])
+            self.assertEqual([h["pc"] for h in r["harts"]], [16, 40])
+            self.assertEqual(r["harts"][1]["regs"][10], 1)          # a0 = hart id
+
+    def test_waiting_hart_yields_instead_of_spinning(self):
+        # swap the roles: hart 0 now waits for hart 1 and runs first, but its
+        # slice ends as soon as the wait loop goes idle
+        prog = handshake()
+        prog[0] = enc_b(20, 0, 10, 0)               # beq a0, x0, waiter
+        mh = MultiHart.from_hex(self.hexfile(prog), harts=2, quantum=1000)
+        self.assertEqual(mh.run(10_000), HALT_ALL)
+        self.assertEqual(mh.mem.read_u32(0x10004), 43)
+        self.assertLess(mh.harts[0].steps, 20)
+
+    def test_deadlock_is_idle(self):
+        mh = MultiHart.from_hex(self.hexfile(deadlock()), harts=3, quantum=50)
+        self.assertEqual(mh.run(100_000), "idle loop")
+        self.assertLess(mh.steps, 100)
+
+    def test_taking_turns_is_not_idle(self):
+        mh = MultiHart.from_hex(self.hexfile(ping_pong()), harts=2, quantum=1000)
+        self.assertEqual(mh.run(5000), "max_steps")
+        self.assertEqual(mh.steps, 10_000)
+        self.assertGreater(mh.mem.read_u32(0x10004), 500)
+
+    def test_budget_is_per_hart(self):
+        loop = [enc_i(1, 1, 0, 1), enc_j(-4, 0)]
+        mh = MultiHart.from_hex(self.hexfile(loop), harts=2, quantum=7)
+        self.assertEqual(mh.run(100), "max_steps")
+        self.assertEqual([h.steps for h in mh.harts], [100, 100])
+        self.assertEqual(mh.run(10), "max_steps")           # resumes
+        self.assertEqual(mh.harts[0].regs[1], 55)
+        with self.assertRaises(ValueError):
+            MultiHart.from_hex(self.hexfile(loop), harts=0)
+
+class TestParallel(HexProgramCase):
+    def test_handshake_across_processes(self):
+        mh = MultiHart.from_hex(self.hexfile(handshake()), harts=2, mem=FlatMemory(1 << 20))
+        self.assertEqual(mh.run_parallel(1_000_000), HALT_ALL)
+        self.assertEqual(mh.mem.read_u32(0x10004), 43)
+        self.assertEqual([h.pc for h in mh.harts], [16, 40])
+
+    def test_deadlock_ends_when_nobody_can_write(self):
+        mh = MultiHart.from_hex(self.hexfile(deadlock()), harts=2, mem=FlatMemory(1 << 20))
+        self.assertEqual(mh.run_parallel(10_000_000), "idle loop")
+
+    def test_taking_turns_is_not_idle(self):
+        mh = MultiHart.from_hex(self.hexfile(ping_pong()), harts=2, mem=FlatMemory(1 << 20))
+        self.assertEqual(mh.run_parallel(20_000), "max_steps")
+        self.assertGreater(mh.mem.read_u32(0x10004), 0)
+
+    def test_needs_flat_memory(self):
+        mh = MultiHart.from_hex(self.hexfile(handshake()), harts=2)
+        with self.assertRaises(ValueError):
+            mh.run_parallel()
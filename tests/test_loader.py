@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+from array import array
+from loader import (hex_line_to_u32, hex_line_to_bits32, iter_hex_words,
+                    load_hex_words, load_hex_file)
+
+def write_text(text):
+    fd, path = tempfile.mkstemp(suffix=".hex")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    return path
+
+class TestHexLine(unittest.TestCase):
+    def test_line_forms(self):
+        self.assertEqual(hex_line_to_u32("00A00113"), 0x00A00113)
+        self.assertEqual(hex_line_to_u32("  0xdeadBEEF \n"), 0xDEADBEEF)
+        self.assertEqual(hex_line_to_u32("1f"), 0x1F)
+        self.assertEqual(hex_line_to_u32("123456789A"), 0x3456789A)  # low 8 digits
+        self.assertIsNone(hex_line_to_u32("   "))
+        self.assertIsNone(hex_line_to_u32("DEAD BEEF"))
+        self.assertIsNone(hex_line_to_u32("nothex00"))
+
+    def test_bits_view_matches_int(self):
+        bits = hex_line_to_bits32("80000001")
+        self.assertEqual(len(bits), 32)
+        self.assertTrue(bits[0] and bits[31])
+        self.assertFalse(any(bits[1:31]))
+        self.assertEqual(hex_line_to_bits32("xyz"), ())
+
+class TestHexFile(unittest.TestCase):
+    def hexfile(self, text):
+        path = write_text(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_clean_and_messy_files_agree(self):
+        words = [0x00500093, 0xDEADBEEF, 0, 0xFFFFFFFF]
+        clean = self.hexfile("\n".join(f"{w:08X}" for w in words) + "\n")
+        messy = self.hexfile("0x00500093\r\n\n deadbeef\n0\nbad line\nFFFFFFFF")
+        self.assertEqual(list(load_hex_words(clean)), words)
+        self.assertEqual(list(load_hex_words(messy)), words)
+        self.assertIsInstance(load_hex_words(clean), array)
+        self.assertEqual(len(load_hex_file(messy)), 4)
+
+    def test_streaming_reader_yields_chunks(self):
+        words = list(range(0, 5000 * 7, 7))
+        path = self.hexfile("".join(f"{w:08X}\n" for w in words))
+        chunks = list(iter_hex_words(path, chunk_bytes=4096))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual([w for c in chunks for w in c], words)
+
+if __name__ == "__main__":
+    unittest.main()
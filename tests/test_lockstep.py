@@ -0,0 +1,91 @@
+import unittest
+from runner import run_hex, run_program, load_hex_program
+from ram import PagedMemory
+from lockstep import Lockstep, REFERENCE, to_bits, from_bits
+from decoder import decode
+from test_runner import HexProgramCase, SAMPLE, count_loop, enc_i, enc_r, enc_j
+
+HALT = enc_j(0, 0)
+
+def mdu(f3, rd, rs1, rs2):
+    return enc_r(0x01, rs2, rs1, f3, rd)
+
+def alu_program():
+    # a bit of everything with a reference: alu, shifts, mul/div
+    return [enc_i(-7, 0, 0, 1),             # addi x1, x0, -7
+            enc_i(300, 0, 0, 2),            # addi x2, x0, 300
+            enc_r(0x00, 2, 1, 0, 3),        # add  x3, x1, x2
+            enc_r(0x20, 2, 1, 0, 4),        # sub  x4, x1, x2
+            enc_i(0x5A5, 3, 4, 5),          # xori x5, x3, 0x5A5
+            enc_i(0x403, 1, 5, 6),          # srai x6, x1, 3
+            enc_r(0x00, 2, 4, 1, 7),        # sll  x7, x4, x2
+            mdu(0, 8, 1, 2),                # mul  x8
+            mdu(1, 9, 1, 2),                # mulh x9
+            mdu(4, 10, 2, 1),               # div  x10
+            mdu(7, 11, 1, 2),               # remu x11
+            HALT]
+
+class TestLockstep(HexProgramCase):
+    def test_bits_round_trip(self):
+        for v in (0, 1, 0x80000000, 0xDEADBEEF, 0xFFFFFFFF):
+            self.assertEqual(from_bits(to_bits(v)), v)
+
+    def test_every_reference_agrees_on_a_program(self):
+        path = self.hexfile(alu_program())
+        ls = Lockstep()
+        out = run_hex(path, lockstep=ls)
+        plain = run_hex(path)
+        self.assertEqual((out["regs"], out["steps"]), (plain["regs"], plain["steps"]))
+        self.assertEqual(ls.divergence_count, 0)
+        self.assertEqual(ls.checked, {"alu": 5, "shift": 2, "mdu": 4})
+
+    def test_one_in_n_and_op_filter(self):
+        path = self.hexfile(count_loop(30))
+        ls = Lockstep(every=4)
+        run_hex(path, max_steps=1000, lockstep=ls)
+        self.assertEqual(ls.candidates, 32)             # two setup addis + 30 increments
+        self.assertEqual(ls.checked["alu"], 8)
+        ls = Lockstep(ops=["mul", "div"])
+        run_hex(path, max_steps=1000, lockstep=ls)
+        self.assertEqual((ls.candidates, ls.checked), (0, {}))
+        with self.assertRaises(ValueError):
+            Lockstep(ops=["lw"])
+        with self.assertRaises(ValueError):
+            Lockstep(every=0)
+
+    def test_sampling_continues_across_runs(self):
+        path = self.hexfile(count_loop(30))
+        ls = Lockstep(every=4)
+        code, regs, pc = load_hex_program(path, PagedMemory())
+        mem = code.mem
+        for _ in range(5):
+            out = run_program(code, regs, mem, pc, 7, lockstep=ls)
+            pc = out["pc"]
+        self.assertEqual(ls.seq, 35)
+        self.assertEqual(ls.checked["alu"], (ls.candidates + 3) // 4)   # first candidate is checked
+
+    def corrupted(self, stop):
+        # Swap the fast handler of the 'add' at pc 8 for sub's: lockstep must notice.
+        code, regs, pc = load_hex_program(self.hexfile(alu_program()), PagedMemory())
+        code[8] = code[8]._replace(fn=decode(enc_r(0x20, 2, 1, 0, 3)).fn)
+        ls = Lockstep(stop_on_divergence=stop)
+        return run_program(code, regs, code.mem, pc, lockstep=ls), ls
+
+    def test_divergence_is_reported(self):
+        out, ls = self.corrupted(stop=False)
+        self.assertEqual(out["halt"], "self-loop")
+        self.assertEqual(ls.divergence_count, 1)
+        dv = ls.divergences[0]
+        self.assertEqual((dv.seq, dv.pc, dv.name), (2, 8, "add"))
+        self.assertEqual((dv.fast, dv.reference), ((-307) & 0xFFFFFFFF, 293))
+        self.assertIn("add a=0xFFFFFFF9 b=0x0000012C", ls.report_text())
+
+    def test_stop_on_divergence(self):
+        out, ls = self.corrupted(stop=True)
+        self.assertEqual((out["halt"], out["pc"], out["steps"]), ("divergence", 12, 3))
+
+    def test_references_cover_units(self):
+        units = {unit for unit, _ref in REFERENCE.values()}
+        self.assertEqual(units, {"alu", "shift", "mdu", "fpu"})
+        with self.assertRaises(ValueError):
+            run_hex(SAMPLE, trace=True, lockstep=Lockstep())
@@ -0,0 +1,132 @@
+import copy
+import pickle
+import unittest
+import alu
+import gates as g
+import mdu
+from memory import (Bit, BitVector, bits_from_u32, u32_from_bits, concat, zero_extend,
+                    sign_extend, slice_bits, not_bits, and_bits, or_bits, xor_bits,
+                    or_reduce, and_reduce, msb, lsb)
+from alu import ALU32
+from mdu import mdu_mul, mdu_div
+from fpu import FPU32
+from gates import GateCounter
+
+def _tuple(v: int, width: int = 32):
+    return tuple(Bit(bool((v >> i) & 1)) for i in range(width - 1, -1, -1))
+
+class TestBitFlyweights(unittest.TestCase):
+    def test_only_two_bits_exist(self):
+        self.assertIs(Bit(True), Bit.ONE)
+        self.assertIs(Bit(False), Bit.ZERO)
+        self.assertIs(Bit(), Bit.ZERO)
+        self.assertIs(Bit(Bit(True)), Bit.ONE)
+        self.assertIs(Bit(7), Bit.ONE)
+        self.assertEqual(Bit(True), True)
+        self.assertNotEqual(Bit.ONE, Bit.ZERO)
+        self.assertEqual({Bit(True), Bit(True), Bit(False)}, {Bit.ONE, Bit.ZERO})
+
+    def test_copies_keep_the_singletons(self):
+        for b in (Bit.ZERO, Bit.ONE):
+            self.assertIs(copy.copy(b), b)
+            self.assertIs(copy.deepcopy(b), b)
+            self.assertIs(pickle.loads(pickle.dumps(b)), b)
+        self.assertFalse(Bit.ZERO)
+        self.assertTrue(Bit.ONE)
+
+    def test_gates_return_the_singletons(self):
+        one, zero = Bit.ONE, Bit.ZERO
+        for a in (zero, one):
+            self.assertIs(g.not_gate(a), Bit(not a))
+            for b in (zero, one):
+                self.assertIs(g.and_gate(a, b), Bit(a and b))
+                self.assertIs(g.or_gate(a, b), Bit(a or b))
+                self.assertIs(g.xor_gate(a, b), Bit(bool(a) != bool(b)))
+                for c in (zero, one):
+                    n = bool(a) + bool(b) + bool(c)
+                    s, carry = g.full_adder(a, b, c)
+                    self.assertIs(s, Bit(n & 1))
+                    self.assertIs(carry, Bit(n >= 2))
+                    self.assertIs(g.and3_gate(a, b, c), Bit(a and b and c))
+                    self.assertIs(g.or3_gate(a, b, c), Bit(a or b or c))
+        # plain bools and ints still work as inputs
+        self.assertIs(g.and_gate(True, 1), one)
+        self.assertIs(g.xor_gate(True, one), zero)
+        self.assertIs(g.not_gate(0), one)
+
+class TestBitVector(unittest.TestCase):
+    def test_behaves_like_the_tuple(self):
+        t = _tuple(0xDEADBEEF)
+        v = BitVector(32, 0xDEADBEEF)
+        self.assertEqual(len(v), 32)
+        self.assertEqual(tuple(v), t)
+        self.assertEqual(v.bits(), t)
+        self.assertEqual(v, t)
+        self.assertEqual(hash(v), hash(t))
+        for i in (0, 1, 17, 31, -1, -5):
+            self.assertEqual(v[i], t[i])
+        for s in (slice(0, 8), slice(1, 9), slice(9, None), slice(None, -3), slice(-3, None),
+                  slice(5, 5), slice(None, None, 2)):
+            self.assertEqual(tuple(v[s]), t[s])
+            self.assertIsInstance(v[s], BitVector)
+        with self.assertRaises(IndexError):
+            v[32]
+
+    def test_concat_with_tuples_either_side(self):
+        hi, lo = BitVector(4, 0xA), BitVector(8, 0x5C)
+        self.assertEqual((hi + lo).value, 0xA5C)
+        self.assertEqual(((Bit(True),) + lo).value, 0x15C)
+        self.assertEqual((hi + (Bit(False), Bit(True))).value, 0b101001)
+        self.assertEqual(concat(hi, _tuple(3, 2), lo), BitVector(14, 0xA << 10 | 3 << 8 | 0x5C))
+        self.assertEqual(BitVector.of(_tuple(0x1234, 16)), BitVector(16, 0x1234))
+        self.assertEqual(BitVector.of([True, 0, 1]), BitVector(3, 0b101))
+
+    def test_helpers_match_per_bit_semantics(self):
+        a, b = _tuple(0xF0F0_1234), _tuple(0x0FF0_8765)
+        self.assertEqual(and_bits(a, b), tuple(Bit(bool(x) and bool(y)) for x, y in zip(a, b)))
+        self.assertEqual(or_bits(a, b), tuple(Bit(bool(x) or bool(y)) for x, y in zip(a, b)))
+        self.assertEqual(xor_bits(a, b), tuple(Bit(bool(x) ^ bool(y)) for x, y in zip(a, b)))
+        self.assertEqual(not_bits(a).value, ~0xF0F0_1234 & 0xFFFFFFFF)
+        # unequal widths pair up like zip(): the leading bits
+        short = _tuple(0b101, 3)
+        self.assertEqual(xor_bits(a, short), tuple(Bit(bool(x) ^ bool(y)) for x, y in zip(a, short)))
+        self.assertEqual(zero_extend(_tuple(0x8F, 8), 12).value, 0x08F)
+        self.assertEqual(sign_extend(_tuple(0x8F, 8), 12).value, 0xF8F)
+        self.assertEqual(sign_extend(_tuple(0x7F, 8), 12).value, 0x07F)
+        self.assertEqual(zero_extend(a, 8).value, 0x34)
+        self.assertEqual(sign_extend(a, 8).value, 0x34)
+        self.assertEqual(slice_bits(a, 0, 4).value, 0xF)
+        self.assertEqual((msb(a), lsb(a)), (Bit(True), Bit(False)))
+        self.assertEqual(or_reduce(BitVector(32, 0)), Bit(False))
+        self.assertEqual(and_reduce(BitVector(5, 0x1F)), Bit(True))
+        self.assertEqual(u32_from_bits(a), 0xF0F0_1234)
+        self.assertEqual(bits_from_u32(0x1_2345_6789), BitVector(32, 0x2345_6789))
+
+class TestUnitsOnBitVectors(unittest.TestCase):
+    # The units take tuples or BitVectors and return the same results either way.
+    CASES = [(0x7FFFFFFF, 1), (0x80000000, 0xFFFFFFFF), (12345, 0xFFFF_FF85), (0x3F800000, 0x40490FDB)]
+
+    def test_same_results_for_tuples_and_vectors(self):
+        fpu = FPU32()
+        for a, b in self.CASES:
+            ta, tb = _tuple(a), _tuple(b)
+            va, vb = BitVector(32, a), BitVector(32, b)
+            for op in ("ADD", "SUB", "AND", "OR", "XOR", "SLL", "SRL", "SRA"):
+                self.assertEqual(ALU32().exec(ta, tb, op), ALU32().exec(va, vb, op), op)
+            for op in ("MUL", "MULH", "MULHSU", "MULHU"):
+                self.assertEqual(mdu_mul(op, ta, tb)["rd_bits"], mdu_mul(op, va, vb)["rd_bits"], op)
+            for op in ("DIV", "DIVU", "REM", "REMU"):
+                x, y = mdu_div(op, ta, tb), mdu_div(op, va, vb)
+                self.assertEqual((x["q_bits"], x["r_bits"]), (y["q_bits"], y["r_bits"]), op)
+            self.assertEqual(fpu.add(ta, tb)["res_bits"], fpu.add(va, vb)["res_bits"])
+            self.assertEqual(fpu.mul(ta, tb)["res_bits"], fpu.mul(va, vb)["res_bits"])
+
+    def test_reductions_are_counted_per_bit(self):
+        # _is_zero / _is_all_ones stand for a chain of one gate per bit
+        with GateCounter([alu, mdu]) as gc:
+            alu._is_zero(BitVector(32, 5))
+            mdu._is_all_ones(BitVector(32, -1))
+        self.assertEqual(gc.count, 64)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from mmio import Bus, Device, Uart, Timer, Framebuffer
+from ram import FlatMemory, PagedMemory, MemoryFault
+from runner import run_hex
+from test_runner import HexProgramCase, SAMPLE, enc_i, enc_s, enc_u, enc_b, enc_j
+
+HALT = enc_j(0, 0)
+UART = 0x10000000
+
+class Recorder(Device):
+    size = 16
+    name = "rec"
+
+    def __init__(self):
+        self.log = []
+
+    def read(self, offset, width):
+        self.log.append(("r", offset, width))
+        return 0xA0 + offset
+
+    def write(self, offset, width, value):
+        self.log.append(("w", offset, width, value))
+
+class TestBus(unittest.TestCase):
+    def test_routing_and_holes(self):
+        bus = Bus(PagedMemory())
+        a = bus.attach(0x1000, Recorder())
+        b = bus.attach(0x3000, Recorder())
+        self.assertEqual((bus.lo, bus.hi), (0x1000, 0x3010))
+        bus.write_u32(0x2000, 0xDEADBEEF)                 # hole inside the window: RAM
+        self.assertEqual(bus.read_u32(0x2000), 0xDEADBEEF)
+        bus.write_u16(0x3004, 0x12345)
+        self.assertEqual(bus.read_u8(0x1003), 0xA3)
+        self.assertEqual(a.log, [("r", 3, 1)])
+        self.assertEqual(b.log, [("w", 4, 2, 0x2345)])
+        bus.write_u32(0x40, 7)                            # below the window
+        self.assertEqual((bus.read_u32(0x40), bus.ram.read_u32(0x40)), (7, 7))
+        with self.assertRaises(MemoryFault):
+            bus.read_u32(0x100E)                          # straddles the device end
+
+    def test_attach_checks(self):
+        bus = Bus(FlatMemory(1 << 16))
+        bus.attach(0x100, Recorder())
+        with self.assertRaises(ValueError):
+            bus.attach(0x108, Recorder())
+        with self.assertRaises(ValueError):
+            bus.attach(0xFFFFFFF8, Recorder())
+        self.assertEqual(bus.size, 1 << 16)               # other attributes come from RAM
+
+    def test_timer_and_framebuffer(self):
+        t = Timer(tick=10)
+        self.assertEqual([t.read(0, 4), t.read(0, 4)], [10, 20])
+        t.write(8, 4, 25)
+        t.write(12, 4, 0)
+        self.assertEqual(t.read(16, 4), 0)
+        t.read(0, 4)
+        self.assertEqual(t.read(16, 4), 1)
+        fb = Framebuffer(4, 2)
+        fb.write(4 * 5, 4, 0x00FF8000)
+        self.assertEqual(fb.pixel(1, 1), 0x00FF8000)
+
+class TestProgramsOnTheBus(HexProgramCase):
+    def hello(self):
+        # lui x5, UART; for c in "hi\n": addi x6, x0, c; sb x6, 0(x5)
+        prog = [enc_u(UART >> 12, 5)]
+        for c in b"hi\n":
+            prog += [enc_i(c, 0, 0, 6), enc_s(0, 6, 5, 0)]
+        return prog + [HALT]
+
+    def test_uart_output_in_every_mode(self):
+        path = self.hexfile(self.hello())
+        for mode in ("interp", "block", "gate"):
+            bus = Bus(PagedMemory())
+            uart = bus.attach(UART, Uart())
+            out = run_hex(path, mode=mode, mem=bus)
+            self.assertEqual((out["halt"], uart.output()), ("self-loop", b"hi\n"), mode)
+
+    def test_ram_programs_are_unchanged(self):
+        bus = Bus(PagedMemory())
+        bus.attach(UART, Uart())
+        a, b = run_hex(SAMPLE, mem=bus), run_hex(SAMPLE)
+        self.assertEqual((a["regs"], a["steps"]), (b["regs"], b["steps"]))
+        self.assertEqual(bus.read_u32(0x00010000), 0x0000000F)
+
+    def test_polling_a_device_is_not_idle(self):
+        # loop: lbu x7, 5(x5); andi x7, x7, 1; beq x7, x0, loop -- wait for rx
+        prog = [enc_u(UART >> 12, 5), enc_i(5, 5, 4, 7, 0x03), enc_i(1, 7, 7, 7), enc_b(-8, 0, 7), HALT]
+        path = self.hexfile(prog)
+        bus = Bus(PagedMemory())
+        bus.attach(UART, Uart())
+        out = run_hex(path, max_steps=300, mem=bus)
+        self.assertEqual(out["halt"], "max_steps")
+        out = run_hex(path, max_steps=300)                # plain RAM never changes: idle
+        self.assertEqual(out["halt"], "idle loop")
+        bus = Bus(PagedMemory())
+        bus.attach(UART, Uart(rx=b"x"))
+        self.assertEqual(run_hex(path, max_steps=300, mem=bus)["halt"], "self-loop")
@@ -0,0 +1,107 @@
+import random
+import unittest
+import alu
+import gates as g
+import mdu
+import netlist
+from memory import Bit, and_bits, or_reduce, xor_bits
+from fpu import FPU32
+from netlist import Circuit, Wire, record
+from tracebuf import TraceLog
+
+def _mul(a, b):
+    return mdu._mul_u32x32_to_u64(a, b, TraceLog())
+
+class TestRecord(unittest.TestCase):
+    def test_ripple_adder_netlist(self):
+        net = record(alu._ripple_add, (32, 32))
+        r = net.report()
+        # 5 gates per full adder, less what folds away with carry-in 0
+        self.assertEqual(r["gates"], 157)
+        self.assertEqual(r["by_op"], {"and": 63, "or": 31, "xor": 63})
+        self.assertEqual(r["depth"], 63)
+        self.assertEqual(r["guards"], 0)
+        self.assertEqual(r["outputs"], [32, 1])
+
+    def test_constants_fold_and_gates_are_shared(self):
+        def f(a, b):
+            x, y = a[0], b[0]
+            return (g.and_gate(x, Bit.ZERO), g.or_gate(x, Bit.ZERO), g.xor_gate(x, Bit.ONE),
+                    g.and_gate(x, y), g.and_gate(y, x), g.xor_gate(x, x), g.mux2(Bit.ONE, x, y))
+        net = record(f, (1, 1))
+        self.assertEqual(net.report()["by_op"], {"and": 1, "not": 1})
+        outs = net.outputs[0]     # a tuple of bits is one output group
+        self.assertIs(outs[0], Bit.ZERO)
+        self.assertEqual(outs[1], 0)
+        self.assertEqual(outs[3], outs[4])
+        self.assertIs(outs[5], Bit.ZERO)
+        self.assertEqual(outs[6], 1)
+
+    def test_gates_are_restored(self):
+        prims = {name: getattr(g, name) for name in g.PRIMITIVES + ("mux2",)}
+        record(alu._ripple_add, (8, 8))
+        with self.assertRaises(ValueError):
+            record(lambda a: a.value, (4,))
+        self.assertEqual({name: getattr(g, name) for name in prims}, prims)
+        self.assertIs(g.and_gate(Bit.ONE, Bit.ONE), Bit.ONE)
+
+    def test_branches_become_guards(self):
+        net = record(_mul, (32, 32), example=(7, 0b101))
+        # one guard per multiplier bit the loop branched on
+        self.assertEqual(net.report()["guards"], 32)
+        self.assertEqual([net.guards[i] for i in range(61, 64)], [True, False, True])
+        self.assertTrue(Wire.symbolic)
+
+class TestCircuit(unittest.TestCase):
+    def setUp(self):
+        random.seed(24)
+
+    def test_adder_matches_integer_add(self):
+        add = Circuit(alu._ripple_add, (32, 32))
+        vecs = [(random.getrandbits(32), random.getrandbits(32)) for _ in range(500)]
+        vecs += [(0xFFFFFFFF, 1), (0, 0), (0x80000000, 0x80000000)]
+        for (a, b), (s, c) in zip(vecs, add.evaluate(vecs)):
+            self.assertEqual((s, c), ((a + b) & 0xFFFFFFFF, (a + b) >> 32))
+        self.assertEqual(add.report(), {"paths": 1, "lane_calls": 0, "gates": [157]})
+
+    def test_multiplier_paths(self):
+        vecs = [(random.getrandbits(32), m) for m in (0, 1, 0xFFFFFFFF, 0x80000001) for _ in range(20)]
+        mul = Circuit(_mul, (32, 32))
+        self.assertEqual([p for (p,) in mul.evaluate(vecs)], [a * b for a, b in vecs])
+        self.assertEqual(mul.report()["paths"], 4)
+        self.assertEqual(mul.lane_calls, 0)
+        # known paths are reused; past max_paths the rest run lane by lane
+        mul.evaluate(vecs[:5])
+        self.assertEqual(mul.report()["paths"], 4)
+        one = Circuit(_mul, (32, 32), max_paths=1)
+        self.assertEqual([p for (p,) in one.evaluate(vecs)], [a * b for a, b in vecs])
+        self.assertEqual(one.lane_calls, len(vecs) - 20)
+
+    def test_fpu_add_into(self):
+        fpu = FPU32()
+        def add_into(acc, addend):
+            acc = list(acc)
+            fpu._add_into(acc, addend, 2)
+            return tuple(acc)
+        vecs = [(random.getrandbits(12), random.getrandbits(6)) for _ in range(300)]
+        got = Circuit(add_into, (12, 6)).evaluate(vecs)
+        self.assertEqual([v for (v,) in got], [(a + (b << 2)) & 0xFFF for a, b in vecs])
+
+    def test_bit_planes(self):
+        vecs = [(5, 1), (2, 0), (7, 1)]
+        planes = netlist.to_planes(vecs, (3, 1))
+        self.assertEqual(planes, [0b101, 0b110, 0b101, 0b101])
+        self.assertEqual(netlist.from_planes([planes[:3], planes[3:]], 3), vecs)
+        self.assertEqual(Circuit(alu._ripple_add, (8, 8)).evaluate([]), [])
+
+    def test_vector_helpers_record_per_bit(self):
+        # memory's word-level helpers fall back to one gate per bit on wires
+        f = lambda a, b: (xor_bits(a, b), or_reduce(and_bits(a, b)))
+        net = record(f, (16, 16))
+        self.assertEqual(net.report()["by_op"], {"and": 16, "or": 15, "xor": 16})
+        vecs = [(random.getrandbits(16), random.getrandbits(16)) for _ in range(100)]
+        got = Circuit(f, (16, 16)).evaluate(vecs)
+        self.assertEqual(got, [(a ^ b, int(a & b != 0)) for a, b in vecs])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import json
+import unittest
+from runner import run_hex
+from timing import PipelineTiming
+from decoder import decode
+from predictor import (BimodalPredictor, GsharePredictor, StaticPredictor, make_predictor,
+                       HIT, REDIRECT, MISS)
+from test_runner import HexProgramCase, count_loop, enc_b, enc_j
+from test_profiler import call_program
+
+BEQ_BACK = decode(enc_b(-16, 2, 1))
+BEQ_FWD = decode(enc_b(16, 2, 1))
+
+class TestDirectionPredictors(unittest.TestCase):
+    def feed(self, bp, outcomes, pc=0x100, d=BEQ_BACK):
+        res = []
+        for taken in outcomes:
+            res.append(bp.resolve(pc, d, (pc + d.imm) if taken else pc + 4))
+        return res
+
+    def test_static_policies(self):
+        self.assertEqual(self.feed(StaticPredictor(), [False, True]), [HIT, MISS])
+        # taken with no BTB: right direction, target from decode
+        self.assertEqual(self.feed(StaticPredictor("taken"), [True, False]), [REDIRECT, MISS])
+        btfn = StaticPredictor("btfn")
+        self.assertEqual(self.feed(btfn, [True]), [REDIRECT])
+        self.assertEqual(self.feed(btfn, [False], d=BEQ_FWD), [HIT])
+        with self.assertRaises(ValueError):
+            StaticPredictor("sometimes")
+
+    def test_bimodal_saturates(self):
+        bp = BimodalPredictor(index_bits=4, btb_entries=4)
+        res = self.feed(bp, [True] * 6 + [False] + [True] * 2)
+        # weakly not-taken start: one miss (which also fills the BTB), then
+        # hits; the single not-taken only costs itself
+        self.assertEqual(res, [MISS, HIT, HIT, HIT, HIT, HIT, MISS, HIT, HIT])
+        self.assertEqual((bp.branches, bp.branch_misses), (9, 2))
+
+    def test_gshare_learns_a_pattern_bimodal_cannot(self):
+        pattern = [True, False] * 200
+        bim, gsh = BimodalPredictor(), GsharePredictor(index_bits=8, history_bits=4)
+        self.feed(bim, pattern)
+        self.feed(gsh, pattern)
+        self.assertGreater(bim.branch_misses, 150)
+        self.assertLess(gsh.branch_misses, 10)
+
+    def test_btb_size_is_checked(self):
+        with self.assertRaises(ValueError):
+            BimodalPredictor(btb_entries=12)
+        with self.assertRaises(ValueError):
+            make_predictor("oracle")
+
+class TestPredictedRuns(HexProgramCase):
+    def timed(self, words, bp, max_steps=10_000):
+        tm = PipelineTiming(predictor=bp)
+        out = run_hex(self.hexfile(words), max_steps=max_steps, timing=tm)
+        return out, tm
+
+    def test_btb_removes_back_edge_redirects(self):
+        _, plain = self.timed(count_loop(20), StaticPredictor())
+        _, btb = self.timed(count_loop(20), StaticPredictor(btb_entries=16))
+        self.assertEqual(plain.predictor.redirects, 19)
+        self.assertEqual(btb.predictor.redirects, 1)
+        self.assertEqual(plain.control_stalls - btb.control_stalls, 18 * plain.jump_penalty)
+
+    def test_ras_predicts_returns(self):
+        _, none = self.timed(call_program(10), StaticPredictor())
+        _, ras = self.timed(call_program(10), StaticPredictor(ras_depth=4))
+        self.assertEqual(none.predictor.jump_misses, 10)
+        self.assertEqual(ras.predictor.jump_misses, 0)
+        self.assertLess(ras.cycles, none.cycles)
+
+    def test_stats_and_reports(self):
+        out, tm = self.timed(count_loop(50), make_predictor("bimodal", 16, 2))
+        bp = tm.predictor
+        self.assertEqual(bp.instructions, out["steps"])
+        self.assertEqual(bp.branches, 50)
+        self.assertAlmostEqual(bp.mpki, 1000 * bp.mispredicts / out["steps"])
+        r = json.loads(tm.report_json())["predictor"]
+        self.assertEqual(r["predictor"], "bimodal (btb=16, ras=2)")
+        self.assertIn("MPKI", tm.report_text())
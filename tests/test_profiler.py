@@ -0,0 +1,61 @@
+import json
+import unittest
+from runner import run_hex
+from profiler import Profile
+from test_runner import HexProgramCase, count_loop, enc_i, enc_b, enc_j
+
+def call_program(n):
+    # main: x2 = n; loop: jal ra, f; x2 -= 1; bne x2, x0, loop; halt
+    # f:    x1 += ... (addi x3, x3, 1; addi x3, x3, 1); jalr x0, 0(ra)
+    return [
+        enc_i(n, 0, 0, 2),          # 0x00
+        enc_j(16, 1),               # 0x04 jal ra, f (0x14)
+        enc_i(-1, 2, 0, 2),         # 0x08
+        enc_b(-8, 0, 2, f3=1),      # 0x0C bne x2, x0, 0x04
+        enc_j(0, 0),                # 0x10 halt
+        enc_i(1, 3, 0, 3),          # 0x14 f:
+        enc_i(1, 3, 0, 3),          # 0x18
+        enc_i(0, 1, 0, 0, op=0x67), # 0x1C jalr x0, 0(ra)
+    ]
+
+class TestProfiler(HexProgramCase):
+    def test_counts_match_plain_run(self):
+        path = self.hexfile(count_loop(25))
+        plain = run_hex(path, max_steps=500)
+        prof = Profile()
+        out = run_hex(path, max_steps=500, profile=prof)
+        self.assertEqual((out["regs"], out["pc"], out["steps"]), (plain["regs"], plain["pc"], plain["steps"]))
+        pcs = prof.pc_counts()
+        self.assertEqual(sum(pcs.values()), out["steps"])
+        self.assertEqual(pcs[8], 25)               # loop body: addi x1
+        self.assertEqual(prof.op_counts()["beq"], 25)
+
+    def test_budget_cuts_a_block(self):
+        path = self.hexfile(count_loop(100))
+        prof = Profile()
+        out = run_hex(path, max_steps=7, profile=prof)
+        self.assertEqual(sum(prof.pc_counts().values()), 7)
+        self.assertEqual(out["steps"], 7)
+
+    def test_call_stacks_and_reports(self):
+        path = self.hexfile(call_program(3))
+        prof = Profile()
+        out = run_hex(path, max_steps=200, profile=prof)
+        self.assertEqual(out["halt"], "self-loop")
+        self.assertEqual(out["regs"][3], 6)
+        stacks = dict(line.rsplit(" ", 1) for line in prof.collapsed().splitlines())
+        self.assertEqual(int(stacks["0x00000000;0x00000014"]), 9)   # 3 calls x 3 instructions
+        self.assertEqual(sum(int(v) for v in stacks.values()), out["steps"])
+        rep = json.loads(prof.report_json())
+        self.assertEqual(rep["steps"], out["steps"])
+        self.assertEqual(rep["blocks"][0]["entry"], 0x14)
+        self.assertIn("hot blocks:", prof.report_text())
+        prof.symbolize = {0x14: "f"}.get
+        self.assertIn("0x00000000;f 9", prof.collapsed())
+
+    def test_trace_and_profile_are_exclusive(self):
+        with self.assertRaises(ValueError):
+            run_hex(self.hexfile(count_loop(2)), trace=True, profile=Profile())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from ram import FlatMemory, PagedMemory, MemoryFault
+
+class TestFlatMemory(unittest.TestCase):
+    def test_little_endian_layout(self):
+        m = FlatMemory(64)
+        m.write_u32(8, 0x11223344)
+        self.assertEqual(m.read(8, 4), bytes([0x44, 0x33, 0x22, 0x11]))
+        self.assertEqual(m.read_u8(8), 0x44)
+        self.assertEqual(m.read_u16(10), 0x1122)
+
+    def test_unaligned_roundtrip(self):
+        m = FlatMemory(64)
+        m.write_u32(5, 0xDEADBEEF)
+        self.assertEqual(m.read_u32(5), 0xDEADBEEF)
+        m.write_u16(3, 0xCAFE)
+        self.assertEqual(m.read_u16(3), 0xCAFE)
+        self.assertEqual(m.read_u8(4), 0xCA)
+
+    def test_values_are_truncated(self):
+        m = FlatMemory(16)
+        m.write_u8(0, 0x1FF)
+        m.write_u16(2, -1)
+        self.assertEqual(m.read_u32(0), 0xFFFF00FF)
+
+    def test_faults(self):
+        m = FlatMemory(16, base=0x1000)
+        m.write_u32(0x100C, 1)
+        for bad in (0x0FFF, 0x1010, 0x100E):
+            with self.assertRaises(MemoryFault):
+                m.read_u32(bad)
+        with self.assertRaises(MemoryFault):
+            m.write_u8(0x1010, 0)
+        with self.assertRaises(MemoryFault) as cm:
+            m.write_u16(0x100F, 0)
+        self.assertEqual(cm.exception.addr, 0x100F)
+
+    def test_bulk_load(self):
+        m = FlatMemory(32)
+        m.load_words(4, [0x03020100, 0x07060504])
+        self.assertEqual(m.read(4, 8), bytes(range(8)))
+        with self.assertRaises(MemoryFault):
+            m.load(30, b"abc")
+
+class TestPagedMemory(unittest.TestCase):
+    def test_pages_allocated_on_first_store(self):
+        m = PagedMemory()
+        self.assertEqual(m.read_u32(0x7FFF_F000), 0)
+        self.assertEqual(m.resident_pages, 0)
+        m.write_u32(0x7FFF_FFFC, 0xCAFEBABE)   # stack near the top
+        m.write_u8(0x0001_0000, 0x5A)          # data
+        self.assertEqual(m.resident_pages, 2)
+        self.assertEqual(m.read_u32(0x7FFF_FFFC), 0xCAFEBABE)
+        self.assertEqual(m.read_u32(0x0001_0000), 0x5A)
+
+    def test_access_spanning_two_pages(self):
+        m = PagedMemory()
+        m.write_u32(0x1FFE, 0x11223344)
+        self.assertEqual(m.read_u16(0x1FFE), 0x3344)
+        self.assertEqual(m.read_u16(0x2000), 0x1122)
+        self.assertEqual(m.read_u32(0x1FFE), 0x11223344)
+        self.assertEqual(m.read(0x1FFC, 8), bytes([0, 0, 0x44, 0x33, 0x22, 0x11, 0, 0]))
+
+    def test_bulk_load_across_pages(self):
+        m = PagedMemory()
+        blob = bytes(range(256)) * 40
+        m.load(0x0FF0, blob)
+        self.assertEqual(m.read(0x0FF0, len(blob)), blob)
+        self.assertEqual(m.resident_pages, 4)
+
+    def test_size_limit_faults(self):
+        m = PagedMemory(size=1 << 16)
+        with self.assertRaises(MemoryFault):
+            m.write_u32(1 << 16, 1)
+        with self.assertRaises(MemoryFault):
+            m.read_u8(0xFFFF_FFFF)
+
+    def test_mmap_backing(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        with PagedMemory(backing=path, size=1 << 16) as m:
+            m.write_u32(0x1234, 0xA5A5A5A5)
+            m.load_words(0x8000, [1, 2, 3])
+        self.assertEqual(os.path.getsize(path), 1 << 16)
+        # contents persist and are visible as initial memory on the next map
+        with PagedMemory(backing=path, size=1 << 16) as m:
+            self.assertEqual(m.read_u32(0x1234), 0xA5A5A5A5)
+            self.assertEqual(m.read_u32(0x8008), 3)
+            with self.assertRaises(MemoryFault):
+                m.read_u32(1 << 16)
@@ -0,0 +1,287 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from runner import run_hex
+from decoder import decode, X0_SINK
+
+ROOT = Path(__file__).resolve().parents[1]
+SAMPLE = str(ROOT / "test_base.hex")
+
+# Tiny encoders (host numerics are fine in tests)
+def enc_i(imm, rs1, f3, rd, op=0x13):
+    return ((imm & 0xFFF) << 20) | (rs1 << 15) | (f3 << 12) | (rd << 7) | op
+
+def enc_r(f7, rs2, rs1, f3, rd, op=0x33):
+    return (f7 << 25) | (rs2 << 20) | (rs1 << 15) | (f3 << 12) | (rd << 7) | op
+
+def enc_s(imm, rs2, rs1, f3, op=0x23):
+    imm &= 0xFFF
+    return ((imm >> 5) << 25) | (rs2 << 20) | (rs1 << 15) | (f3 << 12) | ((imm & 0x1F) << 7) | op
+
+def enc_b(imm, rs2, rs1, f3=0):
+    imm &= 0x1FFF
+    return (((imm >> 12) & 1) << 31) | (((imm >> 5) & 0x3F) << 25) | (rs2 << 20) | (rs1 << 15) \
+        | (f3 << 12) | (((imm >> 1) & 0xF) << 8) | (((imm >> 11) & 1) << 7) | 0x63
+
+def enc_j(imm, rd):
+    imm &= 0x1FFFFF
+    return (((imm >> 20) & 1) << 31) | (((imm >> 1) & 0x3FF) << 21) | (((imm >> 11) & 1) << 20) \
+        | (((imm >> 12) & 0xFF) << 12) | (rd << 7) | 0x6F
+
+def enc_u(imm20, rd, op=0x37):
+    return ((imm20 & 0xFFFFF) << 12) | (rd << 7) | op
+
+ECALL = 0x00000073
+EBREAK = 0x00100073
+
+def count_loop(n):
+    # x1 = 0; x2 = n; loop: x1 += 1; beq x1, x2, +8; jal x0, loop; halt: jal x0, 0
+    return [enc_i(0, 0, 0, 1), enc_i(n, 0, 0, 2), enc_i(1, 1, 0, 1),
+            enc_b(8, 2, 1), enc_j(-8, 0), enc_j(0, 0)]
+
+def write_hex(words):
+    fd, path = tempfile.mkstemp(suffix=".hex")
+    with os.fdopen(fd, "w") as f:
+        f.write("\n".join(f"{w & 0xFFFFFFFF:08X}" for w in words))
+    return path
+
+class HexProgramCase(unittest.TestCase):
+    def hexfile(self, words):
+        path = write_hex(words)
+        self.addCleanup(os.remove, path)
+        return path
+
+class TestDecode(unittest.TestCase):
+    def test_immediates_are_presign_extended(self):
+        d = decode(enc_i(-3, 1, 0, 5))
+        self.assertEqual((d.name, d.rd, d.rs1, d.imm), ("addi", 5, 1, -3))
+        d = decode(enc_b(-8, 2, 1))
+        self.assertEqual((d.name, d.rs1, d.rs2, d.imm), ("beq", 1, 2, -8))
+        d = decode(enc_j(-2048, 1))
+        self.assertEqual((d.name, d.rd, d.imm), ("jal", 1, -2048))
+
+    def test_x0_writes_go_to_sink(self):
+        d = decode(enc_i(7, 0, 0, 0))
+        self.assertEqual(d.rd, X0_SINK)
+
+class TestRunHex(HexProgramCase):
+    def test_sample_program(self):
+        out = run_hex(SAMPLE)
+        self.assertEqual(out["steps"], 10)
+        self.assertEqual(out["pc"], 0x28)
+        self.assertEqual(out["regs"][1:7], [5, 10, 15, 15, 0x00010000, 2])
+        self.assertEqual(out["mem"].read_u32(0x00010000), 0x0000000F)
+
+    def test_backward_jump_is_not_a_halt(self):
+        out = run_hex(self.hexfile(count_loop(50)), max_steps=10_000)
+        self.assertEqual(out["regs"][1], 50)
+        self.assertEqual(out["pc"], 20)
+        self.assertEqual(out["steps"], 2 + 50 * 3 - 1 + 1)
+
+    def test_max_steps_bound(self):
+        out = run_hex(self.hexfile(count_loop(50)), max_steps=7)
+        self.assertEqual(out["steps"], 7)
+
+    def test_x0_stays_zero(self):
+        out = run_hex(self.hexfile([enc_i(9, 0, 0, 0), enc_r(0, 0, 0, 0, 1)]))
+        self.assertEqual(out["regs"][0], 0)
+        self.assertEqual(out["regs"][1], 0)
+
+class TestBlockMode(HexProgramCase):
+    def test_sample_program_matches_interpreter(self):
+        a = run_hex(SAMPLE)
+        b = run_hex(SAMPLE, mode="block")
+        self.assertEqual((a["regs"], a["mem"].read(0x10000, 16), a["pc"], a["steps"]),
+                         (b["regs"], b["mem"].read(0x10000, 16), b["pc"], b["steps"]))
+
+    def test_loop_matches_interpreter(self):
+        path = self.hexfile(count_loop(300))
+        a = run_hex(path, max_steps=100_000)
+        b = run_hex(path, max_steps=100_000, mode="block")
+        self.assertEqual((a["regs"], a["pc"], a["steps"]), (b["regs"], b["pc"], b["steps"]))
+
+    def test_budget_ends_mid_block(self):
+        path = self.hexfile(count_loop(300))
+        for budget in (1, 2, 3, 4, 5, 101):
+            a = run_hex(path, max_steps=budget)
+            b = run_hex(path, max_steps=budget, mode="block")
+            self.assertEqual((a["regs"], a["pc"], a["steps"]), (b["regs"], b["pc"], b["steps"]))
+
+    def test_block_source_is_cached_per_entry_pc(self):
+        from translate import BlockCache
+        from decoder import CodeCache
+        from ram import FlatMemory
+        prog = count_loop(3)
+        mem = FlatMemory(64)
+        mem.load_words(0, prog)
+        cache = BlockCache(CodeCache(mem, [(0, 4 * len(prog))]))
+        blk = cache.get(8)
+        self.assertIs(cache.get(8), blk)
+        self.assertEqual(blk.length, 2)  # addi; beq
+        self.assertIn("def _blk(regs, mem):", blk.source)
+
+    def test_blocks_are_kept_across_runs(self):
+        from decoder import CodeCache
+        from ram import FlatMemory
+        from runner import _run_blocks
+        prog = count_loop(3)
+        mem = FlatMemory(64)
+        mem.load_words(0, prog)
+        code = CodeCache(mem, [(0, 4 * len(prog))])
+        _run_blocks(code, [0] * 32, mem, 0, 2)
+        cache = code.blocks
+        blk = cache.get(8)
+        _run_blocks(code, [0] * 32, mem, 0, 100)
+        self.assertIs(code.blocks, cache)
+        self.assertIs(cache.get(8), blk)
+        code.clear()
+        self.assertIsNone(code.blocks)
+
+def rv32i_program():
+    # Touches every RV32I instruction; x28 counts wrongly-taken paths (must stay 0),
+    # x27 counts correctly not-taken branches.
+    p = [
+        enc_u(0x80000, 1),                 # lui   x1, 0x80000
+        enc_i(-5, 0, 0, 2),                # addi  x2, x0, -5
+        enc_i(3, 0, 0, 3),                 # addi  x3, x0, 3
+        enc_r(0, 3, 2, 2, 4),              # slt   x4, x2, x3
+        enc_r(0, 3, 2, 3, 5),              # sltu  x5, x2, x3
+        enc_i(-4, 2, 2, 6),                # slti  x6, x2, -4
+        enc_i(-1, 3, 3, 7),                # sltiu x7, x3, -1
+        enc_i(0x0F, 2, 4, 8),              # xori  x8, x2, 0xF
+        enc_i(0x70, 3, 6, 9),              # ori   x9, x3, 0x70
+        enc_i(0x7FF, 2, 7, 10),            # andi  x10, x2, 0x7FF
+        enc_i(30, 3, 1, 11),               # slli  x11, x3, 30
+        enc_i(4, 1, 5, 12),                # srli  x12, x1, 4
+        enc_i(0x400 | 4, 1, 5, 13),        # srai  x13, x1, 4
+        enc_r(0, 3, 3, 1, 14),             # sll   x14, x3, x3
+        enc_r(0, 3, 2, 5, 15),             # srl   x15, x2, x3
+        enc_r(0x20, 3, 2, 5, 16),          # sra   x16, x2, x3
+        enc_r(0, 3, 2, 4, 17),             # xor   x17, x2, x3
+        enc_r(0, 3, 1, 6, 18),             # or    x18, x1, x3
+        enc_r(0, 3, 2, 7, 19),             # and   x19, x2, x3
+        enc_u(1, 20, 0x17),                # auipc x20, 1          (pc = 0x4C)
+        enc_u(0x10, 21),                   # lui   x21, 0x10
+        enc_s(1, 2, 21, 0),                # sb    x2, 1(x21)
+        enc_s(2, 3, 21, 1),                # sh    x3, 2(x21)
+        enc_i(0, 21, 2, 22, 0x03),         # lw    x22, 0(x21)
+        enc_i(1, 21, 0, 23, 0x03),         # lb    x23, 1(x21)
+        enc_i(1, 21, 4, 24, 0x03),         # lbu   x24, 1(x21)
+        enc_i(0, 21, 1, 25, 0x03),         # lh    x25, 0(x21)
+        enc_i(2, 21, 5, 26, 0x03),         # lhu   x26, 2(x21)
+        0x0000000F,                        # fence
+    ]
+    # taken branches skip the x28 bump; not-taken ones fall into an x27 bump
+    for f3, rs1, rs2 in ((1, 2, 3), (4, 2, 3), (5, 3, 2), (6, 3, 2), (7, 2, 3), (0, 3, 3)):
+        p += [enc_b(8, rs2, rs1, f3), enc_i(1, 28, 0, 28)]
+    for f3, rs1, rs2 in ((0, 2, 3), (1, 3, 3), (4, 3, 2), (5, 2, 3), (6, 2, 3), (7, 3, 2)):
+        p += [enc_b(8, rs2, rs1, f3), enc_i(1, 27, 0, 27)]
+    p += [
+        enc_j(8, 29),                      # jal   x29, +8
+        enc_i(1, 28, 0, 28),
+        enc_u(0, 30, 0x17),                # auipc x30, 0
+        enc_i(12, 30, 0, 31, 0x67),        # jalr  x31, 12(x30)
+        enc_i(1, 28, 0, 28),
+        ECALL,
+    ]
+    return p
+
+class TestRV32I(HexProgramCase):
+    def check(self, out):
+        r = out["regs"]
+        expect = {
+            1: 0x80000000, 2: 0xFFFFFFFB, 3: 3, 4: 1, 5: 0, 6: 1, 7: 1,
+            8: 0xFFFFFFF4, 9: 0x73, 10: 0x7FB, 11: 0xC0000000, 12: 0x08000000,
+            13: 0xF8000000, 14: 24, 15: 0x1FFFFFFF, 16: 0xFFFFFFFF,
+            17: 0xFFFFFFF8, 18: 0x80000003, 19: 3, 20: 0x4C + 0x1000,
+            21: 0x10000, 22: 0x0003FB00, 23: 0xFFFFFFFB, 24: 0xFB,
+            25: 0xFFFFFB00, 26: 3, 27: 6, 28: 0,
+        }
+        for i, v in expect.items():
+            self.assertEqual(r[i], v, f"x{i}")
+        jal_pc = 0x74 + 4 * 24
+        self.assertEqual(r[29], jal_pc + 4)
+        self.assertEqual(r[31], jal_pc + 16)
+        self.assertEqual(out["halt"], "ecall")
+        self.assertEqual(out["pc"], jal_pc + 20)
+
+    def test_interpreter(self):
+        self.check(run_hex(self.hexfile(rv32i_program())))
+
+    def test_block_mode(self):
+        self.check(run_hex(self.hexfile(rv32i_program()), mode="block"))
+
+    def test_stop_reasons(self):
+        out = run_hex(self.hexfile([enc_i(1, 0, 0, 1), 0xFFFFFFFF]))
+        self.assertEqual((out["halt"], out["pc"], out["steps"]), ("illegal", 4, 1))
+        out = run_hex(self.hexfile([EBREAK]), mode="block")
+        self.assertEqual(out["halt"], "ebreak")
+        out = run_hex(self.hexfile([enc_i(1, 0, 0, 1)]))
+        self.assertEqual(out["halt"], "pc out of range")
+        out = run_hex(SAMPLE)
+        self.assertEqual(out["halt"], "self-loop")
+
+class TestIdleLoops(HexProgramCase):
+    MODES = ("interp", "block", "gate")
+
+    def run_all(self, words, **kw):
+        path = self.hexfile(words)
+        outs = [run_hex(path, mode=m, **kw) for m in self.MODES]
+        for out in outs[1:]:
+            self.assertEqual((out["regs"], out["pc"], out["steps"], out["halt"]),
+                             (outs[0]["regs"], outs[0]["pc"], outs[0]["steps"], outs[0]["halt"]))
+        return outs[0]
+
+    def test_branch_to_self(self):
+        out = self.run_all([enc_i(3, 0, 0, 1), enc_b(0, 0, 0)], max_steps=10_000)
+        self.assertEqual((out["halt"], out["pc"], out["steps"]), ("idle loop", 4, 3))
+
+    def test_polling_a_word_nothing_writes(self):
+        # lui x5, 0x10; loop: lw x6, 0(x5); beq x6, x0, loop
+        out = self.run_all([enc_u(0x10, 5), enc_i(0, 5, 2, 6, 0x03), enc_b(-4, 0, 6)],
+                           max_steps=10_000)
+        self.assertEqual((out["halt"], out["pc"], out["steps"]), ("idle loop", 4, 5))
+
+    def test_loop_settles_then_idles(self):
+        # x1 = 8; loop: srli x1, x1, 1; jal x0, loop -- idle once x1 reaches 0
+        out = self.run_all([enc_i(8, 0, 0, 1), enc_i(1, 1, 5, 1), enc_j(-4, 0)], max_steps=10_000)
+        self.assertEqual((out["halt"], out["regs"][1], out["steps"]), ("idle loop", 0, 1 + 2 * 5))
+
+    def test_loops_that_change_state_keep_running(self):
+        # a store in the body, or a counter, is progress
+        out = self.run_all([enc_u(0x10, 5), enc_s(0, 0, 5, 2), enc_j(-4, 0)], max_steps=101)
+        self.assertEqual((out["halt"], out["steps"]), ("max_steps", 101))
+        out = self.run_all([enc_i(1, 1, 0, 1), enc_j(-4, 0)], max_steps=100)
+        self.assertEqual((out["halt"], out["regs"][1]), ("max_steps", 50))
+
+    def test_instrumented_loops_detect_it_too(self):
+        from profiler import Profile
+        from timing import PipelineTiming
+        path = self.hexfile([enc_i(3, 0, 0, 1), enc_b(0, 0, 0)])
+        for kw in ({"trace": True}, {"profile": Profile()}, {"timing": PipelineTiming()}):
+            out = run_hex(path, max_steps=10_000, **kw)
+            self.assertEqual((out["halt"], out["pc"], out["steps"]), ("idle loop", 4, 3), kw)
+
+class TestMemoryFault(HexProgramCase):
+    def test_fault_is_precise_in_both_modes(self):
+        from ram import FlatMemory
+        prog = [enc_i(7, 0, 0, 1),                 # addi x1, x0, 7
+                enc_u(0x10, 2),                    # lui  x2, 0x10
+                enc_s(0, 1, 2, 2),                 # sw   x1, 0(x2)
+                enc_i(1, 1, 0, 1),                 # addi x1, x1, 1
+                enc_u(0x100, 3),                   # lui  x3, 0x100 (end of a 1 MiB memory)
+                enc_i(0, 3, 2, 4, 0x03),           # lw   x4, 0(x3)
+                enc_i(1, 0, 0, 5)]
+        path = self.hexfile(prog)
+        for mode in ("interp", "block"):
+            out = run_hex(path, mode=mode, mem=FlatMemory(1 << 20))
+            self.assertEqual(out["halt"], "memory fault")
+            self.assertEqual((out["pc"], out["steps"]), (20, 5))
+            self.assertEqual(out["regs"][1:6], [8, 0x10000, 0x100000, 0, 0])
+            self.assertEqual(out["mem"].read_u32(0x10000), 7)
+
+    def test_program_image_is_readable(self):
+        prog = [enc_i(0, 0, 2, 1, 0x03), enc_j(0, 0)]   # lw x1, 0(x0)
+        out = run_hex(self.hexfile(prog))
+        self.assertEqual(out["regs"][1], prog[0])
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from ram import FlatMemory, PagedMemory, PAGE_SIZE, digest
+from runner import run_hex
+from state import SimState
+from test_runner import HexProgramCase, count_loop, enc_i, enc_r, enc_s, enc_u, enc_b, enc_j
+
+def store_loop(n):
+    # x1 counts to n, storing x1 one page further up each step (0x11000, 0x12000, ...)
+    return [enc_i(0, 0, 0, 1), enc_i(n, 0, 0, 2), enc_u(0x10, 3), enc_u(1, 4),
+            enc_i(1, 1, 0, 1),                 # loop: addi x1, x1, 1
+            enc_r(0, 4, 3, 0, 3),              # add  x3, x3, x4
+            enc_s(0, 1, 3, 2),                 # sw   x1, 0(x3)
+            enc_b(8, 2, 1),                    # beq  x1, x2, halt
+            enc_j(-16, 0),                     # jal  x0, loop
+            enc_j(0, 0)]
+
+class TestPagedSnapshots(unittest.TestCase):
+    def test_copy_on_write(self):
+        m = PagedMemory()
+        m.write_u32(0x1000, 1)
+        m.write_u32(0x5000, 2)
+        snap = m.snapshot()
+        self.assertEqual(m.dirty_pages, 0)
+        m.write_u32(0x1000, 10)
+        m.write_u32(0x9000, 3)
+        self.assertEqual(m.dirty_pages, 2)
+        self.assertEqual(snap.flat()[1][2][0], 1)   # frozen page kept its value
+        m.restore(snap)
+        self.assertEqual((m.read_u32(0x1000), m.read_u32(0x5000), m.read_u32(0x9000)), (1, 2, 0))
+        self.assertEqual(m.resident_pages, 2)
+
+    def test_snapshot_chain_and_out_of_order_restore(self):
+        m = PagedMemory()
+        m.write_u8(0x1000, 1)
+        a = m.snapshot()
+        m.write_u8(0x2000, 2)
+        m.zero(0x1000, PAGE_SIZE)
+        b = m.snapshot()
+        self.assertEqual(set(b.delta), {1, 2})
+        m.write_u8(0x3000, 3)
+        m.restore(a)
+        self.assertEqual(m.read(0x1000, 1) + m.read(0x2000, 1) + m.read(0x3000, 1), b"\x01\0\0")
+        m.restore(b)
+        self.assertEqual(m.read(0x1000, 1) + m.read(0x2000, 1) + m.read(0x3000, 1), b"\0\x02\0")
+
+    def test_cached_page_is_not_written_through(self):
+        m = PagedMemory()
+        m.write_u32(0x40, 7)
+        snap = m.snapshot()
+        m.read_u32(0x40)           # page now in the load cache
+        m.write_u32(0x40, 8)
+        self.assertEqual(m.read_u32(0x40), 8)
+        m.restore(snap)
+        self.assertEqual(m.read_u32(0x40), 7)
+
+    def test_mmap_backing_refuses(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        with PagedMemory(backing=path, size=1 << 16) as m:
+            with self.assertRaises(ValueError):
+                m.snapshot()
+
+class TestSimState(HexProgramCase):
+    def test_resume_matches_straight_run(self):
+        path = self.hexfile(count_loop(50))
+        ref = run_hex(path, max_steps=10_000)
+        st = SimState.from_hex(path)
+        while st.run(37) == "max_steps":
+            pass
+        out = st.result()
+        self.assertEqual((out["regs"], out["pc"], out["steps"], out["halt"]),
+                         (ref["regs"], ref["pc"], ref["steps"], ref["halt"]))
+
+    def test_fork_from_checkpoint(self):
+        path = self.hexfile(store_loop(30))
+        for mode in ("interp", "block"):
+            st = SimState.from_hex(path)
+            st.run(40, mode=mode)
+            cp = st.snapshot()
+            st.run(10_000, mode=mode)
+            final = st.result()
+            final_digest = digest(st.mem)
+            final_pages = st.mem.resident_pages
+            st.restore(cp)
+            self.assertEqual((st.pc, st.steps), (cp.pc, cp.steps))
+            self.assertLess(st.mem.resident_pages, final_pages)
+            st.run(10_000, mode=mode)
+            self.assertEqual((st.result()["regs"], st.steps), (final["regs"], final["steps"]))
+            self.assertEqual(digest(st.mem), final_digest)
+
+    def test_save_and_load(self):
+        path = self.hexfile(store_loop(5))
+        st = SimState.from_hex(path)
+        st.run(12)
+        fd, saved = tempfile.mkstemp(suffix=".state")
+        os.close(fd)
+        self.addCleanup(os.remove, saved)
+        st.save(saved)
+        for mem in (None, FlatMemory(1 << 20)):
+            back = SimState.load(saved, mem)
+            self.assertEqual((back.pc, back.steps, back.regs[:32]), (st.pc, st.steps, st.regs[:32]))
+            self.assertEqual(digest(back.mem), digest(st.mem))
+            back.run(1000)
+            st2 = SimState.from_hex(path)
+            st2.run(1000)
+            self.assertEqual(back.result()["regs"], st2.result()["regs"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import io
+import unittest
+from runner import run_hex
+from syscalls import Syscalls, ENOSYS
+from test_runner import HexProgramCase, ECALL, enc_i, enc_u
+
+A0, A1, A2, A7 = 10, 11, 12, 17
+
+def li(rd, v):
+    return enc_i(v, 0, 0, rd)
+
+def call(num, *args):
+    return [li(A0 + k, a) for k, a in enumerate(args)] + [li(A7, num), ECALL]
+
+def words(data: bytes):
+    data += bytes(-len(data) % 4)
+    return [int.from_bytes(data[k:k + 4], "little") for k in range(0, len(data), 4)]
+
+def hello(status=3):
+    # write(1, msg, 6); exit(status); msg: "hello\n" right after the code
+    return call(64, 1, 32, 6) + call(93, status) + words(b"hello\n")
+
+class TestSyscalls(HexProgramCase):
+    def test_write_and_exit(self):
+        path = self.hexfile(hello())
+        for mode in ("interp", "block", "gate"):
+            sc = Syscalls()
+            out = run_hex(path, mode=mode, syscalls=sc)
+            self.assertEqual((out["halt"], out["exit_code"], out["pc"], out["steps"]), ("exit", 3, 28, 8))
+            self.assertEqual(sc.output(), b"hello\n")
+            self.assertEqual(out["regs"][A0], 3)
+        self.assertEqual(sc.calls, {"write": 1, "exit": 1})
+
+    def test_ecall_still_halts_without_syscalls(self):
+        out = run_hex(self.hexfile(hello()))
+        self.assertEqual((out["halt"], out["pc"]), ("ecall", 16))
+        self.assertNotIn("syscalls", out)
+
+    def test_sink_is_flushed_in_bulk(self):
+        sink = io.BytesIO()
+        sc = Syscalls(stdout=sink, flush_bytes=1 << 20)
+        prog = call(64, 1, 52, 2) + call(64, 1, 52, 2) + call(93, 0) + words(b"ok")
+        run_hex(self.hexfile(prog), syscalls=sc)
+        self.assertEqual((sink.getvalue(), sc.output()), (b"okok", b""))   # flushed once, at the end
+        self.assertEqual(sc.bytes_written, 4)
+
+    def test_read_from_stdin(self):
+        # read(0, 0x10000, 8) then write(1, 0x10000, <bytes read>)
+        prog = [enc_u(0x10, A1), li(A0, 0), li(A2, 8), li(A7, 63), ECALL,
+                enc_i(0, A0, 0, A2), li(A0, 1), li(A7, 64), ECALL, *call(93, 0)]
+        sc = Syscalls(stdin=b"abc")
+        out = run_hex(self.hexfile(prog), syscalls=sc)
+        self.assertEqual((out["halt"], sc.output(), sc.bytes_read), ("exit", b"abc", 3))
+        self.assertEqual(out["mem"].read(0x10000, 4), b"abc\0")
+
+    def test_read_returns_what_is_available(self):
+        # prompt, then read(0, 0x10000, 64): a pipe holding one line must not
+        # block until 64 bytes arrive, and the prompt must be out already
+        sink = io.BytesIO()
+        seen = []
+        class Pipe:
+            def read1(self, n):
+                seen.append(sink.getvalue())
+                return b"42\n"[:n]
+            def read(self, n):
+                raise AssertionError("blocking read")
+        prog = call(64, 1, 52, 2) + [enc_u(0x10, A1), li(A0, 0), li(A2, 64), li(A7, 63), ECALL,
+                                     *call(93, 0)] + words(b"> ")
+        sc = Syscalls(stdin=Pipe(), stdout=sink, flush_bytes=1 << 20)
+        out = run_hex(self.hexfile(prog), syscalls=sc)
+        self.assertEqual((out["halt"], out["regs"][A0], sc.bytes_read), ("exit", 0, 3))
+        self.assertEqual(seen, [b"> "])
+        self.assertEqual(out["mem"].read(0x10000, 3), b"42\n")
+
+    def test_brk_clock_and_unknown(self):
+        prog = (call(214, 0) + [enc_i(0, A0, 0, 5)]                 # x5 = brk(0)
+                + [enc_i(0x100, 5, 0, A0), li(A7, 214), ECALL, enc_i(0, A0, 0, 6)]   # x6 = brk(x5 + 256)
+                + [enc_u(0x10, A1)] + call(113, 1) + [enc_i(0, A0, 0, 7)]       # clock_gettime(1, 0x10000)
+                + call(999) + [enc_i(0, A0, 0, 8)]
+                + call(93, 0))
+        sc = Syscalls(clock_hz=1_000_000)
+        out = run_hex(self.hexfile(prog), syscalls=sc)
+        self.assertEqual(out["regs"][5], (4 * len(prog) + 15) & ~15)
+        self.assertEqual(out["regs"][6], out["regs"][5] + 0x100)
+        self.assertEqual(out["regs"][7], 0)
+        ts = out["mem"].read(0x10000, 12)
+        self.assertEqual(int.from_bytes(ts[8:], "little"), 12 * 1000)   # the 12th instruction, at 1 MHz
+        self.assertEqual(out["regs"][8], -ENOSYS & 0xFFFFFFFF)
+        self.assertEqual(sc.unknown, {999: 1})
+        self.assertIn("unsupported #999", sc.report_text())
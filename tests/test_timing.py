@@ -0,0 +1,159 @@
+import json
+import unittest
+from runner import run_hex
+from state import SimState
+from timing import PipelineTiming
+from decoder import decode, format_trace, FREG
+from tracebuf import TraceBuffer
+from test_runner import HexProgramCase, count_loop, enc_i, enc_r, enc_s, enc_u, enc_b, enc_j
+
+HALT = enc_j(0, 0)
+
+def lw(rd, imm, rs1):
+    return enc_i(imm, rs1, 2, rd, op=0x03)
+
+def mdu(f3, rd, rs1, rs2):
+    return enc_r(0x01, rs2, rs1, f3, rd)
+
+MUL, MULH, MULHSU, MULHU, DIV, DIVU, REM, REMU = range(8)
+
+def fmv_w_x(fd, rs1):
+    return enc_r(0x78, 0, rs1, 0, fd, op=0x53)
+
+def fmv_x_w(rd, fs1):
+    return enc_r(0x70, 0, fs1, 0, rd, op=0x53)
+
+def fop(f7, fd, fs1, fs2):
+    return enc_r(f7, fs2, fs1, 0, fd, op=0x53)
+
+FADD, FSUB, FMUL = 0x00, 0x04, 0x08
+
+def li32(rd, v):
+    # lui + addi for an arbitrary 32-bit constant
+    lo = v & 0xFFF
+    lo = lo - 0x1000 if lo & 0x800 else lo
+    return [enc_u(((v - lo) >> 12) & 0xFFFFF, rd), enc_i(lo, rd, 0, rd)]
+
+class TestPipelineTiming(HexProgramCase):
+    def timed(self, words, max_steps=1000, **kw):
+        tm = PipelineTiming(**kw)
+        out = run_hex(self.hexfile(words), max_steps=max_steps, timing=tm)
+        return out, tm
+
+    def test_independent_alu_ops_are_one_per_cycle(self):
+        out, tm = self.timed([enc_i(1, 0, 0, 1), enc_i(2, 0, 0, 2), enc_i(3, 0, 0, 3), HALT])
+        self.assertEqual(out["halt"], "self-loop")
+        self.assertEqual(tm.instructions, 4)
+        self.assertEqual(tm.cycles, 4 + 4)
+        self.assertEqual(tm.data_stalls + tm.control_stalls + tm.structural_stalls, 0)
+
+    def test_forwarded_alu_chain_does_not_stall(self):
+        _, tm = self.timed([enc_i(1, 0, 0, 1), enc_i(1, 1, 0, 1), enc_i(1, 1, 0, 1), HALT])
+        self.assertEqual(tm.data_stalls, 0)
+
+    def test_load_use_stalls_one_cycle(self):
+        _, tm = self.timed([lw(1, 0, 0), enc_i(1, 1, 0, 2), HALT])
+        self.assertEqual(tm.data_stalls, 1)
+        _, tm = self.timed([lw(1, 0, 0), enc_i(0, 0, 0, 3), enc_i(1, 1, 0, 2), HALT])
+        self.assertEqual(tm.data_stalls, 0)
+
+    def test_mul_and_div_latencies(self):
+        prog = [enc_i(7, 0, 0, 1), enc_i(3, 0, 0, 2),
+                mdu(MUL, 3, 1, 2), enc_i(0, 3, 0, 4), HALT]
+        _, tm = self.timed(prog, mul_latency=3)
+        self.assertEqual(tm.data_stalls, 2)
+        prog = [enc_i(7, 0, 0, 1), enc_i(3, 0, 0, 2),
+                mdu(DIV, 3, 1, 2), mdu(REM, 4, 1, 2), HALT]
+        _, tm = self.timed(prog, div_latency=10)
+        self.assertEqual((tm.structural_stalls, tm.data_stalls), (9, 0))
+        self.assertEqual(tm.unit_counts["div"], 2)
+
+    def test_taken_branches_pay_the_flush(self):
+        out, tm = self.timed(count_loop(10), branch_penalty=2, jump_penalty=1)
+        # 9 back-edges (jal) + the final taken beq; the halt jal is free
+        self.assertEqual(tm.control_stalls, 9 * 1 + 1 * 2)
+        self.assertEqual(tm.instructions, out["steps"])
+        self.assertEqual(tm.cycles, out["steps"] + tm.control_stalls + 4)
+
+    def test_results_match_plain_run_and_resume_accumulates(self):
+        path = self.hexfile(count_loop(40))
+        plain = run_hex(path, max_steps=10_000)
+        tm = PipelineTiming()
+        st = SimState.from_hex(path)
+        st.run(max_steps=50, timing=tm)
+        st.run(max_steps=10_000, timing=tm)
+        self.assertEqual(st.result()["regs"], plain["regs"])
+        self.assertEqual(tm.instructions, plain["steps"])
+        whole = PipelineTiming()
+        run_hex(path, max_steps=10_000, timing=whole)
+        self.assertEqual(tm.cycles, whole.cycles)
+
+    def test_reports(self):
+        _, tm = self.timed(count_loop(5))
+        r = json.loads(tm.report_json())
+        self.assertEqual(r["cycles"], tm.cycles)
+        self.assertAlmostEqual(r["cpi"], tm.cycles / tm.instructions, places=3)
+        self.assertIn("CPI", tm.report_text())
+
+    def test_exclusive_with_trace_and_bad_config(self):
+        with self.assertRaises(ValueError):
+            run_hex(self.hexfile([HALT]), trace=True, timing=PipelineTiming())
+        with self.assertRaises(ValueError):
+            PipelineTiming(load_latency=0)
+
+class TestRV32M(HexProgramCase):
+    def run_op(self, f3, a, b):
+        prog = li32(1, a) + li32(2, b) + [mdu(f3, 3, 1, 2), HALT]
+        path = self.hexfile(prog)
+        out = run_hex(path)
+        blk = run_hex(path, mode="block")
+        self.assertEqual(out["regs"], blk["regs"])
+        return out["regs"][3]
+
+    def test_multiply(self):
+        self.assertEqual(self.run_op(MUL, 0x12345678, 0x9ABCDEF0), (0x12345678 * 0x9ABCDEF0) & 0xFFFFFFFF)
+        self.assertEqual(self.run_op(MULH, 0xFFFFFFFF, 0xFFFFFFFF), 0)           # -1 * -1
+        self.assertEqual(self.run_op(MULHU, 0xFFFFFFFF, 0xFFFFFFFF), 0xFFFFFFFE)
+        self.assertEqual(self.run_op(MULHSU, 0xFFFFFFFF, 0xFFFFFFFF), 0xFFFFFFFF)
+
+    def test_divide_edge_cases(self):
+        self.assertEqual(self.run_op(DIV, (-7) & 0xFFFFFFFF, 2), (-3) & 0xFFFFFFFF)
+        self.assertEqual(self.run_op(REM, (-7) & 0xFFFFFFFF, 2), (-1) & 0xFFFFFFFF)
+        self.assertEqual(self.run_op(DIV, 5, 0), 0xFFFFFFFF)
+        self.assertEqual(self.run_op(DIVU, 5, 0), 0xFFFFFFFF)
+        self.assertEqual(self.run_op(REM, 5, 0), 5)
+        self.assertEqual(self.run_op(REMU, 5, 0), 5)
+        self.assertEqual(self.run_op(DIV, 0x80000000, 0xFFFFFFFF), 0x80000000)
+        self.assertEqual(self.run_op(REM, 0x80000000, 0xFFFFFFFF), 0)
+
+class TestRV32F(HexProgramCase):
+    def fp_program(self, f7, a_bits, b_bits):
+        # f1 = a, f2 = b, f3 = f1 op f2; x5 = f3; mem[0x10000] = f3; f4 = mem[0x10000]
+        return (li32(1, a_bits) + li32(2, b_bits) +
+                [fmv_w_x(1, 1), fmv_w_x(2, 2), fop(f7, 3, 1, 2), fmv_x_w(5, 3),
+                 enc_u(0x10, 6), enc_s(0, 3, 6, 2, op=0x27), enc_i(0, 6, 2, 4, op=0x07), HALT])
+
+    def test_arith_and_moves(self):
+        for f7, expect in ((FADD, 0x40700000), (FSUB, 0xBF400000), (FMUL, 0x40580000)):
+            path = self.hexfile(self.fp_program(f7, 0x3FC00000, 0x40100000))   # 1.5, 2.25
+            for mode in ("interp", "block"):
+                out = run_hex(path, mode=mode)
+                self.assertEqual(out["regs"][5], expect)
+                self.assertEqual(out["fregs"][3], expect)
+                self.assertEqual(out["fregs"][4], expect)
+                self.assertEqual(out["mem"].read_u32(0x10000), expect)
+
+    def test_special_results(self):
+        out = run_hex(self.hexfile(self.fp_program(FMUL, 0x7F000000, 0x7F000000)))
+        self.assertEqual(out["regs"][5], 0x7F800000)                   # overflow -> +inf
+        out = run_hex(self.hexfile(self.fp_program(FSUB, 0x7F800000, 0x7F800000)))
+        self.assertEqual(out["regs"][5], 0x7FC00000)                   # inf - inf -> canonical NaN
+
+    def test_decode_and_trace_use_f_registers(self):
+        d = decode(fop(FADD, 0, 1, 2))
+        self.assertEqual((d.name, d.rd, d.rs1, d.rs2), ("fadd.s", FREG, FREG + 1, FREG + 2))
+        self.assertEqual(decode(fmv_w_x(1, 0) | (3 << 20)).name, "illegal")
+        self.assertEqual(format_trace(d, 0x40700000, 0), "  fadd.s f0, f1, f2 -> f0=0x40700000")
+        tb = TraceBuffer()
+        run_hex(self.hexfile(self.fp_program(FADD, 0x3FC00000, 0x40100000)), trace=tb)
+        self.assertTrue(any("flw f4, 0(x6)" in line for line in tb.format()))
@@ -0,0 +1,75 @@
+import io
+import unittest
+from array import array
+from runner import run_hex
+from mdu import mdu_mul
+from tracebuf import TraceBuffer, TraceLog
+from test_runner import HexProgramCase, SAMPLE, count_loop, enc_i, enc_s, enc_j, enc_u
+
+def _bits(v):
+    from memory import Bit
+    return tuple(Bit(bool((v >> i) & 1)) for i in range(31, -1, -1))
+
+class TestTraceBuffer(unittest.TestCase):
+    def test_ring_keeps_the_newest_records(self):
+        tb = TraceBuffer(4)
+        for k in range(10):
+            tb.record(4 * k, k, 1, k * k, 0)
+        self.assertEqual(len(tb), 4)
+        self.assertEqual(tb.first_seq, 6)
+        self.assertEqual([r.value for r in tb.records()], [36, 49, 64, 81])
+        self.assertEqual([r.seq for r in tb.tail(2)], [8, 9])
+        self.assertEqual([r.pc for r in tb.records(0, 8)], [24, 28])
+        f = io.BytesIO()
+        tb.dump(f)
+        pcs = array("I")
+        pcs.frombytes(f.getvalue()[:16])
+        self.assertEqual(list(pcs), [24, 28, 32, 36])
+
+class TestTracedRun(HexProgramCase):
+    def test_sample_trace(self):
+        out = run_hex(SAMPLE, max_steps=200, trace=True)
+        tb = out["trace"]
+        self.assertEqual(len(tb), out["steps"])
+        recs = list(tb.records())
+        self.assertEqual((recs[2].rd, recs[2].value), (3, 15))   # add x3, x1, x2
+        sw = recs[5]
+        self.assertEqual((sw.addr, sw.value), (0x10000, 15))
+        text = tb.format(2, 3)
+        self.assertEqual(text, ["PC=0x00000008 INST=0x002081B3",
+                                "  add x3, x1, x2 -> x3=0x0000000F"])
+        self.assertEqual(tb.format()[-1], "  jal x0, 0 -> pc=0x00000028")
+
+    def test_trace_does_not_change_results(self):
+        path = self.hexfile(count_loop(40))
+        plain = run_hex(path, max_steps=1000)
+        traced = run_hex(path, max_steps=1000, trace=TraceBuffer(16))
+        self.assertEqual((plain["regs"], plain["pc"], plain["steps"], plain["halt"]),
+                         (traced["regs"], traced["pc"], traced["steps"], traced["halt"]))
+        self.assertEqual(traced["trace"].count, traced["steps"])
+        self.assertEqual(len(traced["trace"]), 16)
+
+    def test_load_store_and_jump_records(self):
+        path = self.hexfile([enc_u(0x10, 5), enc_i(-7, 0, 0, 6), enc_s(3, 6, 5, 0),
+                             enc_i(3, 5, 0, 5, op=0x03), enc_j(0, 0)])   # lb x5, 3(x5)
+        recs = list(run_hex(path, trace=True)["trace"].records())
+        self.assertEqual((recs[2].addr, recs[2].rd), (0x10003, 0))
+        self.assertEqual((recs[3].addr, recs[3].rd, recs[3].value), (0x10003, 5, 0xFFFFFFF9))
+        self.assertEqual(recs[4].addr, 16)
+
+class TestTraceLog(unittest.TestCase):
+    def test_lazy_messages_read_as_strings(self):
+        log = TraceLog()
+        log.append("start")
+        log.add("step{}: add", 3)
+        self.assertEqual(list(log), ["start", "step3: add"])
+        self.assertEqual(log[1], "step3: add")
+        self.assertEqual(log, ["start", "step3: add"])
+
+    def test_mdu_trace_is_a_tracelog(self):
+        out = mdu_mul("MUL", _bits(3), _bits(5))
+        self.assertIsInstance(out["trace"], TraceLog)
+        self.assertIn("MUL step0: add", list(out["trace"]))
+
+if __name__ == "__main__":
+    unittest.main()